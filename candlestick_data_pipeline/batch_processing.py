@@ -0,0 +1,110 @@
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List
+
+EXECUTORS = ('processes', 'dask')
+
+
+def process_key(home_directory: str = None, pipeline_name: str = None, pipeline_version: str = None,
+                load_control_key: str = None, source_file_path: Path = None) -> dict:
+    """
+    Run process_new_dataset_with_logging for a single load control key inside a batch worker
+    :return: run summary for the key
+    """
+    return run_key(home_directory=home_directory, pipeline_name=pipeline_name, pipeline_version=pipeline_version,
+                   load_control_key=load_control_key, method_name='process_new_dataset_with_logging',
+                   method_arguments={'source_file_path': source_file_path, 'load_control_key': load_control_key})
+
+
+def evaluate_key(home_directory: str = None, pipeline_name: str = None, pipeline_version: str = None,
+                 load_control_key: str = None) -> dict:
+    """
+    Run evaluate_staging_dataset_with_logging for a single load control key inside a batch worker
+    :return: run summary for the key
+    """
+    return run_key(home_directory=home_directory, pipeline_name=pipeline_name, pipeline_version=pipeline_version,
+                   load_control_key=load_control_key, method_name='evaluate_staging_dataset_with_logging',
+                   method_arguments={'load_control_key': load_control_key})
+
+
+def ingest_key(home_directory: str = None, pipeline_name: str = None, pipeline_version: str = None,
+               load_control_key: str = None, source_file_path: Path = None) -> dict:
+    """
+    Process a dataset and, if that succeeds, evaluate it so it is promoted or demoted, inside a batch worker
+    :return: run summary for the key, the runtime covers both runs
+    """
+    summary = process_key(home_directory=home_directory, pipeline_name=pipeline_name,
+                          pipeline_version=pipeline_version, load_control_key=load_control_key,
+                          source_file_path=source_file_path)
+    if summary['status'] != 'success':
+        return summary
+    evaluation_summary = evaluate_key(home_directory=home_directory, pipeline_name=pipeline_name,
+                                      pipeline_version=pipeline_version, load_control_key=load_control_key)
+    evaluation_summary['runtime'] = round(evaluation_summary['runtime'] + summary['runtime'], 2)
+    return evaluation_summary
+
+
+def run_key(home_directory: str = None, pipeline_name: str = None, pipeline_version: str = None,
+            load_control_key: str = None, method_name: str = None, method_arguments: dict = None) -> dict:
+    """
+    Build a PipelineManager in the worker and call one of its logged methods. Each worker runs dask with the
+    synchronous scheduler so parallelism comes from the batch workers rather than nested thread pools. Exceptions are
+    captured in the summary so one failed key never aborts the rest of the batch
+    :return: dictionary with load_control_key, status, runtime and error
+    """
+    import dask
+    from candlestick_data_pipeline import PipelineManager
+    start = time.time()
+    summary = {'load_control_key': load_control_key, 'status': 'success', 'runtime': None, 'error': None}
+    try:
+        with dask.config.set(scheduler='synchronous'):
+            pipeline_manager = PipelineManager(home_directory, pipeline_name, pipeline_version)
+            getattr(pipeline_manager, method_name)(**method_arguments)
+    except Exception:
+        summary['status'] = 'failed'
+        summary['error'] = traceback.format_exc()
+    summary['runtime'] = round(time.time() - start, 2)
+    return summary
+
+
+def run_batch(task_function: Callable = None, task_arguments: List[dict] = None, max_workers: int = None,
+              executor: str = 'processes') -> Dict[str, dict]:
+    """
+    Run task_function once per entry of task_arguments across a pool of worker processes
+    :param task_function: process_key or evaluate_key
+    :param task_arguments: list of keyword argument dictionaries, one per load control key
+    :param max_workers: number of worker processes, defaults to the number of cores
+    :param executor: 'processes' for a local process pool or 'dask' for a local dask cluster
+    :return: dictionary of the format {load_control_key: run summary}
+    """
+    if executor not in EXECUTORS:
+        raise Exception(f"Batch executor {executor} not recognized. Use one of {EXECUTORS}")
+    max_workers = max_workers or os.cpu_count()
+    results = {}
+    if executor == 'dask':
+        from distributed import Client, LocalCluster
+        with LocalCluster(n_workers=max_workers, threads_per_worker=1, processes=True) as cluster, \
+                Client(cluster) as client:
+            futures = [client.submit(task_function, pure=False, **arguments) for arguments in task_arguments]
+            for summary in client.gather(futures):
+                results[summary['load_control_key']] = summary
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(task_function, **arguments) for arguments in task_arguments]
+            for future in as_completed(futures):
+                summary = future.result()
+                results[summary['load_control_key']] = summary
+    return results
+
+
+def print_batch_summary(results: Dict[str, dict] = None):
+    """
+    print one line per load control key with the status and runtime of its run
+    """
+    failed = [key for key, summary in results.items() if summary['status'] == 'failed']
+    print(f'\n\nBatch complete: {len(results) - len(failed)} succeeded, {len(failed)} failed')
+    for key, summary in sorted(results.items()):
+        print(f"{key}: {summary['status']} ({summary['runtime']}s)")
@@ -0,0 +1,359 @@
+import io
+import gc
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import dask
+import numpy as np
+import pandas as pd
+import dask.dataframe as dd
+from pathlib import Path
+from typing import Callable, List
+from candlestick_data_pipeline import transformations
+from candlestick_data_pipeline import evaluations
+from candlestick_data_pipeline import registration
+from candlestick_data_pipeline import synthetic_data
+from candlestick_data_pipeline import pipeline_metrics
+from candlestick_data_pipeline import pipeline_logging
+
+SUITES = ('transformations', 'evaluations', 'end_to_end')
+BENCHMARK_SIZES = {
+    'small': {'n_symbols': 20, 'n_cardtypes': 3, 'n_days': 400},
+    'medium': {'n_symbols': 200, 'n_cardtypes': 3, 'n_days': 730},
+    'large': {'n_symbols': 1000, 'n_cardtypes': 4, 'n_days': 1095},
+}
+DATA_DEFECTS = {'gap_fraction': 0.01, 'null_fraction': 0.001, 'duplicate_fraction': 0.01}
+ROWS_PER_PARTITION = 250000
+GROUPBY_COLUMNS = ['symbol', 'cardtype']
+
+
+def benchmark_transformations(date_range: List[str] = None) -> List[list]:
+    """
+    Arguments every transformation is benchmarked with. Row level transformations run on the raw generated data (string
+    dates, nulls and duplicates), group transformations on the cleaned data (formatted dates, no duplicates)
+    :param date_range: first and last date of the generated data
+    :return: list of [transformation name, arguments, input data ('raw' or 'clean')]
+    """
+    window = {'groupby_columns': GROUPBY_COLUMNS, 'metric_columns': ['metric'], 'date_column': 'date'}
+    indicator = {'groupby_columns': GROUPBY_COLUMNS, 'date_column': 'date'}
+    return [
+        ['format_date_columns', {'date_columns': ['date']}, 'raw'],
+        ['drop_rows_with_any_null_values', {}, 'raw'],
+        ['drop_duplicate_rows', {'subset': GROUPBY_COLUMNS + ['date'], 'keep': 'first'}, 'raw'],
+        ['filter_by_date_range', {'date_range': date_range, 'date_column': 'date'}, 'raw'],
+        ['agg_insert_by_group', {'groupby_columns': ['symbol', 'date'], 'agg_dict': {'metric': ['sum']},
+                                 'insert_dict': {'cardtype': 'COMBINED'}}, 'clean'],
+        ['agg_insert_grouping_sets', {'grouping_sets': [GROUPBY_COLUMNS + ['date'], ['symbol', 'date'], ['date']],
+                                      'agg_dict': {'metric': ['sum', 'mean'], 'volume': 'sum'},
+                                      'insert_dict': {'cardtype': 'COMBINED', 'symbol': 'ALL'}}, 'clean'],
+        ['rolling_mean_by_date_by_group', dict(window, window=7), 'clean'],
+        ['rolling_sum_by_date_by_group', dict(window, window=7), 'clean'],
+        ['yoy_percent_change_by_group', window, 'clean'],
+        ['windowed_metrics_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'date_column': 'date', 'metrics': [
+            {'operation': 'rolling_sum', 'metric_columns': ['metric'], 'window': 7},
+            {'operation': 'rolling_mean', 'metric_columns': ['metric'], 'window': 28},
+            {'operation': 'yoy_pct_change', 'metric_columns': ['metric_rolling_sum']}]}, 'clean'],
+        ['fill_missing_dates_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'fill_method': 'ffill',
+                                         'date_range': date_range, 'date_column': 'date'}, 'clean'],
+        ['partition_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'date_column': 'date'}, 'clean'],
+        ['ema_by_group', dict(indicator, metric_columns=['close'], span=20), 'clean'],
+        ['rsi_by_group', dict(indicator, metric_columns=['close'], window=14), 'clean'],
+        ['atr_by_group', dict(indicator, window=14), 'clean'],
+        ['vwap_by_group', dict(indicator, window=20), 'clean'],
+        ['bollinger_bands_by_group', dict(indicator, metric_columns=['close'], window=20), 'clean'],
+    ]
+
+
+def benchmark_evaluations(date_range: List[str] = None) -> List[list]:
+    """
+    Arguments every evaluation is benchmarked with, all evaluations run on the cleaned data
+    :return: list of [evaluation name, arguments]
+    """
+    return [
+        ['null_data_check', {}],
+        ['date_range_check_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'date_range': date_range,
+                                       'date_column': 'date'}],
+        ['date_continuity_check_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'date_column': 'date'}],
+    ]
+
+
+def benchmark_pipeline_config(home_directory: Path = None, date_range: List[str] = None,
+                              pipeline_options: dict = None) -> dict:
+    """
+    registration dict of the pipeline used by the end to end benchmarks
+    :param pipeline_options: registration keys overriding the defaults, e.g. {'optimize_transformations': True}
+    """
+    config = {
+        'name': 'benchmark',
+        'version': 1,
+        'home_directory': str(home_directory),
+        'input_schema': {'symbol': 'str', 'cardtype': 'str', 'metric': 'float64', 'open': 'float64',
+                         'high': 'float64', 'low': 'float64', 'close': 'float64', 'volume': 'float64'},
+        'output_schema': {'date': 'datetime64[ns]', 'metric': 'float64', 'metric_rolling_sum': 'float32'},
+        'transformations': [
+            ['format_date_columns', {'date_columns': ['date']}],
+            ['drop_rows_with_any_null_values', None],
+            ['drop_duplicate_rows', {'subset': GROUPBY_COLUMNS + ['date'], 'keep': 'first'}],
+            ['rolling_sum_by_date_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'metric_columns': ['metric'],
+                                              'date_column': 'date', 'window': 7}],
+            ['yoy_percent_change_by_group', {'groupby_columns': GROUPBY_COLUMNS,
+                                             'metric_columns': ['metric_rolling_sum'], 'date_column': 'date'}],
+            ['filter_by_date_range', {'date_range': date_range, 'date_column': 'date'}],
+        ],
+        'evaluations': [[name, arguments] for name, arguments in benchmark_evaluations(date_range=date_range)],
+        'visualizations': [],
+    }
+    config.update(pipeline_options or {})
+    return config
+
+
+@contextlib.contextmanager
+def quiet_pipeline_output():
+    """
+    Silence the pipeline while it is measured. Pipeline output goes through the package logger, its level is raised
+    so records are dropped when they are emitted instead of being queued for the console, and stdout catches the
+    remaining prints
+    """
+    package_logger = logging.getLogger(pipeline_logging.LOGGER_NAME)
+    level = package_logger.level
+    package_logger.setLevel(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        package_logger.setLevel(level)
+
+
+def measure(function: Callable = None, setup: Callable = None, repeat: int = 1) -> dict:
+    """
+    Run function repeat times and measure wall time, cpu time and peak memory of every run
+    :param function: function to measure, called with the output of setup
+    :param setup: untimed function preparing the input of each run
+    :param repeat: number of runs
+    :return: dictionary of measurements, the value returned by the last run is stored under 'output'
+    """
+    measurement = {'wall_seconds': [], 'cpu_seconds': [], 'peak_rss_bytes': 0, 'peak_rss_increase_bytes': 0}
+    for _ in range(repeat):
+        with quiet_pipeline_output():
+            argument = setup() if setup is not None else None
+        gc.collect()
+        with pipeline_metrics.PeakMemorySampler() as sampler, quiet_pipeline_output():
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            output = function(argument)
+            wall_end, cpu_end = time.perf_counter(), time.process_time()
+        measurement['wall_seconds'].append(wall_end - wall_start)
+        measurement['cpu_seconds'].append(cpu_end - cpu_start)
+        measurement['peak_rss_bytes'] = max(measurement['peak_rss_bytes'], sampler.peak)
+        measurement['peak_rss_increase_bytes'] = max(measurement['peak_rss_increase_bytes'],
+                                                     sampler.peak - sampler.baseline)
+        measurement['output'] = output
+    measurement['median_wall_seconds'] = float(np.median(measurement['wall_seconds']))
+    return measurement
+
+
+def generate_benchmark_data(size: str = None, seed: int = 0) -> pd.DataFrame:
+    """
+    deterministic raw dataset of a benchmark size
+    """
+    return synthetic_data.generate_candlestick_data(**BENCHMARK_SIZES[size], **DATA_DEFECTS, seed=seed)
+
+
+def clean_benchmark_data(raw_data: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    formatted, null and duplicate free version of the raw data, still sorted by date
+    """
+    data = raw_data.dropna().drop_duplicates(subset=GROUPBY_COLUMNS + ['date'])
+    data = data.assign(date=pd.to_datetime(data['date'], format='%Y-%m-%d'))
+    return data.reset_index(drop=True)
+
+
+def to_dask(data: pd.DataFrame = None) -> dd:
+    return dd.from_pandas(data, npartitions=max(1, len(data) // ROWS_PER_PARTITION))
+
+
+def run_transformation_benchmarks(size: str = None, raw_data: pd.DataFrame = None, clean_data: pd.DataFrame = None,
+                                  date_range: List[str] = None, repeat: int = 1) -> List[dict]:
+    """
+    time every transformation on its own, each run builds and computes the transformed dataframe
+    """
+    results = []
+    for name, arguments, input_data in benchmark_transformations(date_range=date_range):
+        pandas_data = raw_data if input_data == 'raw' else clean_data
+        transformation = getattr(transformations, name)
+        measurement = measure(function=lambda data: len(transformation(data=data, **arguments).compute()),
+                              setup=lambda: to_dask(pandas_data), repeat=repeat)
+        results.append(benchmark_result(suite='transformations', name=name, size=size, rows_in=len(pandas_data),
+                                        measurement=measurement, rows_out=measurement.pop('output')))
+        print_result(results[-1])
+    return results
+
+
+def run_evaluation_benchmarks(size: str = None, clean_data: pd.DataFrame = None, date_range: List[str] = None,
+                              repeat: int = 1) -> List[dict]:
+    """
+    time every evaluation on its own
+    """
+    results = []
+    for name, arguments in benchmark_evaluations(date_range=date_range):
+        evaluation = getattr(evaluations, name)
+        measurement = measure(function=lambda data: evaluation(data=data, **arguments),
+                              setup=lambda: to_dask(clean_data), repeat=repeat)
+        results.append(benchmark_result(suite='evaluations', name=name, size=size, rows_in=len(clean_data),
+                                        measurement=measurement, result=measurement.pop('output')))
+        print_result(results[-1])
+    return results
+
+
+def run_end_to_end_benchmarks(size: str = None, raw_data: pd.DataFrame = None, date_range: List[str] = None,
+                              repeat: int = 1, pipeline_options: dict = None) -> List[dict]:
+    """
+    time PipelineManager.process_new_dataset and evaluate_staging_dataset on a generated csv in a temporary pipeline
+    """
+    from candlestick_data_pipeline import PipelineManager
+    results = []
+    with tempfile.TemporaryDirectory() as home_directory:
+        source_file_path = Path(home_directory) / 'landing' / f'benchmark_{size}.csv'
+        source_file_path.parent.mkdir(parents=True)
+        raw_data.to_csv(source_file_path, index=False)
+        config = benchmark_pipeline_config(home_directory=home_directory, date_range=date_range,
+                                           pipeline_options=pipeline_options)
+
+        def register() -> PipelineManager:
+            registration.register_pipeline(dict(config), overwrite=True)
+            return PipelineManager(home_directory, config['name'], config['version'])
+
+        def process(pipeline_manager: PipelineManager = None) -> PipelineManager:
+            pipeline_manager.process_new_dataset(source_file_path=source_file_path, load_control_key='benchmark')
+            return pipeline_manager
+
+        measurement = measure(function=process, setup=register, repeat=repeat)
+        measurement.pop('output')
+        results.append(benchmark_result(suite='end_to_end', name='process_new_dataset', size=size,
+                                        rows_in=len(raw_data), measurement=measurement))
+        print_result(results[-1])
+
+        def evaluate(pipeline_manager: PipelineManager = None) -> bool:
+            try:
+                return pipeline_manager.evaluate_staging_dataset(load_control_key='benchmark')
+            except Exception:
+                return False
+
+        measurement = measure(function=evaluate, setup=lambda: process(register()), repeat=repeat)
+        results.append(benchmark_result(suite='end_to_end', name='evaluate_staging_dataset', size=size,
+                                        rows_in=len(raw_data), measurement=measurement,
+                                        result=measurement.pop('output')))
+        print_result(results[-1])
+    return results
+
+
+def benchmark_result(suite: str = None, name: str = None, size: str = None, rows_in: int = None,
+                     measurement: dict = None, **extra) -> dict:
+    return dict({'suite': suite, 'name': name, 'size': size, 'rows_in': rows_in}, **measurement, **extra)
+
+
+def print_result(result: dict = None):
+    print(f"{result['suite']:<16} {result['name']:<32} {result['size']:<8} {result['rows_in']:>10} rows  "
+          f"{result['median_wall_seconds']:>9.3f}s  {result['peak_rss_increase_bytes'] / 2 ** 20:>9.1f} MiB")
+
+
+def environment_metadata() -> dict:
+    """
+    describe the code and machine the benchmarks ran on so result files can be compared across commits
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'git_commit': commit, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+            'pandas': pd.__version__, 'dask': dask.__version__, 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpu_count': os.cpu_count()}
+
+
+def run_benchmarks(sizes: List[str] = None, suites: List[str] = None, repeat: int = 1, seed: int = 0,
+                   pipeline_options: dict = None, output_path: Path = None) -> dict:
+    """
+    Run the benchmark suites at every size and write the results as JSON
+    :param sizes: names of BENCHMARK_SIZES to run
+    :param suites: names of SUITES to run
+    :param repeat: number of runs of every benchmark
+    :param seed: seed of the generated data
+    :param pipeline_options: registration keys overriding the end to end pipeline defaults
+    :param output_path: path of JSON results file
+    :return: results dictionary
+    """
+    suites = suites or list(SUITES)
+    results = {'metadata': dict(environment_metadata(), repeat=repeat, seed=seed, pipeline_options=pipeline_options,
+                                sizes={size: BENCHMARK_SIZES[size] for size in sizes}, data_defects=DATA_DEFECTS),
+               'results': []}
+    for size in sizes:
+        raw_data = generate_benchmark_data(size=size, seed=seed)
+        clean_data = clean_benchmark_data(raw_data)
+        date_range = [raw_data['date'].min(), raw_data['date'].max()]
+        if 'transformations' in suites:
+            results['results'] += run_transformation_benchmarks(size=size, raw_data=raw_data, clean_data=clean_data,
+                                                                date_range=date_range, repeat=repeat)
+        if 'evaluations' in suites:
+            results['results'] += run_evaluation_benchmarks(size=size, clean_data=clean_data, date_range=date_range,
+                                                            repeat=repeat)
+        if 'end_to_end' in suites:
+            results['results'] += run_end_to_end_benchmarks(size=size, raw_data=raw_data, date_range=date_range,
+                                                            repeat=repeat, pipeline_options=pipeline_options)
+    if output_path is not None:
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w') as fp:
+            json.dump(results, fp, indent=4, default=str)
+        print(f'\nBenchmark results written to {output_path}')
+    return results
+
+
+def compare_results(baseline_path: Path = None, candidate_path: Path = None) -> List[dict]:
+    """
+    print the change in median wall time and peak memory of every benchmark found in both result files
+    :return: list of comparisons
+    """
+    with open(baseline_path, 'r') as fp:
+        baseline = {(result['suite'], result['name'], result['size']): result for result in json.load(fp)['results']}
+    with open(candidate_path, 'r') as fp:
+        candidate = json.load(fp)['results']
+    comparisons = []
+    for result in candidate:
+        key = (result['suite'], result['name'], result['size'])
+        if key not in baseline:
+            continue
+        comparisons.append({'suite': key[0], 'name': key[1], 'size': key[2],
+                            'wall_ratio': result['median_wall_seconds'] / baseline[key]['median_wall_seconds'],
+                            'memory_ratio': result['peak_rss_increase_bytes'] /
+                            max(baseline[key]['peak_rss_increase_bytes'], 1)})
+        print(f"{key[0]:<16} {key[1]:<32} {key[2]:<8} time x{comparisons[-1]['wall_ratio']:.2f}  "
+              f"memory x{comparisons[-1]['memory_ratio']:.2f}")
+    return comparisons
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark candlestick_data_pipeline on synthetic data')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='run benchmarks and write the results as JSON')
+    run_parser.add_argument('--sizes', nargs='+', choices=list(BENCHMARK_SIZES), default=['small'])
+    run_parser.add_argument('--suites', nargs='+', choices=SUITES, default=list(SUITES))
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--pipeline-options', type=json.loads, default=None,
+                            help='JSON registration keys for the end to end pipeline')
+    run_parser.add_argument('--output', default='benchmark_results.json')
+    compare_parser = subparsers.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    arguments = parser.parse_args()
+    if arguments.command == 'run':
+        run_benchmarks(sizes=arguments.sizes, suites=arguments.suites, repeat=arguments.repeat, seed=arguments.seed,
+                       pipeline_options=arguments.pipeline_options, output_path=arguments.output)
+    else:
+        compare_results(baseline_path=arguments.baseline, candidate_path=arguments.candidate)
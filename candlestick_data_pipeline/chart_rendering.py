@@ -0,0 +1,189 @@
+import os
+import re
+import contextlib
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import dask.dataframe as dd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+from candlestick_data_pipeline import kernels
+
+IMAGE_FORMATS = ('png', 'svg')
+DOWNSAMPLE_METHODS = ('lttb', 'ohlc', None)
+# points per plotted series, well above the horizontal resolution of a chart
+DEFAULT_MAX_POINTS = 1000
+# symbols rendered per worker task, so the matplotlib import and task overhead are shared
+SYMBOLS_PER_TASK = 16
+# characters kept in image file names, every other character of a symbol is replaced
+UNSAFE_FILE_NAME_CHARACTERS = re.compile(r'[^A-Za-z0-9_.-]')
+# worker process pools of running chart packs by key, looked up by the dask tasks rendering the partitions
+RENDER_POOLS = {}
+# symbols rendered in the process running the dask task, without a pool, are rendered one chunk at a time
+RENDER_LOCK = threading.Lock()
+
+
+def downsample_lttb(data: pd.DataFrame = None, date_column: str = None, metric_column: str = None,
+                    max_points: int = DEFAULT_MAX_POINTS) -> pd.DataFrame:
+    """
+    Downsample a single date sorted series with largest triangle three buckets (see kernels.lttb_indices)
+    :return: dataframe with date column and metric column
+    """
+    positions = kernels.lttb_indices(x=data[date_column].to_numpy(dtype='datetime64[ns]').astype(np.int64),
+                                     y=data[metric_column].to_numpy(dtype=np.float64, na_value=np.nan),
+                                     points=max_points)
+    return data[[date_column, metric_column]].iloc[positions]
+
+
+def downsample_ohlc(data: pd.DataFrame = None, date_column: str = None, metric_column: str = None,
+                    max_points: int = DEFAULT_MAX_POINTS) -> pd.DataFrame:
+    """
+    Downsample a single date sorted series to at most max_points equal width date bins, keeping the open, high, low
+    and close of each bin so spikes stay visible as the high-low band
+    :return: dataframe with date column (start of bin) and open/high/low/close columns
+    """
+    dates = data[date_column].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    if len(dates) == 0:
+        return pd.DataFrame(columns=[date_column, 'open', 'high', 'low', 'close'])
+    width = max((dates[-1] - dates[0]) // max_points + 1, 1)
+    bins = (dates - dates[0]) // width
+    values = data[metric_column].to_numpy(dtype=np.float64, na_value=np.nan)
+    ohlc = pd.Series(values).groupby(bins).agg(['first', 'max', 'min', 'last'])
+    ohlc.columns = ['open', 'high', 'low', 'close']
+    ohlc.insert(0, date_column, pd.to_datetime(dates[0] + ohlc.index.to_numpy() * width))
+    return ohlc.reset_index(drop=True)
+
+
+def render_symbol(data: pd.DataFrame = None, symbol: str = None, output_directory: Path = None,
+                  date_column: str = None, metric_columns: List[str] = None, series_column: str = None,
+                  image_format: str = 'png', downsample_method: str = 'lttb',
+                  max_points: int = DEFAULT_MAX_POINTS) -> Path:
+    """
+    Render one figure for a symbol with a panel per metric column and a line per value of series_column in each
+    panel. Figures are drawn on the Agg canvas directly, never through pyplot, so rendering is headless and holds no
+    global figure state
+    :param data: pandas dataframe of a single symbol
+    :param symbol: symbol name, used in titles and the file name
+    :param output_directory: directory the image is written to
+    :param date_column: name of date column
+    :param metric_columns: columns plotted, one panel each
+    :param series_column: column splitting each panel into one line per value, e.g. cardtype
+    :param image_format: png or svg
+    :param downsample_method: lttb, ohlc (line of closes with a high-low band) or None to plot every row
+    :param max_points: points kept per line when downsampling
+    :return: path of image
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    data = data.sort_values(by=date_column, kind='mergesort')
+    series = [(None, data)] if series_column is None else list(data.groupby(by=series_column, sort=True))
+    figure = Figure(figsize=(12, 3 * len(metric_columns)))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(nrows=len(metric_columns), ncols=1, squeeze=False)[:, 0]
+    for axis, metric_column in zip(axes, metric_columns):
+        for series_name, series_data in series:
+            label = metric_column if series_name is None else str(series_name)
+            if downsample_method == 'ohlc':
+                ohlc = downsample_ohlc(data=series_data, date_column=date_column, metric_column=metric_column,
+                                       max_points=max_points)
+                line, = axis.plot(ohlc[date_column], ohlc['close'], label=label, linewidth=0.8)
+                axis.fill_between(ohlc[date_column], ohlc['low'], ohlc['high'], color=line.get_color(), alpha=0.2,
+                                  linewidth=0)
+            else:
+                if downsample_method == 'lttb':
+                    series_data = downsample_lttb(data=series_data, date_column=date_column,
+                                                  metric_column=metric_column, max_points=max_points)
+                axis.plot(series_data[date_column], series_data[metric_column], label=label, linewidth=0.8)
+        axis.set_title(f'{metric_column} - Symbol: {symbol}')
+        axis.legend(loc='upper left', fontsize='small')
+    # fixed margins instead of tight_layout, which draws the whole figure once more to measure it
+    figure.subplots_adjust(left=0.06, right=0.98, bottom=0.08, top=0.94, hspace=0.35)
+    image_path = Path(output_directory / f'{image_file_name(symbol)}.{image_format}')
+    figure.savefig(image_path, format=image_format)
+    return image_path
+
+
+def image_file_name(symbol=None) -> str:
+    """
+    File name of the image of a symbol. Characters that are unsafe in file names (path separators and the like) are
+    replaced and a hash of the symbol is added, so symbols such as A/B and A_B do not share a file
+    """
+    file_name = UNSAFE_FILE_NAME_CHARACTERS.sub('_', str(symbol))
+    if file_name == str(symbol) and not file_name.startswith('.'):
+        return file_name
+    return f"{file_name.lstrip('.')}_{hashlib.sha1(str(symbol).encode()).hexdigest()[:8]}"
+
+
+def render_symbols(data: pd.DataFrame = None, symbol_column: str = None, **render_arguments) -> List[Path]:
+    """
+    render every symbol in data, one worker task
+    """
+    return [render_symbol(data=symbol_data, symbol=symbol, **render_arguments)
+            for symbol, symbol_data in data.groupby(by=symbol_column, sort=True)]
+
+
+def render_chart_pack(data: dd = None, output_directory: Path = None, symbol_column: str = None,
+                      date_column: str = None, metric_columns: List[str] = None, series_column: str = None,
+                      image_format: str = 'png', downsample_method: str = 'lttb',
+                      max_points: int = DEFAULT_MAX_POINTS, max_workers: int = None) -> List[Path]:
+    """
+    Render one image per symbol in data across a pool of worker processes. Every partition is rendered by a dask task
+    sending its symbols to the workers in chunks of SYMBOLS_PER_TASK, so partitions stream through the driver as they
+    are computed and only the image paths are collected
+    :param data: dask dataframe holding the symbol, date, series and metric columns with every row of a symbol in a
+    single partition (see transformations.partition_by_group), or a pandas dataframe
+    :param output_directory: directory images are written to
+    :param max_workers: number of worker processes, defaults to the number of cores
+    :return: paths of images in symbol order
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise Exception(f"Image format {image_format} not recognized. Use one of {IMAGE_FORMATS}")
+    if downsample_method not in DOWNSAMPLE_METHODS:
+        raise Exception(f"Downsample method {downsample_method} not recognized. Use one of {DOWNSAMPLE_METHODS}")
+    if isinstance(data, pd.DataFrame):
+        data = dd.from_pandas(data, npartitions=1)
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    render_arguments = {'output_directory': output_directory, 'date_column': date_column,
+                        'metric_columns': metric_columns, 'series_column': series_column,
+                        'image_format': image_format, 'downsample_method': downsample_method,
+                        'max_points': max_points}
+    meta = pd.DataFrame({'symbol': pd.Series(dtype=object), 'image_path': pd.Series(dtype=object)})
+    max_workers = max_workers or os.cpu_count()
+    with contextlib.ExitStack() as stack:
+        pool_key = None
+        if max_workers > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers))
+            pool_key = f'{os.getpid()}_{id(pool)}'
+            RENDER_POOLS[pool_key] = pool
+            stack.callback(RENDER_POOLS.pop, pool_key)
+        images = data.map_partitions(render_partition, symbol_column=symbol_column, pool_key=pool_key, meta=meta,
+                                     **render_arguments).compute()
+    return [Path(image_path) for image_path in images.sort_values(by='symbol', kind='mergesort')['image_path']]
+
+
+def render_partition(data: pd.DataFrame = None, symbol_column: str = None, pool_key: str = None,
+                     **render_arguments) -> pd.DataFrame:
+    """
+    Render the symbols of one partition in chunks of SYMBOLS_PER_TASK, on the worker processes of the pool registered
+    under pool_key or, when there is no such pool in this process (e.g. on a distributed worker), in this process
+    :return: pandas dataframe of symbol and image path
+    """
+    symbols = sorted(data[symbol_column].dropna().unique())
+    symbol_codes = pd.Categorical(data[symbol_column], categories=symbols).codes
+    chunks = [data.loc[(symbol_codes >= start) & (symbol_codes < start + SYMBOLS_PER_TASK)]
+              for start in range(0, len(symbols), SYMBOLS_PER_TASK)]
+    pool = RENDER_POOLS.get(pool_key)
+    if pool is None:
+        image_paths = []
+        for chunk in chunks:
+            with RENDER_LOCK:
+                image_paths += render_symbols(data=chunk, symbol_column=symbol_column, **render_arguments)
+    else:
+        futures = [pool.submit(render_symbols, data=chunk, symbol_column=symbol_column, **render_arguments)
+                   for chunk in chunks]
+        image_paths = [image_path for future in futures for image_path in future.result()]
+    return pd.DataFrame({'symbol': pd.Series(symbols, dtype=object),
+                         'image_path': pd.Series([str(image_path) for image_path in image_paths], dtype=object)})
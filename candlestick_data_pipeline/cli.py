@@ -0,0 +1,90 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import List
+from candlestick_data_pipeline import daemon
+
+DAEMON_MODES = ('auto', 'always', 'never')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    pipeline_parser = argparse.ArgumentParser(add_help=False)
+    pipeline_parser.add_argument('--home-directory', required=True)
+    pipeline_parser.add_argument('--pipeline-name', required=True)
+    pipeline_parser.add_argument('--pipeline-version', required=True)
+    pipeline_parser.add_argument('--daemon', choices=DAEMON_MODES, default='auto',
+                                 help='auto sends the job to a running daemon and otherwise runs it in this process')
+    parser = argparse.ArgumentParser(prog='candlestick-pipeline', description='Run candlestick data pipeline jobs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', parents=[pipeline_parser], help='process a new dataset to staging')
+    run_parser.add_argument('load_control_key')
+    run_parser.add_argument('source_file_path')
+    run_parser.add_argument('--evaluate', action='store_true', help='evaluate and promote or demote the dataset')
+    for command, help_text in [('evaluate', 'evaluate a staging dataset and promote or demote it'),
+                               ('promote', 'move a staging dataset to output'),
+                               ('demote', 'move a staging dataset to failed')]:
+        subparsers.add_parser(command, parents=[pipeline_parser], help=help_text).add_argument('load_control_key')
+    status_parser = subparsers.add_parser('status', parents=[pipeline_parser],
+                                          help='manifest records of a key, or the keys of every dataset type')
+    status_parser.add_argument('load_control_key', nargs='?', default=None)
+    serve_parser = subparsers.add_parser('serve', help='start a daemon serving jobs of every pipeline in a home '
+                                                       'directory')
+    serve_parser.add_argument('--home-directory', required=True)
+    serve_parser.add_argument('--cluster', choices=daemon.CLUSTERS, default='threads')
+    serve_parser.add_argument('--n-workers', type=int, default=None)
+    stop_parser = subparsers.add_parser('stop', help='stop the daemon of a home directory')
+    stop_parser.add_argument('--home-directory', required=True)
+    return parser
+
+
+def job_request(arguments: argparse.Namespace = None) -> dict:
+    """
+    translate parsed command line arguments into a daemon job request, the source file path is resolved since the
+    daemon runs in its own working directory
+    """
+    job_arguments = {'load_control_key': arguments.load_control_key}
+    if arguments.command == 'run':
+        job_arguments.update(source_file_path=str(Path(arguments.source_file_path).resolve()), evaluate=arguments.evaluate)
+    return {'command': arguments.command, 'pipeline_name': arguments.pipeline_name,
+            'pipeline_version': arguments.pipeline_version, 'arguments': job_arguments}
+
+
+def run_command(arguments: argparse.Namespace = None) -> dict:
+    """
+    Send a job to the daemon of the home directory when one is running, otherwise run it in this process. The
+    package is only imported when the job runs here so commands handled by the daemon start in well under a second
+    :return: job response, see daemon.run_request
+    """
+    request = job_request(arguments)
+    if arguments.daemon != 'never' and daemon.is_running(arguments.home_directory):
+        return daemon.send_request(home_directory=arguments.home_directory, request=request)
+    if arguments.daemon == 'always':
+        raise Exception(f"No daemon is serving {arguments.home_directory}, start one with the serve command")
+    from candlestick_data_pipeline.pipeline_manager import PipelineManager
+    pipeline_manager = PipelineManager(arguments.home_directory, arguments.pipeline_name, arguments.pipeline_version)
+    return daemon.run_request(request=request, pipeline_manager=pipeline_manager)
+
+
+def main(argv: List[str] = None) -> int:
+    arguments = build_parser().parse_args(argv)
+    if arguments.command == 'serve':
+        daemon.PipelineDaemon(home_directory=arguments.home_directory, cluster=arguments.cluster,
+                              n_workers=arguments.n_workers).serve()
+        return 0
+    if arguments.command == 'stop':
+        if not daemon.is_running(arguments.home_directory):
+            print(f'No daemon is serving {arguments.home_directory}', file=sys.stderr)
+            return 1
+        daemon.send_request(home_directory=arguments.home_directory, request={'command': 'shutdown'})
+        return 0
+    job_response = run_command(arguments)
+    if job_response['status'] != 'success':
+        print(job_response['error'], file=sys.stderr)
+        return 1
+    print(json.dumps(job_response['result'], indent=2, default=str))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
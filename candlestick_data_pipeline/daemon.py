@@ -0,0 +1,274 @@
+import os
+import time
+import logging
+import secrets
+import argparse
+import threading
+import traceback
+import contextlib
+from multiprocessing.connection import Listener, Client
+from pathlib import Path
+
+PIPELINES_DIRECTORY = 'candlestick_data_piplines'
+SOCKET_FILE = 'daemon.sock'
+AUTHKEY_FILE = 'daemon.key'
+JOB_COMMANDS = ('run', 'evaluate', 'promote', 'demote', 'status')
+CONTROL_COMMANDS = ('ping', 'shutdown')
+CLUSTERS = ('threads', 'distributed')
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineDaemon:
+    """
+    Long lived local worker serving pipeline jobs for every pipeline under a home directory over a unix socket. The
+    daemon pays the interpreter start up, the dask/pandas imports and (optionally) the start of a local dask cluster
+    once, and keeps a PipelineManager with its loaded config per pipeline version, so a small job sent by the command
+    line interface starts without any of that cost. Jobs of different pipeline versions run concurrently, jobs of the
+    same pipeline version run one at a time since a PipelineManager holds the state of its current run. Jobs of a
+    pipeline with a memory budget run alone, the budget applies its dask settings to the process wide dask config
+    which every job running at the same time would pick up. Requests are authenticated with a key only readable by
+    the user running the daemon
+    """
+
+    def __init__(self, home_directory: Path = None, cluster: str = 'threads', n_workers: int = None):
+        """
+        :param home_directory: home directory of the pipelines served
+        :param cluster: 'threads' for the local threaded dask scheduler or 'distributed' for a local dask cluster
+        :param n_workers: workers of the local dask cluster
+        """
+        if cluster not in CLUSTERS:
+            raise Exception(f"Cluster {cluster} not recognized. Use one of {CLUSTERS}")
+        self.home_directory = str(home_directory)
+        self.cluster = cluster
+        self.n_workers = n_workers
+        self.socket_path = socket_path(home_directory)
+        self.authkey_path = authkey_path(home_directory)
+        self.pipeline_managers = {}
+        self.pipeline_locks = {}
+        self.lock = threading.Lock()
+        self.job_lock = SharedLock()
+        self.stop_event = threading.Event()
+
+    def serve(self):
+        """
+        accept requests until a shutdown request is received, each connection is handled in its own thread
+        """
+        if is_running(self.home_directory):
+            raise Exception(f"A daemon is already serving {self.home_directory} at {self.socket_path}")
+        # warm up the imports every job needs
+        from candlestick_data_pipeline import pipeline_manager
+        client = None
+        if self.cluster == 'distributed':
+            from distributed import Client as DaskClient, LocalCluster
+            client = DaskClient(LocalCluster(n_workers=self.n_workers, processes=True))
+        authkey = secrets.token_bytes(32)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self.socket_path.unlink(missing_ok=True)
+        write_authkey(authkey_file=self.authkey_path, authkey=authkey)
+        listener = Listener(address=str(self.socket_path), family='AF_UNIX', authkey=authkey)
+        logger.info(f'\n\nPipeline daemon serving {self.home_directory} at {self.socket_path}')
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    connection = listener.accept()
+                except Exception:
+                    # failed authentication or a client that went away
+                    continue
+                threading.Thread(target=self.handle_connection, args=(connection,), daemon=True).start()
+        finally:
+            listener.close()
+            self.socket_path.unlink(missing_ok=True)
+            self.authkey_path.unlink(missing_ok=True)
+            if client is not None:
+                client.cluster.close()
+                client.close()
+
+    def handle_connection(self, connection=None):
+        with connection:
+            try:
+                request = connection.recv()
+            except EOFError:
+                return
+            if request.get('command') == 'shutdown':
+                self.stop_event.set()
+                connection.send(response(status='success'))
+                # wake up the accept call blocking the serve loop, which may exit before answering
+                try:
+                    send_request(home_directory=self.home_directory, request={'command': 'ping'})
+                except (OSError, EOFError):
+                    pass
+                return
+            if request.get('command') == 'ping':
+                connection.send(response(status='success', result={'pid': os.getpid()}))
+                return
+            pipeline_manager, pipeline_lock = self.get_pipeline_manager(
+                pipeline_name=request.get('pipeline_name'), pipeline_version=request.get('pipeline_version'))
+            job_lock = self.job_lock.shared() if pipeline_manager.memory_budget_settings is None \
+                else self.job_lock.exclusive()
+            with pipeline_lock, job_lock:
+                connection.send(run_request(request=request, pipeline_manager=pipeline_manager))
+
+    def get_pipeline_manager(self, pipeline_name: str = None, pipeline_version: str = None) -> tuple:
+        """
+        Cached PipelineManager of a pipeline version and the lock its jobs run under. The PipelineManager is rebuilt
+        when the pipeline config changed on disk, e.g. after the pipeline was registered again
+        :return: (PipelineManager, threading.Lock)
+        """
+        from candlestick_data_pipeline.pipeline_manager import PipelineManager
+        key = (str(pipeline_name), str(pipeline_version))
+        with self.lock:
+            pipeline_lock = self.pipeline_locks.setdefault(key, threading.Lock())
+        with pipeline_lock:
+            pipeline_manager, config_modified = self.pipeline_managers.get(key, (None, None))
+            if pipeline_manager is None or config_modified != config_modified_time(pipeline_manager):
+                pipeline_manager = PipelineManager(self.home_directory, pipeline_name, pipeline_version)
+                self.pipeline_managers[key] = (pipeline_manager, config_modified_time(pipeline_manager))
+        return pipeline_manager, pipeline_lock
+
+
+class SharedLock:
+    """
+    Lock held by any number of threads at once in shared mode or by a single thread in exclusive mode. Waiting
+    exclusive holders are served before new shared holders so they are not starved
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.shared_holders = 0
+        self.exclusive_held = False
+        self.exclusive_waiting = 0
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.exclusive_held and not self.exclusive_waiting)
+            self.shared_holders += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.shared_holders -= 1
+                self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self.condition:
+            self.exclusive_waiting += 1
+            self.condition.wait_for(lambda: not self.exclusive_held and not self.shared_holders)
+            self.exclusive_waiting -= 1
+            self.exclusive_held = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.exclusive_held = False
+                self.condition.notify_all()
+
+
+def run_request(request: dict = None, pipeline_manager=None) -> dict:
+    """
+    Run a job request on a PipelineManager, in the daemon or in the command line process when no daemon is running
+    :param request: dictionary of the format {'command': ..., 'arguments': {...}}, see JOB_COMMANDS
+    :param pipeline_manager: PipelineManager of the pipeline version of the request
+    :return: dictionary with status, result, error and runtime
+    """
+    start = time.time()
+    command, arguments = request.get('command'), request.get('arguments') or {}
+    try:
+        result = run_job(pipeline_manager=pipeline_manager, command=command, arguments=arguments)
+    except Exception:
+        return response(status='failed', error=traceback.format_exc(), runtime=time.time() - start)
+    return response(status='success', result=result, runtime=time.time() - start)
+
+
+def run_job(pipeline_manager=None, command: str = None, arguments: dict = None):
+    """
+    run: process a source file (and evaluate it when arguments['evaluate'] is set)
+    evaluate: evaluate a staging dataset and promote or demote it
+    promote/demote: move a staging dataset to output/failed
+    status: manifest records of a key, or the keys of every dataset type when no key is given
+    """
+    load_control_key = arguments.get('load_control_key')
+    if command == 'run':
+        pipeline_manager.process_new_dataset_with_logging(source_file_path=Path(arguments['source_file_path']),
+                                                          load_control_key=load_control_key)
+        if arguments.get('evaluate'):
+            pipeline_manager.evaluate_staging_dataset_with_logging(load_control_key=load_control_key)
+        return {'load_control_key': load_control_key,
+                'dataset_type': 'output' if arguments.get('evaluate') else 'staging'}
+    if command == 'evaluate':
+        pipeline_manager.evaluate_staging_dataset_with_logging(load_control_key=load_control_key)
+        return {'load_control_key': load_control_key, 'dataset_type': 'output'}
+    if command == 'promote':
+        pipeline_manager.promote_dataset(load_control_key=load_control_key)
+        return {'load_control_key': load_control_key, 'dataset_type': 'output'}
+    if command == 'demote':
+        pipeline_manager.demote_dataset(load_control_key=load_control_key)
+        return {'load_control_key': load_control_key, 'dataset_type': 'failed'}
+    if command == 'status':
+        if load_control_key is not None:
+            return pipeline_manager.dataset_status(load_control_key=load_control_key)
+        from candlestick_data_pipeline import manifest
+        return {dataset_type: pipeline_manager.list_load_control_keys(dataset_type=dataset_type)
+                for dataset_type in manifest.DATASET_TYPES}
+    raise Exception(f"Command {command} not recognized. Use one of {JOB_COMMANDS}")
+
+
+def response(status: str = None, result=None, error: str = None, runtime: float = None) -> dict:
+    return {'status': status, 'result': result, 'error': error,
+            'runtime': None if runtime is None else round(runtime, 3)}
+
+
+def send_request(home_directory: Path = None, request: dict = None) -> dict:
+    """
+    send a request to the daemon serving home_directory and wait for its response
+    """
+    with Client(address=str(socket_path(home_directory)), family='AF_UNIX',
+                authkey=authkey_path(home_directory).read_bytes()) as connection:
+        connection.send(request)
+        return connection.recv()
+
+
+def is_running(home_directory: Path = None) -> bool:
+    """
+    check if a daemon answers on the socket of home_directory, a socket left behind by a daemon that died is stale
+    """
+    if not socket_path(home_directory).exists() or not authkey_path(home_directory).exists():
+        return False
+    try:
+        return send_request(home_directory=home_directory, request={'command': 'ping'})['status'] == 'success'
+    except (OSError, EOFError):
+        return False
+
+
+def socket_path(home_directory: Path = None) -> Path:
+    return Path(f"{home_directory}/{PIPELINES_DIRECTORY}/{SOCKET_FILE}")
+
+
+def authkey_path(home_directory: Path = None) -> Path:
+    return Path(f"{home_directory}/{PIPELINES_DIRECTORY}/{AUTHKEY_FILE}")
+
+
+def write_authkey(authkey_file: Path = None, authkey: bytes = None):
+    """
+    write the key clients authenticate with, readable by the owner only
+    """
+    authkey_file.unlink(missing_ok=True)
+    file_descriptor = os.open(authkey_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(file_descriptor, 'wb') as key_file:
+        key_file.write(authkey)
+
+
+def config_modified_time(pipeline_manager=None) -> int:
+    return pipeline_manager.config_path.stat().st_mtime_ns
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve pipeline jobs from a warm local worker')
+    parser.add_argument('--home-directory', required=True)
+    parser.add_argument('--cluster', choices=CLUSTERS, default='threads')
+    parser.add_argument('--n-workers', type=int, default=None)
+    arguments = parser.parse_args()
+    PipelineDaemon(home_directory=arguments.home_directory, cluster=arguments.cluster,
+                   n_workers=arguments.n_workers).serve()
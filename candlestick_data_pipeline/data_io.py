@@ -1,35 +1,216 @@
 import os
+import json
+import shutil
+import dask
+import pandas as pd
 import dask.dataframe as dd
 from pathlib import Path
+from typing import List
 
 
-def read_data_by_file_extension(file_path: Path) -> dd:
+DATE_DATA_TYPES = ('datetime64[ns]', 'datetime64', 'datetime', 'date')
+STRING_DATA_TYPES = ('str', 'object', 'string')
+# parquet footer metadata key holding the column order of a dataset written with hive partition columns
+COLUMN_ORDER_METADATA_KEY = 'candlestick_data_pipeline.column_order'
+
+
+def read_data_by_file_extension(file_path: Path, schema: dict = None, project_columns: bool = False,
+                                required_columns: List[str] = None, **read_options) -> dd:
     """
-    read data file into dask data frame based on the input path file extension
+    read data file into dask data frame based on the input path file extension. When a schema is given csv files are
+    parsed straight into the schema data types and date columns are parsed while reading, other formats are already
+    typed. A directory with a .csv extension is read as all csv files inside it
     :param file_path: path of input data
+    :param schema: dictionary of the format {column name: data type}
+    :param project_columns: only read the columns found in schema and required_columns
+    :param required_columns: columns read along with those of schema when projecting, e.g. a date column left out of
+    schema
+    :param read_options: extra keyword arguments of the read function
     :return: dask dataframe
     """
-    map_file_extension_to_read_function = {'.csv': dd.read_csv, '.parquet': dd.read_parquet, '.json': dd.read_json}
+    map_file_extension_to_read_function = {'.csv': dd.read_csv, '.parquet': read_parquet_dataset, '.json': dd.read_json}
     name, extension = os.path.splitext(file_path)
     if extension.lower() in map_file_extension_to_read_function.keys():
         read_function = map_file_extension_to_read_function[extension.lower()]
-        return read_function(file_path)
+        read_arguments = schema_read_arguments(extension=extension.lower(), schema=schema,
+                                               project_columns=project_columns, required_columns=required_columns)
+        if extension.lower() == '.csv' and Path(file_path).is_dir():
+            file_path = str(Path(file_path) / '*.csv')
+        return read_function(file_path, **read_arguments, **read_options)
     else:
         raise Exception(f"File extention {extension} not recognized")
 
 
-def write_data_by_file_extension(data: dd = None, file_path: Path = None):
+def schema_read_arguments(extension: str = None, schema: dict = None, project_columns: bool = False,
+                          required_columns: List[str] = None) -> dict:
+    """
+    translate a schema into keyword arguments of the read function for a file extension
+    """
+    if schema is None:
+        return {}
+    read_arguments = {}
+    projected_columns = list(schema.keys()) + [column for column in dict.fromkeys(required_columns or [])
+                                               if column not in schema]
+    if extension == '.csv':
+        read_arguments['dtype'] = {column: data_type for column, data_type in schema.items()
+                                   if data_type not in DATE_DATA_TYPES}
+        read_arguments['parse_dates'] = [column for column, data_type in schema.items()
+                                         if data_type in DATE_DATA_TYPES]
+        if project_columns:
+            read_arguments['usecols'] = projected_columns
+    elif extension == '.parquet' and project_columns:
+        read_arguments['columns'] = projected_columns
+    return read_arguments
+
+
+def compact_schema(schema: dict = None, downcast_floats: bool = False, string_data_type: str = None,
+                   date_columns: List[str] = None) -> dict:
+    """
+    Rewrite schema data types to compact ones
+    :param schema: dictionary of the format {column name: data type}
+    :param downcast_floats: store float64 columns as float32
+    :param string_data_type: data type used for string columns, e.g. category or string[pyarrow] for low cardinality
+    columns such as symbol and cardtype
+    :param date_columns: string columns left as they are since they are converted to datetime by the transformations
+    :return: compact schema
+    """
+    compacted_schema = {}
+    for column, data_type in schema.items():
+        if downcast_floats and data_type in ('float', 'float64'):
+            data_type = 'float32'
+        elif string_data_type is not None and data_type in STRING_DATA_TYPES and column not in (date_columns or []):
+            data_type = string_data_type
+        compacted_schema[column] = data_type
+    return compacted_schema
+
+
+def read_parquet_dataset(file_path: Path, **kwargs) -> dd:
+    """
+    read a parquet file or parquet dataset directory. Hive partition discovery starts at the dataset directory so
+    key=value directories above it (such as version=1 in the pipeline path) are not read as partition columns
+    :param file_path: path of parquet file or dataset directory
+    :return: dask dataframe
     """
-    write dask dataframe to file into based on the input path file extension
+    if Path(file_path).is_dir():
+        kwargs.setdefault('dataset', {'partition_base_dir': str(file_path)})
+    data = dd.read_parquet(file_path, **kwargs)
+    if kwargs.get('columns') is None:
+        data = restore_column_order(data=data, file_path=file_path)
+    return data
+
+
+def restore_column_order(data: dd = None, file_path: Path = None) -> dd:
+    """
+    Hive partition columns are read back after the columns stored in the files, put the columns of a dataset
+    written with partition columns back in the order they were written (see write_data_by_file_extension)
+    """
+    if not Path(file_path).is_dir():
+        return data
+    import pyarrow.parquet as pq
+    data_file_path = next(Path(file_path).rglob('*.parquet'), None)
+    if data_file_path is None:
+        return data
+    metadata = pq.read_schema(data_file_path).metadata or {}
+    if COLUMN_ORDER_METADATA_KEY.encode() not in metadata:
+        return data
+    column_order = [column for column in json.loads(metadata[COLUMN_ORDER_METADATA_KEY.encode()])
+                    if column in data.columns]
+    columns = column_order + [column for column in data.columns if column not in column_order]
+    return data if columns == list(data.columns) else data[columns]
+
+
+def write_data_by_file_extension(data: dd = None, file_path: Path = None, partition_on: List[str] = None,
+                                 compression: str = None, compute: bool = True):
+    """
+    write dask dataframe to file into based on the input path file extension. Data is written partition by partition
+    straight from dask, parquet datasets as a directory of compressed files (one sub directory per value of the
+    partition_on columns, with the column order of data kept in the file metadata so it is restored on read) and csv
+    datasets as a single file
     :param file_path: path of output file
-    :return: None
+    :param partition_on: list of column names used to partition a parquet dataset
+    :param compression: compression codec used for parquet datasets
+    :param compute: write now, or return the lazy write so it can be computed together with other work
+    :return: None or lazy write
     """
-    data = data.compute()
-    map_file_extension_to_read_function = {'.csv': 'to_csv', '.parquet': 'to_parquet'}
     name, extension = os.path.splitext(file_path)
-    if extension.lower() in map_file_extension_to_read_function.keys():
-        write_function = getattr(data, map_file_extension_to_read_function[extension.lower()])
-        read_function = map_file_extension_to_read_function[extension.lower()]
-        write_function(file_path, index=False)
+    if extension.lower() == '.parquet':
+        custom_metadata = {COLUMN_ORDER_METADATA_KEY: json.dumps(list(data.columns))} if partition_on else None
+        return data.to_parquet(file_path, partition_on=partition_on, compression=compression, write_index=False,
+                               overwrite=True, compute=compute, custom_metadata=custom_metadata)
+    elif extension.lower() == '.csv':
+        csv_write = write_csv_single_file(data=data, file_path=file_path)
+        return csv_write.compute() if compute else csv_write
     else:
         raise Exception(f"File extention {extension} not recognized")
+
+
+def write_csv_single_file(data: dd = None, file_path: Path = None):
+    """
+    Build a lazy write of all partitions, in order, into a single csv file. The partitions are taken from the
+    unoptimized graph so a write computed together with other work shares its tasks (e.g. a single parse of the source)
+    instead of fusing its own copy of them
+    :return: lazy write
+    """
+    csv_write = dask.delayed(Path(file_path).unlink)(missing_ok=True)
+    for partition in data.to_delayed(optimize_graph=False):
+        csv_write = dask.delayed(append_csv_partition)(partition=partition, file_path=file_path,
+                                                       previous_write=csv_write)
+    return csv_write
+
+
+def append_csv_partition(partition: pd.DataFrame = None, file_path: Path = None, previous_write=None):
+    """
+    append a single partition to a csv file, the header is written by the first partition
+    """
+    header = not Path(file_path).exists()
+    partition.to_csv(file_path, mode='a', header=header, index=False)
+
+
+def copy_dataset(source_path: Path = None, destination_path: Path = None):
+    """
+    Copy the raw bytes of a dataset file or dataset directory, an existing dataset at the destination is replaced
+    :param source_path: location of dataset
+    :param destination_path: location of copy
+    :return: None
+    """
+    source_path = Path(source_path)
+    destination_path = Path(destination_path)
+    if destination_path.is_dir():
+        shutil.rmtree(destination_path)
+    if source_path.is_dir():
+        shutil.copytree(source_path, destination_path)
+    else:
+        shutil.copyfile(source_path, destination_path)
+
+
+def move_dataset(source_path: Path = None, destination_path: Path = None):
+    """
+    Move a dataset file or dataset directory with renames so readers never see a partially moved dataset. A dataset
+    file replaces an existing one at the destination in a single rename. A dataset directory can not be renamed over
+    an existing one, so the existing directory is first renamed aside to a hidden name and only deleted after the new
+    dataset is in place, leaving the destination missing for just the instant between the two renames
+    :param source_path: current location of dataset
+    :param destination_path: new location of dataset
+    :return: None
+    """
+    source_path = Path(source_path)
+    destination_path = Path(destination_path)
+    if not (destination_path.is_dir() and source_path.is_dir()):
+        source_path.rename(destination_path)
+        return
+    replaced_path = destination_path.parent / f'.{destination_path.name}.replaced'
+    if replaced_path.exists():
+        shutil.rmtree(replaced_path)
+    destination_path.rename(replaced_path)
+    source_path.rename(destination_path)
+    shutil.rmtree(replaced_path)
+
+
+def dataset_size(file_path: Path = None) -> int:
+    """
+    size in bytes of a dataset file, or of all files of a dataset directory, 0 if the dataset does not exist
+    """
+    file_path = Path(file_path)
+    if file_path.is_dir():
+        return sum(path.stat().st_size for path in file_path.rglob('*') if path.is_file())
+    return file_path.stat().st_size if file_path.exists() else 0
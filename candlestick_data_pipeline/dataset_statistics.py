@@ -0,0 +1,194 @@
+import json
+import logging
+import pandas as pd
+import dask.dataframe as dd
+from pathlib import Path
+from typing import List, Tuple
+from candlestick_data_pipeline import data_io
+from candlestick_data_pipeline import manifest
+
+STATISTICS_DIRECTORY = '_statistics'
+STATISTICS_FORMAT_VERSION = 1
+# evaluations with groupby_columns and date_column arguments that can be answered from the statistics of a grouping
+GROUPED_EVALUATIONS = ('date_continuity_check_by_group', 'date_range_check_by_group')
+GROUP_COLUMNS = ('min', 'max', 'row_count', 'distinct_dates')
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetStatistics:
+    """
+    Small summary of a dataset computed in the same pass as its write: the row count, the null count of every column
+    and, per grouping of the data, the min/max date, row count and distinct date count of every group. It is stored
+    in a sidecar file next to the dataset along with a fingerprint of the dataset files, so evaluations can be answered
+    in O(groups) without reading the data for as long as the dataset is unchanged
+    """
+
+    def __init__(self, row_count: int = None, null_counts: dict = None, groupings: List[dict] = None,
+                 fingerprint: dict = None):
+        """
+        :param row_count: rows in the dataset
+        :param null_counts: dictionary of the format {column: null count}
+        :param groupings: list of dictionaries of the format {'groupby_columns': [...], 'date_column': ...,
+        'date_data_type': ..., 'dates_normalized': bool, 'groups': dataframe indexed by group with GROUP_COLUMNS}
+        :param fingerprint: byte size and latest modification time of the dataset files, see dataset_fingerprint
+        """
+        self.row_count = row_count
+        self.null_counts = null_counts
+        self.groupings = groupings
+        self.fingerprint = fingerprint
+
+    def get_grouping(self, groupby_columns: List[str] = None, date_column: str = None) -> dict:
+        """
+        statistics of a grouping, None if they were not computed for groupby_columns and date_column
+        """
+        for grouping in self.groupings:
+            if grouping['groupby_columns'] == list(groupby_columns or []) and grouping['date_column'] == date_column:
+                return grouping
+        return None
+
+    def to_json(self) -> dict:
+        groupings = []
+        for grouping in self.groupings:
+            groups = grouping['groups'].reset_index()
+            if grouping['date_data_type'].startswith('datetime64'):
+                for column in ['min', 'max']:
+                    groups[column] = groups[column].map(manifest.format_date)
+            groups = groups.astype(object).where(groups.notnull(), None)
+            groupings.append(dict(grouping, groups={'columns': list(groups.columns),
+                                                    'rows': groups.values.tolist()}))
+        return {'format_version': STATISTICS_FORMAT_VERSION, 'fingerprint': self.fingerprint,
+                'row_count': self.row_count, 'null_counts': self.null_counts, 'groupings': groupings}
+
+    @classmethod
+    def from_json(cls, statistics: dict = None) -> 'DatasetStatistics':
+        groupings = []
+        for grouping in statistics['groupings']:
+            groups = pd.DataFrame(grouping['groups']['rows'], columns=grouping['groups']['columns'])
+            if grouping['date_data_type'].startswith('datetime64'):
+                for column in ['min', 'max']:
+                    groups[column] = pd.to_datetime(groups[column])
+            groupings.append(dict(grouping, groups=groups.set_index(grouping['groupby_columns'])))
+        return cls(row_count=statistics['row_count'], null_counts=statistics['null_counts'], groupings=groupings,
+                   fingerprint=statistics['fingerprint'])
+
+
+def lazy_statistics(data: dd = None, groupings: List[Tuple[List[str], str]] = None) -> dict:
+    """
+    Lazy statistics of a dataset, built as reductions so they are computed in the same pass as the write of the
+    dataset. Groupings whose columns are missing from data are skipped
+    :param data: dask dataframe
+    :param groupings: list of (groupby_columns, date_column)
+    :return: dictionary of dask objects, see write_statistics
+    """
+    statistics = {'row_count': data.shape[0], 'null_counts': data.isnull().sum(), 'groupings': []}
+    for groupby_columns, date_column in groupings:
+        if date_column not in data.columns or not set(groupby_columns) <= set(data.columns):
+            continue
+        dates = data.groupby(by=list(groupby_columns))[date_column]
+        # counted from the distinct (group, date) rows, a groupby nunique fails on string[pyarrow] group columns
+        distinct_dates = data[list(groupby_columns) + [date_column]].dropna(subset=[date_column]).drop_duplicates()
+        grouping = {'groupby_columns': list(groupby_columns), 'date_column': date_column,
+                    'date_data_type': str(data[date_column].dtype), 'dates_normalized': False,
+                    'group_dates': dates.agg(['min', 'max', 'size']),
+                    'distinct_dates': distinct_dates.groupby(by=list(groupby_columns)).size()}
+        if grouping['date_data_type'].startswith('datetime64'):
+            known_dates = data[date_column].dropna()
+            grouping['dates_normalized'] = (known_dates == known_dates.dt.normalize()).all()
+        statistics['groupings'].append(grouping)
+    return statistics
+
+
+def statistics_groupings(pipeline_manager=None) -> List[Tuple[List[str], str]]:
+    """
+    groupings to compute statistics for, the group columns recorded in the manifest and those of every evaluation in
+    the pipeline config that can be answered from statistics
+    """
+    groupings = []
+    if pipeline_manager.group_columns and pipeline_manager.date_column:
+        groupings.append((list(pipeline_manager.group_columns), pipeline_manager.date_column))
+    for evaluation_name, evaluation_arguments in pipeline_manager.evaluation_list:
+        if evaluation_name in GROUPED_EVALUATIONS:
+            grouping = (list(evaluation_arguments['groupby_columns']), evaluation_arguments['date_column'])
+            if grouping not in groupings:
+                groupings.append(grouping)
+    return groupings
+
+
+def write_statistics(data_path: Path = None, statistics: dict = None, previous_write=None) -> DatasetStatistics:
+    """
+    Write the statistics sidecar of a dataset, fingerprinting the dataset files as they are after the write
+    :param data_path: path of dataset
+    :param statistics: computed lazy_statistics of the dataset
+    :param previous_write: write of the dataset, makes a lazy sidecar write run after the dataset write
+    :return: DatasetStatistics
+    """
+    groupings = []
+    for grouping in statistics['groupings']:
+        groups = grouping['group_dates'].rename(columns={'size': 'row_count'})
+        # groups without any known date have no distinct (group, date) rows
+        groups['distinct_dates'] = grouping['distinct_dates'].reindex(groups.index, fill_value=0)
+        groupings.append({'groupby_columns': grouping['groupby_columns'], 'date_column': grouping['date_column'],
+                          'date_data_type': grouping['date_data_type'],
+                          'dates_normalized': bool(grouping['dates_normalized']),
+                          'groups': groups[list(GROUP_COLUMNS)]})
+    dataset_statistics = DatasetStatistics(
+        row_count=int(statistics['row_count']),
+        null_counts={column: int(count) for column, count in statistics['null_counts'].items()},
+        groupings=groupings, fingerprint=dataset_fingerprint(data_path))
+    sidecar_path = statistics_path(data_path)
+    sidecar_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(sidecar_path, 'w') as fp:
+        json.dump(dataset_statistics.to_json(), fp, default=str)
+    return dataset_statistics
+
+
+def read_statistics(data_path: Path = None) -> DatasetStatistics:
+    """
+    statistics sidecar of a dataset, None if it is missing or stale (the dataset changed after it was written)
+    """
+    sidecar_path = statistics_path(data_path)
+    if not sidecar_path.exists():
+        logger.info(f'\nNo dataset statistics found for {data_path}')
+        return None
+    with open(sidecar_path, 'r') as fp:
+        statistics = json.load(fp)
+    if statistics.get('format_version') != STATISTICS_FORMAT_VERSION or \
+            statistics.get('fingerprint') != dataset_fingerprint(data_path):
+        logger.info(f'\nDataset statistics of {data_path} are stale')
+        return None
+    return DatasetStatistics.from_json(statistics)
+
+
+def move_statistics(source_path: Path = None, destination_path: Path = None):
+    """
+    move the statistics sidecar of a dataset along with the dataset, a sidecar left at the destination is removed
+    """
+    source_sidecar_path = statistics_path(source_path)
+    destination_sidecar_path = statistics_path(destination_path)
+    destination_sidecar_path.unlink(missing_ok=True)
+    if source_sidecar_path.exists():
+        destination_sidecar_path.parent.mkdir(parents=True, exist_ok=True)
+        source_sidecar_path.rename(destination_sidecar_path)
+
+
+def statistics_path(data_path: Path = None) -> Path:
+    """
+    Sidecars are kept in a sub directory of the dataset directory so they are never mistaken for datasets and
+    parquet datasets keep only their own files
+    """
+    data_path = Path(data_path)
+    return data_path.parent / STATISTICS_DIRECTORY / f'{data_path.name}.json'
+
+
+def dataset_fingerprint(data_path: Path = None) -> dict:
+    """
+    byte size and latest modification time of a dataset file or of all files of a dataset directory, both are kept
+    when a dataset is moved
+    """
+    data_path = Path(data_path)
+    if not data_path.exists():
+        return None
+    file_paths = [path for path in data_path.rglob('*') if path.is_file()] if data_path.is_dir() else [data_path]
+    return {'byte_size': data_io.dataset_size(data_path),
+            'modified_time': max((path.stat().st_mtime_ns for path in file_paths), default=0)}
@@ -1,66 +1,212 @@
+import numpy as np
 import dask.dataframe as dd
 import pandas as pd
-from functools import partial
 from typing import List, Tuple
+from candlestick_data_pipeline import kernels
 
 
-def date_continuity_check_by_group(data: dd = None, groupby_columns: List[str] = None, date_column: str = None) -> bool:
+def date_continuity_check_by_group(data: dd = None, groupby_columns: List[str] = None, date_column: str = None,
+                                   assume_partitioned: bool = False) -> bool:
     """
     Split data into groups and evaluate each group checking if it contains a set of continuous dates in its date column.
     If any group contains a discontinuity return true else return false
     :param data: dask dataframe
     :param groupby_columns: column names to groupby
     :param date_column: date column name
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
     :return: boolean
     """
+    return bool(date_continuity_check_by_group_lazy(data=data, groupby_columns=groupby_columns,
+                                                    date_column=date_column,
+                                                    assume_partitioned=assume_partitioned).compute())
+
+
+def date_continuity_check_by_group_lazy(data: dd = None, groupby_columns: List[str] = None, date_column: str = None,
+                                        assume_partitioned: bool = False):
+    """
+    lazy version of date_continuity_check_by_group
+    :return: dask scalar
+    """
+    if assume_partitioned:
+        return data.map_partitions(date_continuity_check_partition, groupby_columns=groupby_columns,
+                                   date_column=date_column, meta=('date_continuity_bool', 'bool')).any()
     output_schema = [(date_column, data[date_column].dtype)]
     output_schema.append(('date_continuity_bool', 'bool'))
     data = data.groupby(by=groupby_columns).apply(
         lambda df_g: date_continuity_check(data=df_g, date_column=date_column),
         meta=output_schema).reset_index()
-    return data['date_continuity_bool'].compute().any()
+    return data['date_continuity_bool'].any()
+
+
+def date_continuity_check_by_group_from_statistics(statistics=None, groupby_columns: List[str] = None,
+                                                   date_column: str = None) -> bool:
+    """
+    Answer date_continuity_check_by_group from dataset statistics. The sorted dates of a group have no gap of more
+    than a day exactly when the group holds a date for every day from its first to its last date, which can be told
+    from the distinct date count when every date falls on midnight
+    :param statistics: DatasetStatistics (see dataset_statistics)
+    :return: boolean, None if the statistics can not answer the check
+    """
+    grouping = statistics.get_grouping(groupby_columns=groupby_columns, date_column=date_column)
+    if grouping is None or not grouping['date_data_type'].startswith('datetime64') or \
+            not grouping['dates_normalized']:
+        return None
+    groups = grouping['groups']
+    days = (groups['max'] - groups['min']).dt.days + 1
+    return bool((groups['distinct_dates'] < days).any())
 
 
 def date_continuity_check(data: dd = None, date_column: str = None) -> dd:
     """
-    preform date continuity check for a single group
+    preform date continuity check for a single group, its rows may come in any order
     """
     day = pd.Timedelta('1d')
+    data = data.sort_values(by=date_column, kind='mergesort')
     data['date_continuity_bool'] = ((data[date_column] - data[date_column].shift(-1)).abs() > day) | \
                                    (data[date_column].diff() > day)
     return data[[date_column, 'date_continuity_bool']]
 
 
+def date_continuity_check_partition(data: pd.DataFrame = None, groupby_columns: List[str] = None,
+                                    date_column: str = None) -> pd.Series:
+    """
+    preform date continuity check for every group in a single partition, true if consecutive dates of any group are
+    more than a day apart
+    """
+    failed_groups = date_continuity_failed_groups(data=data, groupby_columns=groupby_columns, date_column=date_column)
+    return pd.Series([bool(failed_groups)], name='date_continuity_bool')
+
+
+def date_continuity_failed_groups(data: pd.DataFrame = None, groupby_columns: List[str] = None,
+                                  date_column: str = None) -> List[list]:
+    """
+    groups of a single partition whose consecutive dates are more than a day apart somewhere
+    :return: list of group values
+    """
+    data = data.dropna(subset=groupby_columns).sort_values(groupby_columns + [date_column], kind='mergesort')
+    starts = kernels.group_starts(kernels.group_offsets(data=data, groupby_columns=groupby_columns))
+    dates = data[date_column].to_numpy(dtype='datetime64[ns]')
+    gaps = (np.diff(dates) > np.timedelta64(1, 'D')) & (starts[1:] == starts[:-1])
+    return data[groupby_columns].iloc[np.flatnonzero(gaps) + 1].drop_duplicates().values.tolist()
+
+
 def null_data_check(data: dd = None) -> bool:
     """
     Check if dataframe contains any null values if so return true
     """
-    data = data.compute()
-    return data.isnull().values.any()
+    return bool(null_data_check_lazy(data=data).compute())
+
+
+def null_data_check_lazy(data: dd = None):
+    """
+    lazy version of null_data_check, reduces each partition to per column null flags instead of collecting the frame
+    :return: dask scalar
+    """
+    return data.isnull().any().any()
+
+
+def null_data_check_from_statistics(statistics=None) -> bool:
+    """
+    answer null_data_check from the per column null counts of dataset statistics (see dataset_statistics)
+    """
+    return any(null_count > 0 for null_count in statistics.null_counts.values())
+
+
+def null_data_check_failed_columns(data: pd.DataFrame = None) -> List[str]:
+    """
+    columns of a single partition holding null values
+    """
+    null_columns = data.isnull().any()
+    return list(null_columns.index[null_columns])
 
 
 def date_range_check_by_group(data: dd = None, groupby_columns: List[str] = None, date_range: Tuple[str] = None,
-                              date_column: str = None) -> bool:
+                              date_column: str = None, assume_partitioned: bool = False) -> bool:
     """
     Split input dataframe by group and check if the min and max date of each group falls outside of specified date range
     :param data: dask dataframe
     :param groupby_columns: list of column names to group by
     :param date_range: tuple defining required date range
     :param date_column: name of date column
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), check per partition
     :return: bool
     """
-    output_schema = ('date_range_bool', 'bool')
-    data = data.groupby(by=groupby_columns).apply(
-        lambda df_g: date_range_check(data=df_g, date_range=date_range, date_column=date_column),
-        meta=output_schema).reset_index()
-    return data['date_range_bool'].compute().any()
+    return bool(date_range_check_by_group_lazy(data=data, groupby_columns=groupby_columns, date_range=date_range,
+                                               date_column=date_column,
+                                               assume_partitioned=assume_partitioned).compute())
+
+
+def date_range_check_by_group_lazy(data: dd = None, groupby_columns: List[str] = None, date_range: Tuple[str] = None,
+                                   date_column: str = None, assume_partitioned: bool = False):
+    """
+    lazy version of date_range_check_by_group, the min and max date of each group are found with a tree reduction
+    instead of a shuffle, or within each partition when the data is partitioned by group
+    :return: dask scalar
+    """
+    if assume_partitioned:
+        return data.map_partitions(date_range_check_partition, groupby_columns=groupby_columns,
+                                   date_range=date_range, date_column=date_column,
+                                   meta=('date_range_bool', 'bool')).any()
+    group_dates = group_date_range(data=data, groupby_columns=groupby_columns, date_column=date_column)
+    return outside_date_range(min_dates=group_dates['min'], max_dates=group_dates['max'], date_range=date_range).any()
+
+
+def date_range_check_by_group_from_statistics(statistics=None, groupby_columns: List[str] = None,
+                                              date_range: Tuple[str] = None, date_column: str = None) -> bool:
+    """
+    answer date_range_check_by_group from the min and max date of every group in dataset statistics (see
+    dataset_statistics)
+    :return: bool, None if the statistics can not answer the check
+    """
+    grouping = statistics.get_grouping(groupby_columns=groupby_columns, date_column=date_column)
+    if grouping is None or not grouping['date_data_type'].startswith('datetime64'):
+        return None
+    group_dates = grouping['groups']
+    return bool(outside_date_range(min_dates=group_dates['min'], max_dates=group_dates['max'],
+                                   date_range=date_range).any())
 
 
 def date_range_check(data: dd = None, date_range: Tuple[str] = None, date_column: str = None) -> dd:
     """
     apply date range check on a single group
     """
-    f = partial(pd.to_datetime)
-    data['date_range_bool'] = (data[date_column].min() > f(date_range[0])) | (
-                data[date_column].max() < f(date_range[1]))
+    data['date_range_bool'] = outside_date_range(min_dates=data[date_column].min(), max_dates=data[date_column].max(),
+                                                 date_range=date_range)
     return data['date_range_bool']
+
+
+def date_range_check_partition(data: pd.DataFrame = None, groupby_columns: List[str] = None,
+                               date_range: Tuple[str] = None, date_column: str = None) -> pd.Series:
+    """
+    apply date range check on every group in a single partition
+    """
+    failed_groups = date_range_failed_groups(data=data, groupby_columns=groupby_columns, date_range=date_range,
+                                             date_column=date_column)
+    return pd.Series([bool(failed_groups)], name='date_range_bool')
+
+
+def date_range_failed_groups(data: pd.DataFrame = None, groupby_columns: List[str] = None,
+                             date_range: Tuple[str] = None, date_column: str = None) -> List[list]:
+    """
+    groups of a single partition whose min or max date falls outside of the date range
+    :return: list of group values
+    """
+    group_dates = group_date_range(data=data, groupby_columns=groupby_columns, date_column=date_column)
+    failed = outside_date_range(min_dates=group_dates['min'], max_dates=group_dates['max'], date_range=date_range)
+    return [list(group) if isinstance(group, tuple) else [group] for group in group_dates.index[failed.to_numpy()]]
+
+
+def group_date_range(data: dd = None, groupby_columns: List[str] = None, date_column: str = None) -> dd:
+    """
+    min and max date of every group, of a dask dataframe or of a single pandas partition
+    :return: dataframe indexed by group with columns min and max
+    """
+    return data.groupby(by=groupby_columns)[date_column].agg(['min', 'max'])
+
+
+def outside_date_range(min_dates=None, max_dates=None, date_range: Tuple[str] = None):
+    """
+    true where a min date falls after the start or a max date falls before the end of date_range, for scalars and for
+    pandas or dask series of dates
+    """
+    return (min_dates > pd.to_datetime(date_range[0])) | (max_dates < pd.to_datetime(date_range[1]))
@@ -0,0 +1,242 @@
+import json
+import time
+import logging
+import contextlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+from candlestick_data_pipeline import data_io
+from candlestick_data_pipeline import manifest
+
+logger = logging.getLogger(__name__)
+
+
+class StepNode:
+    """
+    Node of a prefix tree of transformation steps. The path from the root to a node is a prefix of the steps of every
+    pipeline version listed in versions, so its output is computed once for all of them
+    """
+
+    def __init__(self, step: list = None, parent: 'StepNode' = None):
+        self.step = step
+        self.parent = parent
+        self.children = {}
+        self.versions = []
+        # versions whose last step is this node
+        self.leaf_versions = []
+
+    def depth(self) -> int:
+        return 0 if self.parent is None else self.parent.depth() + 1
+
+
+def step_key(step: list = None) -> str:
+    """
+    identity of a transformation step, steps with equal names and arguments share a node
+    """
+    name, arguments = step
+    return json.dumps([name, arguments], sort_keys=True, default=str)
+
+
+def build_prefix_tree(version_steps: Dict[str, List[list]] = None) -> StepNode:
+    """
+    Merge the transformation steps of several pipeline versions into a prefix tree, versions share a node for as long
+    as their steps are equal
+    :param version_steps: dictionary of the format {version label: list of [transformation name, arguments]}
+    :return: root node, its step is None
+    """
+    root = StepNode()
+    for version, steps in version_steps.items():
+        node = root
+        node.versions.append(version)
+        for step in steps:
+            key = step_key(step)
+            if key not in node.children:
+                node.children[key] = StepNode(step=step, parent=node)
+            node = node.children[key]
+            node.versions.append(version)
+        node.leaf_versions.append(version)
+    return root
+
+
+def explain_prefix_tree(root: StepNode = None) -> str:
+    """
+    one line per step, indented by depth, with the versions sharing it
+    """
+    lines = []
+    nodes = list(reversed(list(root.children.values())))
+    while nodes:
+        node = nodes.pop()
+        name, arguments = node.step
+        lines.append(f"{'  ' * (node.depth() - 1)}{name} {arguments or ''} <- {', '.join(node.versions)}")
+        nodes.extend(reversed(list(node.children.values())))
+    return '\n'.join(lines)
+
+
+def shared_step_count(root: StepNode = None) -> Tuple[int, int]:
+    """
+    steps computed by the fan out and steps standalone runs would compute
+    """
+    computed, standalone = 0, 0
+    nodes = list(root.children.values())
+    while nodes:
+        node = nodes.pop()
+        computed += 1
+        standalone += len(node.versions)
+        nodes.extend(node.children.values())
+    return computed, standalone
+
+
+def read_signature(pipeline_manager=None, source_file_path: Path = None) -> str:
+    """
+    versions with equal read signatures parse the source into the same dataframe and share a single read, the
+    signature covers the input schema, all read options, the columns required by the steps and the partition sizes of
+    the memory budget of the run
+    """
+    return json.dumps([pipeline_manager.input_schema, pipeline_manager.read_options,
+                       pipeline_manager.required_columns(),
+                       pipeline_manager.memory_budget_read_options(source_file_path)], sort_keys=True, default=str)
+
+
+def version_label(pipeline_manager=None) -> str:
+    return f'{pipeline_manager.name}_v{pipeline_manager.version}'
+
+
+def run_fan_out(pipeline_managers: List = None, source_file_path: Path = None, load_control_key: str = None) -> dict:
+    """
+    Process one source file for several pipeline versions at once, e.g. versions run side by side for A/B validation.
+    Versions with the same input schema share a single read of the source, their transformation steps are merged into
+    a prefix tree (see build_prefix_tree) and every shared prefix is applied once, branching only where the configs
+    differ. The input and staging writes of all versions and the statistics of their staging datasets are computed
+    in a single pass, so the source is parsed once and every shared step runs once. Each staging dataset is the same
+    as the one a standalone process_new_dataset run of its version writes. Each version reads the source with its
+    own read options and memory budget, the single compute runs within the budget with the fewest dask workers.
+    Incremental versions and the transformation cache are not supported since both depend on the state of a single
+    version
+    :param pipeline_managers: PipelineManager of every version
+    :param source_file_path: Path to input dataset
+    :param load_control_key: Key to be used to identify dataset through ETL process
+    :return: dictionary of the format {version label: staging row count}
+    """
+    for pipeline_manager in pipeline_managers:
+        if pipeline_manager.incremental:
+            raise Exception(f"Fan out does not support incremental pipeline {version_label(pipeline_manager)}")
+        if pipeline_manager.get_transformation_cache() is not None:
+            raise Exception(f"Fan out does not support the transformation cache of pipeline "
+                            f"{version_label(pipeline_manager)}")
+    start = time.time()
+    read_groups = {}
+    for pipeline_manager in pipeline_managers:
+        pipeline_manager.memory_budget = pipeline_manager.get_memory_budget(
+            run_name=f'{load_control_key}_transformation')
+        read_groups.setdefault(read_signature(pipeline_manager, source_file_path), []).append(pipeline_manager)
+    with contextlib.ExitStack() as memory_budgets:
+        # the settings of the budget entered last apply, enter the budget with the fewest workers last
+        for pipeline_manager in sorted([pipeline_manager for pipeline_manager in pipeline_managers
+                                        if pipeline_manager.memory_budget is not None],
+                                       key=lambda pipeline_manager: -pipeline_manager.memory_budget.workers):
+            memory_budgets.enter_context(pipeline_manager.run_within_memory_budget())
+        results = compute_fan_out(read_groups=read_groups, source_file_path=source_file_path,
+                                  load_control_key=load_control_key)
+    staging_row_counts = {}
+    for pipeline_manager in pipeline_managers:
+        label = version_label(pipeline_manager)
+        result = results[label]
+        staging_statistics = result['staging_statistics']
+        byte_sizes = {dataset_type: data_io.dataset_size(pipeline_manager.find_dataset_path(
+            load_control_key=load_control_key, dataset_type=dataset_type)) for dataset_type in ['input', 'staging']}
+        pipeline_manager.record_dataset(load_control_key=load_control_key, dataset_type='input',
+                                        schema_hash=result['input_schema_hash'], row_count=result['input_row_count'],
+                                        byte_size=byte_sizes['input'])
+        pipeline_manager.record_dataset(load_control_key=load_control_key, dataset_type='staging',
+                                        schema_hash=manifest.schema_hash(pipeline_manager.data),
+                                        row_count=staging_statistics.row_count, byte_size=byte_sizes['staging'],
+                                        group_dates=pipeline_manager.group_dates(staging_statistics))
+        staging_row_counts[label] = staging_statistics.row_count
+    logger.info(f'\n\nFan out of {len(pipeline_managers)} versions complete in {round(time.time() - start, 2)}s')
+    return staging_row_counts
+
+
+def compute_fan_out(read_groups: Dict[str, List] = None, source_file_path: Path = None,
+                    load_control_key: str = None) -> dict:
+    """
+    Read the source once per read group, transform it along the prefix tree of the versions of the group and write
+    the input and staging datasets of every version in a single compute
+    :param read_groups: dictionary of the format {read signature: PipelineManager of every version in the group}
+    :param source_file_path: Path to input dataset
+    :param load_control_key: Key to be used to identify dataset through ETL process
+    :return: dictionary of the format {version label: {'input_row_count': ..., 'input_schema_hash': ...,
+    'staging_statistics': DatasetStatistics, ...}}
+    """
+    import dask
+    lazy_results = {}
+    for read_group in read_groups.values():
+        first_manager = read_group[0]
+        source_data = data_io.read_data_by_file_extension(
+            source_file_path, schema=first_manager.input_schema,
+            project_columns=first_manager.read_options.get('project_columns', False),
+            required_columns=first_manager.required_columns(),
+            **first_manager.memory_budget_read_options(source_file_path))
+        for pipeline_manager in read_group:
+            pipeline_manager.data = source_data.copy()
+            pipeline_manager.partitioning = None
+            lazy_results[version_label(pipeline_manager)] = {
+                'input_write': pipeline_manager.save_input_data(load_control_key, source_file_path=source_file_path,
+                                                                compute=False),
+                'input_row_count': pipeline_manager.data.shape[0],
+                'input_schema_hash': manifest.schema_hash(pipeline_manager.data)}
+        # equal input schemas enforce the same data types, enforce them once for the whole group
+        first_manager.data = source_data.copy()
+        first_manager.enforce_input_schema()
+        leaves = transform_prefix_tree(pipeline_managers=read_group, input_data=first_manager.data)
+        for pipeline_manager in read_group:
+            pipeline_manager.data, pipeline_manager.partitioning = leaves[version_label(pipeline_manager)]
+            pipeline_manager.data = pipeline_manager.data.copy()
+            pipeline_manager.enforce_output_schema()
+            lazy_results[version_label(pipeline_manager)].update(
+                staging_statistics=pipeline_manager.save_staging_data(load_control_key, compute=False))
+    (results,) = dask.compute(lazy_results, optimize_graph=False)
+    return results
+
+
+def transform_prefix_tree(pipeline_managers: List = None, input_data=None) -> dict:
+    """
+    Apply the steps of a prefix tree of the transformation steps of pipeline_managers depth first, each node once on
+    the output of its parent, with the PipelineManager of the first version sharing the node
+    :param pipeline_managers: PipelineManager of every version, all reading input_data
+    :param input_data: dask dataframe after input schema enforcement
+    :return: dictionary of the format {version label: (transformed dask dataframe, partitioning)}
+    """
+    managers = {version_label(pipeline_manager): pipeline_manager for pipeline_manager in pipeline_managers}
+    root = build_prefix_tree({label: pipeline_manager.get_transformation_steps()
+                              for label, pipeline_manager in managers.items()})
+    computed, standalone = shared_step_count(root)
+    logger.info(f'\n\nFan out plan, {computed} of {standalone} transformation steps computed:\n'
+                f'{explain_prefix_tree(root)}')
+    leaves = {}
+    nodes = [(root, input_data, None)]
+    while nodes:
+        node, data, data_partitioning = nodes.pop()
+        if node.step is not None:
+            pipeline_manager = managers[node.versions[0]]
+            pipeline_manager.data, pipeline_manager.partitioning = data.copy(), data_partitioning
+            pipeline_manager.apply_transformation(transformation=node.step)
+            data, data_partitioning = pipeline_manager.data, pipeline_manager.partitioning
+        for label in node.leaf_versions:
+            leaves[label] = (data, data_partitioning)
+        nodes.extend((child, data, data_partitioning) for child in node.children.values())
+    return leaves
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Process one source file for several pipeline versions at once')
+    parser.add_argument('--home-directory', required=True)
+    parser.add_argument('--pipeline-name', required=True)
+    parser.add_argument('--pipeline-versions', nargs='+', required=True)
+    parser.add_argument('--source-file-path', required=True)
+    parser.add_argument('--load-control-key', required=True)
+    arguments = parser.parse_args()
+    from candlestick_data_pipeline import PipelineManager
+    print(json.dumps(run_fan_out(
+        pipeline_managers=[PipelineManager(arguments.home_directory, arguments.pipeline_name, version)
+                           for version in arguments.pipeline_versions],
+        source_file_path=Path(arguments.source_file_path), load_control_key=arguments.load_control_key), indent=2))
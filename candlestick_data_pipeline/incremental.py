@@ -0,0 +1,99 @@
+import pandas as pd
+from pathlib import Path
+from typing import List, Tuple
+from candlestick_data_pipeline import planning
+
+INCREMENTAL_STATE_COLUMN = '_incremental_state_row'
+ROW_LOCAL_TRANSFORMATIONS = ('format_date_columns', 'drop_rows_with_any_null_values', 'drop_duplicate_rows',
+                             'filter_by_date_range', 'partition_by_group')
+
+
+def split_incremental_steps(transformation_steps: List[list] = None) -> Tuple[List[list], List[list]]:
+    """
+    Split transformation steps into the row steps that only need the new rows and the window steps that also need the
+    tail of earlier rows of each group. Window steps are fused into windowed_metrics_by_group so every window reads
+    its group in date order
+    :param transformation_steps: list of [transformation name, arguments]
+    :return: row steps, window steps
+    """
+    window_start = next((index for index, (name, arguments) in enumerate(transformation_steps)
+                         if name in planning.WINDOWED_TRANSFORMATIONS), len(transformation_steps))
+    row_steps = transformation_steps[:window_start]
+    window_steps = planning.fuse_windowed_transformations(steps=transformation_steps[window_start:], notes=[])
+    groupby_columns, date_column = window_keys(window_steps)
+    for name, arguments in row_steps + window_steps:
+        if name != 'windowed_metrics_by_group' and not is_row_local(name=name, arguments=arguments,
+                                                                    date_column=date_column):
+            raise Exception(f"Transformation {name} is not supported in incremental mode")
+    return row_steps, window_steps
+
+
+def is_row_local(name: str = None, arguments: dict = None, date_column: str = None) -> bool:
+    """
+    check if a transformation computes each output row from rows of the same date only
+    """
+    if name == 'agg_insert_by_group':
+        return date_column in arguments['groupby_columns']
+    if name == 'agg_insert_grouping_sets':
+        return all(date_column in grouping_set for grouping_set in arguments['grouping_sets'])
+    return name in ROW_LOCAL_TRANSFORMATIONS
+
+
+def window_keys(window_steps: List[list] = None) -> Tuple[List[str], str]:
+    """
+    groupby columns and date column shared by all window steps
+    """
+    keys = {(tuple(arguments['groupby_columns']), arguments['date_column'])
+            for name, arguments in window_steps if name == 'windowed_metrics_by_group'}
+    if len(keys) > 1:
+        raise Exception(f"Incremental mode needs every window step to use the same groupby_columns and date_column, "
+                        f"found {keys}")
+    if not keys:
+        return None, None
+    groupby_columns, date_column = keys.pop()
+    return list(groupby_columns), date_column
+
+
+def lookback_rows(window_steps: List[list] = None) -> int:
+    """
+    Number of earlier rows per group needed to recompute the window steps exactly for new rows. Chained windows add up,
+    e.g. a yoy change of a 7 day rolling sum needs 365 + 6 earlier rows
+    """
+    lookback = 0
+    for name, arguments in window_steps:
+        if name != 'windowed_metrics_by_group':
+            continue
+        for metric in arguments['metrics']:
+            if metric['operation'] == 'yoy_pct_change':
+                lookback += 365
+            elif metric['operation'] == 'pct_change':
+                lookback += metric['periods']
+            else:
+                lookback += metric['window'] - 1
+    return lookback
+
+
+def tail_by_group(data: pd.DataFrame = None, groupby_columns: List[str] = None, date_column: str = None,
+                  rows: int = None) -> pd.DataFrame:
+    """
+    last rows of each group in date order
+    """
+    data = data.sort_values(groupby_columns + [date_column], kind='mergesort')
+    return data.groupby(groupby_columns, sort=False).tail(rows).reset_index(drop=True)
+
+
+def load_state(state_path: Path = None) -> pd.DataFrame:
+    """
+    load carried over window state, None if no state has been promoted yet
+    """
+    if not Path(state_path).exists():
+        return None
+    return pd.read_parquet(state_path)
+
+
+def save_state(state: pd.DataFrame = None, state_path: Path = None):
+    """
+    write window state for the next incremental run
+    """
+    Path(state_path).parent.mkdir(parents=True, exist_ok=True)
+    state.to_parquet(state_path, index=False)
@@ -0,0 +1,348 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+
+# largest scale factor decay ** -block used by linear_recurrence, leaving ample float64 range for the sums
+RECURRENCE_SCALE_LIMIT = 1e100
+
+
+def group_offsets(data: pd.DataFrame = None, groupby_columns: List[str] = None) -> np.ndarray:
+    """
+    Find the offsets of each group in a dataframe that is already sorted by the groupby columns
+    :param data: pandas dataframe sorted by groupby columns
+    :param groupby_columns: list of columns defining the groups
+    :return: array of length number of groups + 1, group i is found at rows offsets[i]:offsets[i + 1]
+    """
+    n_rows = len(data)
+    if n_rows == 0:
+        return np.zeros(1, dtype=np.int64)
+    group_changed = np.zeros(n_rows, dtype=bool)
+    group_changed[0] = True
+    for column in groupby_columns:
+        values = data[column].to_numpy()
+        group_changed[1:] |= values[1:] != values[:-1]
+    return np.append(np.flatnonzero(group_changed), n_rows).astype(np.int64)
+
+
+def group_starts(offsets: np.ndarray = None) -> np.ndarray:
+    """
+    Expand group offsets to the row position of the first row of each row's group
+    """
+    return np.repeat(offsets[:-1], np.diff(offsets))
+
+
+def window_bounds(starts: np.ndarray = None, window: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the first row (inclusive) and last row (exclusive) of the trailing window ending at each row, clipped to the
+    start of the row's group
+    """
+    row_positions = np.arange(len(starts))
+    return np.maximum(row_positions - window + 1, starts), row_positions + 1
+
+
+def group_cumsum(values: np.ndarray = None, starts: np.ndarray = None) -> np.ndarray:
+    """
+    Inclusive cumulative sum of values restarting at the first row of every group, so the running totals of a group
+    never carry the magnitude of the groups before it
+    :param values: values for all groups, without nulls
+    :param starts: first row of each row's group, see group_starts
+    """
+    return pd.Series(values).groupby(starts, sort=False).cumsum().to_numpy()
+
+
+def rolling_sum_count(values: np.ndarray = None, starts: np.ndarray = None,
+                      window: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trailing window sum and count of non null values for every row using prefix sums. The prefix sums restart at
+    every group and are taken over the values centered on their group mean, so each window sum is the difference of
+    two running totals of the size of its own group's deviations rather than of the whole partition
+    :param values: metric values for all groups
+    :param starts: first row of each row's group, see group_starts
+    :param window: number of rows in the window
+    :return: window sums and window counts
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    group_means = np.nan_to_num(pd.Series(values).groupby(starts, sort=False).transform('mean').to_numpy())
+    prefix_sum = group_cumsum(values=np.where(valid, values - group_means, 0.0), starts=starts)
+    prefix_count = group_cumsum(values=valid.astype(np.int64), starts=starts)
+    lower, upper = window_bounds(starts=starts, window=window)
+    row_positions = upper - 1
+    has_before = lower > starts
+    before = np.maximum(lower - 1, 0)
+    window_count = prefix_count[row_positions] - np.where(has_before, prefix_count[before], 0)
+    window_sum = prefix_sum[row_positions] - np.where(has_before, prefix_sum[before], 0.0)
+    return window_sum + window_count * group_means, window_count
+
+
+def rolling_sum(values: np.ndarray = None, starts: np.ndarray = None, window: int = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).rolling(window, min_periods=0).sum()
+    """
+    window_sum, window_count = rolling_sum_count(values=values, starts=starts, window=window)
+    return window_sum
+
+
+def rolling_mean(values: np.ndarray = None, starts: np.ndarray = None, window: int = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).rolling(window, min_periods=0).mean()
+    """
+    window_sum, window_count = rolling_sum_count(values=values, starts=starts, window=window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_count > 0, window_sum / window_count, np.nan)
+
+
+def rolling_std(values: np.ndarray = None, starts: np.ndarray = None, window: int = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).rolling(window, min_periods=0).std(). The variance is computed in two passes, the
+    squared deviations of every window from its own mean are summed directly instead of subtracting the squared mean
+    from the mean of squares, so it stays exact however large the values are relative to their spread. The cost is
+    O(rows * window)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    window_sum, window_count = rolling_sum_count(values=values, starts=starts, window=window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        window_mean = np.where(window_count > 0, window_sum / window_count, 0.0)
+    lower, upper = window_bounds(starts=starts, window=window)
+    row_positions = upper - 1
+    square_sum = np.zeros(len(values))
+    for offset in range(int((upper - lower).max()) if len(values) else 0):
+        rows = np.flatnonzero(row_positions - offset >= lower)
+        deviations = values[rows - offset] - window_mean[rows]
+        square_sum[rows] += np.where(np.isnan(deviations), 0.0, deviations ** 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_count > 1, np.sqrt(square_sum / (window_count - 1)), np.nan)
+
+
+def rolling_extreme(values: np.ndarray = None, starts: np.ndarray = None, window: int = None,
+                    extreme_function=np.fmin) -> np.ndarray:
+    """
+    Trailing window min or max for every row. Uses a sparse table of power of two window extremes so the cost is
+    O(rows * log(window)) and every row is answered by combining two overlapping power of two windows
+    :param extreme_function: np.fmin or np.fmax, both ignore null values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lower, upper = window_bounds(starts=starts, window=window)
+    window_lengths = upper - lower
+    output = np.full(len(values), np.nan)
+    level_extremes = values.copy()  # extreme of the 2 ** level rows ending at each row
+    level = 0
+    while len(values) and (1 << level) <= window_lengths.max():
+        width = 1 << level
+        rows = np.flatnonzero((window_lengths >= width) & (window_lengths < width << 1))
+        output[rows] = extreme_function(level_extremes[rows], level_extremes[lower[rows] + width - 1])
+        shifted = np.full(len(values), np.nan)
+        if width < len(values):
+            shifted[width:] = level_extremes[:-width]
+        level_extremes = extreme_function(level_extremes, shifted)
+        level += 1
+    return output
+
+
+def rolling_min(values: np.ndarray = None, starts: np.ndarray = None, window: int = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).rolling(window, min_periods=0).min()
+    """
+    return rolling_extreme(values=values, starts=starts, window=window, extreme_function=np.fmin)
+
+
+def rolling_max(values: np.ndarray = None, starts: np.ndarray = None, window: int = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).rolling(window, min_periods=0).max()
+    """
+    return rolling_extreme(values=values, starts=starts, window=window, extreme_function=np.fmax)
+
+
+def forward_fill(values: np.ndarray = None, starts: np.ndarray = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).ffill()
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values
+    row_positions = np.arange(len(values))
+    last_valid = np.maximum.accumulate(np.where(~np.isnan(values), row_positions, -1))
+    return np.where(last_valid >= starts, values[np.maximum(last_valid, 0)], np.nan)
+
+
+def lag(values: np.ndarray = None, starts: np.ndarray = None, periods: int = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).shift(periods)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lagged_positions = np.arange(len(values)) - periods
+    output = np.full(len(values), np.nan)
+    has_lag = lagged_positions >= starts
+    output[has_lag] = values[lagged_positions[has_lag]]
+    return output
+
+
+def pct_change(values: np.ndarray = None, starts: np.ndarray = None, periods: int = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).pct_change(periods), null values are forward filled within the group first
+    """
+    filled = forward_fill(values=values, starts=starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return filled / lag(values=filled, starts=starts, periods=periods) - 1
+
+
+
+def linear_recurrence(inputs: np.ndarray = None, resets: np.ndarray = None, decay: float = None) -> np.ndarray:
+    """
+    Solve y[t] = inputs[t] where resets[t] and y[t] = decay * y[t - 1] + inputs[t] otherwise without a per row loop.
+    Within a block y[t] = decay ** t * (prefix[t] - prefix[last reset - 1]) where prefix is the cumulative sum of
+    inputs[j] * decay ** -j. Blocks are short enough that decay ** -block stays within RECURRENCE_SCALE_LIMIT and the
+    last value of a block is carried into the next, so the loop runs once per block instead of once per row
+    :param inputs: input of every row
+    :param resets: rows where the recurrence restarts, e.g. the first row of each group
+    :param decay: factor applied to the previous output, between 0 and 1
+    :return: output of every row
+    """
+    inputs = np.asarray(inputs, dtype=np.float64)
+    if decay == 0 or len(inputs) == 0:
+        return inputs.copy()
+    output = np.empty(len(inputs))
+    block_size = max(int(np.log(RECURRENCE_SCALE_LIMIT) / -np.log(decay)), 1)
+    carry = 0.0
+    for block_start in range(0, len(inputs), block_size):
+        block_inputs = inputs[block_start:block_start + block_size]
+        positions = np.arange(len(block_inputs))
+        prefix = np.cumsum(block_inputs * decay ** -positions.astype(np.float64))
+        last_reset = np.maximum.accumulate(np.where(resets[block_start:block_start + block_size], positions, -1))
+        before_reset = np.where(last_reset > 0, prefix[np.maximum(last_reset - 1, 0)], 0.0)
+        block_output = decay ** positions * (prefix - before_reset)
+        # rows whose group started in an earlier block continue from its last output
+        block_output += np.where(last_reset < 0, carry * decay ** (positions + 1), 0.0)
+        output[block_start:block_start + len(block_inputs)] = block_output
+        carry = block_output[-1]
+    return output
+
+
+def ewm_mean(values: np.ndarray = None, starts: np.ndarray = None, alpha: float = None) -> np.ndarray:
+    """
+    equivalent to groupby(...).ewm(alpha=alpha, adjust=False, ignore_na=True).mean(), null values are skipped by the
+    recurrence and take the last average of their group
+    """
+    values = np.asarray(values, dtype=np.float64)
+    output = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0:
+        return output
+    valid_starts = starts[valid]
+    resets = np.ones(len(valid), dtype=bool)
+    resets[1:] = valid_starts[1:] != valid_starts[:-1]
+    inputs = np.where(resets, values[valid], alpha * values[valid])
+    output[valid] = linear_recurrence(inputs=inputs, resets=resets, decay=1 - alpha)
+    return forward_fill(values=output, starts=starts)
+
+
+def rsi(values: np.ndarray = None, starts: np.ndarray = None, window: int = None) -> np.ndarray:
+    """
+    Relative strength index, 100 - 100 / (1 + average gain / average loss) of the changes between consecutive rows
+    of a group, averaged with Wilder smoothing (ewm_mean with alpha = 1 / window)
+    """
+    changes = np.asarray(values, dtype=np.float64) - lag(values=values, starts=starts, periods=1)
+    average_gain = ewm_mean(values=np.where(changes > 0, changes, np.where(np.isnan(changes), np.nan, 0.0)),
+                            starts=starts, alpha=1 / window)
+    average_loss = ewm_mean(values=np.where(changes < 0, -changes, np.where(np.isnan(changes), np.nan, 0.0)),
+                            starts=starts, alpha=1 / window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100 - 100 / (1 + average_gain / average_loss)
+
+
+def true_range(high: np.ndarray = None, low: np.ndarray = None, close: np.ndarray = None,
+               starts: np.ndarray = None) -> np.ndarray:
+    """
+    largest of high - low and the distances of high and low from the previous close of the group, high - low on the
+    first row of a group
+    """
+    high, low = np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64)
+    previous_close = lag(values=close, starts=starts, periods=1)
+    return np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+
+
+def weighted_rolling_mean(values: np.ndarray = None, weights: np.ndarray = None, starts: np.ndarray = None,
+                          window: int = None) -> np.ndarray:
+    """
+    Trailing window sum of values * weights divided by the sum of weights, e.g. volume weighted average price. Rows
+    missing either value are skipped and window None averages over every earlier row of the group
+    """
+    values, weights = np.asarray(values, dtype=np.float64), np.asarray(weights, dtype=np.float64)
+    window = window or max(len(values), 1)
+    weighted_values = values * weights
+    weights = np.where(np.isnan(weighted_values), np.nan, weights)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return rolling_sum(values=weighted_values, starts=starts, window=window) / \
+            rolling_sum(values=weights, starts=starts, window=window)
+
+
+def fill_indexer(group_codes: np.ndarray = None, dates: np.ndarray = None, grid_dates: np.ndarray = None,
+                 fill_method: str = None) -> np.ndarray:
+    """
+    For every cell of the grid of all groups x grid_dates find the row of the same group it is filled from, equivalent
+    to reindexing each group on grid_dates with the fill method. All lookups are done with one searchsorted over
+    (group, date rank) keys
+    :param group_codes: group code 0..n_groups - 1 of every row, rows sorted by group code and date
+    :param dates: int64 date of every row
+    :param grid_dates: sorted int64 dates of the grid
+    :param fill_method: None for exact matches only, ffill/pad, bfill/backfill or nearest
+    :return: row position of every grid cell in group major order, -1 where there is no row to fill from
+    """
+    n_groups = int(group_codes[-1]) + 1 if len(group_codes) else 0
+    # rank dates on the union of row and grid dates so group and date fit in a single int64 key
+    unique_dates, date_ranks = np.unique(np.concatenate([dates, grid_dates]), return_inverse=True)
+    row_keys = group_codes.astype(np.int64) * len(unique_dates) + date_ranks[:len(dates)]
+    grid_groups = np.repeat(np.arange(n_groups, dtype=np.int64), len(grid_dates))
+    grid_date_values = np.tile(grid_dates, n_groups)
+    grid_keys = grid_groups * len(unique_dates) + np.tile(date_ranks[len(dates):], n_groups)
+    n_rows = len(row_keys)
+    backward = np.searchsorted(row_keys, grid_keys, side='right') - 1
+    forward = np.searchsorted(row_keys, grid_keys, side='left')
+    has_backward = backward >= 0
+    has_backward[has_backward] = group_codes[backward[has_backward]] == grid_groups[has_backward]
+    has_forward = forward < n_rows
+    has_forward[has_forward] = group_codes[forward[has_forward]] == grid_groups[has_forward]
+    if fill_method in ('ffill', 'pad'):
+        return np.where(has_backward, backward, -1)
+    if fill_method in ('bfill', 'backfill'):
+        return np.where(has_forward, forward, -1)
+    if fill_method == 'nearest':
+        backward_distance = grid_date_values - dates[np.clip(backward, 0, max(n_rows - 1, 0))]
+        forward_distance = dates[np.clip(forward, 0, max(n_rows - 1, 0))] - grid_date_values
+        # ties go to the later row like Index.get_indexer(method='nearest')
+        use_backward = has_backward & (~has_forward | (backward_distance < forward_distance))
+        return np.where(use_backward, backward, np.where(has_forward, forward, -1))
+    has_exact = has_forward.copy()
+    has_exact[has_exact] = row_keys[forward[has_exact]] == grid_keys[has_exact]
+    return np.where(has_exact, forward, -1)
+
+
+def lttb_indices(x: np.ndarray = None, y: np.ndarray = None, points: int = None) -> np.ndarray:
+    """
+    Largest triangle three buckets downsampling of a series sorted by x. The first and last points are kept and the
+    points between are split into points - 2 buckets keeping the point of each bucket forming the largest triangle
+    with the point kept from the previous bucket and the mean of the next bucket, which preserves the visual shape of
+    the series
+    :param x: x values in ascending order
+    :param y: y values, nulls are skipped
+    :param points: number of points to keep
+    :return: positions of the points kept
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if points is None or len(valid) <= max(points, 2):
+        return valid
+    x, y = x[valid], y[valid]
+    edges = np.linspace(1, len(x) - 1, points - 1).astype(np.int64)
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, len(x) - 1
+    for bucket in range(points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else len(x)
+        next_x, next_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        previous = kept[bucket]
+        areas = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous]) -
+                       (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        kept[bucket + 1] = start + np.argmax(areas)
+    return valid[kept]
@@ -0,0 +1,218 @@
+import json
+import sqlite3
+import hashlib
+import datetime
+import contextlib
+import pandas as pd
+import dask.dataframe as dd
+from pathlib import Path
+from typing import List, Tuple
+
+MANIFEST_FILE = 'manifest.sqlite'
+DATASET_TYPES = ('input', 'staging', 'output', 'failed')
+# seconds a writer waits for the lock held by another batch worker before failing
+BUSY_TIMEOUT = 60
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    load_control_key TEXT NOT NULL,
+    dataset_type TEXT NOT NULL,
+    data_path TEXT,
+    row_count INTEGER,
+    byte_size INTEGER,
+    schema_hash TEXT,
+    min_date TEXT,
+    max_date TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (load_control_key, dataset_type)
+);
+CREATE INDEX IF NOT EXISTS datasets_by_type ON datasets (dataset_type, load_control_key);
+CREATE TABLE IF NOT EXISTS group_dates (
+    load_control_key TEXT NOT NULL,
+    group_values TEXT NOT NULL,
+    min_date TEXT,
+    max_date TEXT,
+    PRIMARY KEY (load_control_key, group_values)
+);
+"""
+
+
+class DatasetManifest:
+    """
+    Transactional catalog of the datasets of a pipeline version stored in a SQLite file under version_path. Every
+    dataset is recorded with its key, dataset type (its stage: input/staging/output/failed), path, row count, byte
+    size, schema hash, min/max dates (per group as well) and timestamps, so listing and status lookups are indexed
+    queries instead of directory globs. The database runs in WAL mode and every change is a single immediate
+    transaction, so concurrent batch workers in threads or processes can update it safely
+    """
+
+    def __init__(self, manifest_path: Path = None, timeout: float = BUSY_TIMEOUT):
+        self.manifest_path = Path(manifest_path)
+        self.timeout = timeout
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def transaction(self, write: bool = False):
+        return sqlite_transaction(database_path=self.manifest_path, schema=SCHEMA, write=write, timeout=self.timeout)
+
+    def record_dataset(self, load_control_key: str = None, dataset_type: str = None, data_path: Path = None,
+                       row_count: int = None, byte_size: int = None, schema_hash: str = None,
+                       group_dates: pd.DataFrame = None):
+        """
+        record a newly written dataset, replacing an earlier record of the same key and dataset type
+        :param group_dates: dataframe indexed by group with min and max date columns (see
+        dataset_statistics.DatasetStatistics)
+        """
+        now = timestamp()
+        min_date, max_date = date_bounds(group_dates)
+        with self.transaction(write=True) as connection:
+            created = connection.execute('SELECT created_at FROM datasets WHERE load_control_key = ? AND '
+                                         'dataset_type = ?', (load_control_key, dataset_type)).fetchone()
+            connection.execute('INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               (load_control_key, dataset_type, str(data_path), row_count, byte_size, schema_hash,
+                                min_date, max_date, created['created_at'] if created else now, now))
+            if group_dates is not None:
+                connection.execute('DELETE FROM group_dates WHERE load_control_key = ?', (load_control_key,))
+                connection.executemany('INSERT INTO group_dates VALUES (?, ?, ?, ?)', group_date_rows(
+                    load_control_key=load_control_key, group_dates=group_dates))
+
+    def move_dataset(self, load_control_key: str = None, source_type: str = None, destination_type: str = None,
+                     data_path: Path = None):
+        """
+        record a dataset moving between stages, e.g. staging to output on promote
+        """
+        with self.transaction(write=True) as connection:
+            connection.execute('DELETE FROM datasets WHERE load_control_key = ? AND dataset_type = ?',
+                               (load_control_key, destination_type))
+            moved = connection.execute('UPDATE datasets SET dataset_type = ?, data_path = ?, updated_at = ? WHERE '
+                                       'load_control_key = ? AND dataset_type = ?',
+                                       (destination_type, str(data_path), timestamp(), load_control_key,
+                                        source_type)).rowcount
+            if not moved:
+                # dataset written before the manifest existed
+                now = timestamp()
+                connection.execute('INSERT INTO datasets (load_control_key, dataset_type, data_path, created_at, '
+                                   'updated_at) VALUES (?, ?, ?, ?, ?)',
+                                   (load_control_key, destination_type, str(data_path), now, now))
+
+    def backfill(self, datasets: List[Tuple[str, str, Path, int]] = None):
+        """
+        record datasets found on disk that are missing from the manifest, with unknown row counts and dates
+        :param datasets: list of (load_control_key, dataset_type, data_path, byte_size)
+        """
+        now = timestamp()
+        with self.transaction(write=True) as connection:
+            connection.executemany('INSERT OR IGNORE INTO datasets (load_control_key, dataset_type, data_path, '
+                                   'byte_size, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(key, dataset_type, str(data_path), byte_size, now, now)
+                                    for key, dataset_type, data_path, byte_size in datasets])
+
+    def list_keys(self, dataset_type: str = None, date_range: Tuple[str] = None) -> List[str]:
+        """
+        keys of every dataset of a dataset type, optionally only datasets that may hold dates in date_range. Datasets
+        with unknown dates are always listed
+        """
+        sql = 'SELECT load_control_key FROM datasets WHERE dataset_type = ?'
+        parameters = [dataset_type]
+        first_date, last_date = date_range or (None, None)
+        if first_date is not None:
+            sql += ' AND (max_date IS NULL OR max_date >= ?)'
+            parameters.append(format_date(first_date))
+        if last_date is not None:
+            sql += ' AND (min_date IS NULL OR min_date <= ?)'
+            parameters.append(format_date(last_date))
+        with self.transaction() as connection:
+            rows = connection.execute(sql + ' ORDER BY load_control_key', parameters).fetchall()
+        return [row['load_control_key'] for row in rows]
+
+    def status(self, load_control_key: str = None) -> List[dict]:
+        """
+        every record of a key, one per dataset type it is stored under
+        """
+        with self.transaction() as connection:
+            rows = connection.execute('SELECT * FROM datasets WHERE load_control_key = ? ORDER BY dataset_type',
+                                      (load_control_key,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def group_dates(self, load_control_key: str = None) -> List[dict]:
+        """
+        min and max date of every group of a dataset
+        """
+        with self.transaction() as connection:
+            rows = connection.execute('SELECT group_values, min_date, max_date FROM group_dates WHERE '
+                                      'load_control_key = ? ORDER BY group_values', (load_control_key,)).fetchall()
+        return [dict(row, group_values=json.loads(row['group_values'])) for row in rows]
+
+
+@contextlib.contextmanager
+def sqlite_transaction(database_path: Path = None, schema: str = None, write: bool = False,
+                       timeout: float = BUSY_TIMEOUT):
+    """
+    Open a connection to a SQLite database in WAL mode, creating it and its schema if needed, and run a single
+    transaction. A write transaction takes the write lock up front so concurrent writers queue on the busy timeout
+    instead of failing with a deadlock on lock upgrade
+    :param database_path: path of database file
+    :param schema: CREATE ... IF NOT EXISTS statements of the database
+    :param write: the transaction writes to the database
+    :param timeout: seconds to wait for a lock held by another connection
+    :return: sqlite3 connection
+    """
+    Path(database_path).parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(database_path, timeout=timeout, isolation_level=None)
+    try:
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(schema)
+        connection.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        try:
+            yield connection
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+    finally:
+        connection.close()
+
+
+def schema_hash(data: dd = None) -> str:
+    """
+    hash of the column names and data types of a dataset
+    """
+    schema = [[column, str(data_type)] for column, data_type in data.dtypes.items()]
+    return hashlib.sha256(json.dumps(schema).encode()).hexdigest()
+
+
+def group_date_rows(load_control_key: str = None, group_dates: pd.DataFrame = None) -> List[tuple]:
+    rows = []
+    for group_values, (min_date, max_date) in zip(group_dates.index, group_dates[['min', 'max']].itertuples(
+            index=False)):
+        group_values = list(group_values) if isinstance(group_values, tuple) else [group_values]
+        rows.append((load_control_key, json.dumps(group_values, default=str), format_date(min_date),
+                     format_date(max_date)))
+    return rows
+
+
+def date_bounds(group_dates: pd.DataFrame = None) -> Tuple[str, str]:
+    """
+    first and last date over all groups
+    """
+    if group_dates is None or group_dates.empty:
+        return None, None
+    return format_date(group_dates['min'].min()), format_date(group_dates['max'].max())
+
+
+def format_date(date) -> str:
+    """
+    ISO format so dates stored as text compare in date order
+    """
+    if date is None or pd.isnull(date):
+        return None
+    try:
+        return pd.Timestamp(date).isoformat()
+    except ValueError:
+        return str(date)
+
+
+def timestamp() -> str:
+    return datetime.datetime.now().isoformat()
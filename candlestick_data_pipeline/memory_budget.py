@@ -0,0 +1,101 @@
+import os
+import shutil
+import contextlib
+import dask
+import dask.dataframe as dd
+from pathlib import Path
+from candlestick_data_pipeline import data_io
+from candlestick_data_pipeline import pipeline_metrics
+
+# rough in memory size of a parsed dataset relative to its size on disk
+MEMORY_EXPANSION = {'.csv': 3, '.parquet': 6, '.json': 3}
+# share of available memory used as memory budget when no size is given
+DEFAULT_MEMORY_FRACTION = 0.5
+# a partition may briefly take several times its own size while a transformation copies it
+PARTITION_HEADROOM = 4
+MIN_PARTITION_BYTES = 4 * 2 ** 20
+MAX_PARTITION_BYTES = 256 * 2 ** 20
+
+
+class MemoryBudget:
+    """
+    Sizes dask work so a run stays within a memory budget. Input files are read in blocks small enough that every
+    dask worker thread can hold a partition (with headroom for the copies transformations make) inside the budget,
+    the number of worker threads is lowered when the budget cannot hold one partition per core, shuffles go through
+    local disk and datasets that would otherwise be persisted are spilled to local disk when they do not fit. Data is
+    then streamed through memory partition by partition so inputs several times larger than memory can be processed
+    """
+
+    def __init__(self, budget_bytes: int = None, memory_fraction: float = DEFAULT_MEMORY_FRACTION,
+                 workers: int = None, spill_directory: Path = None):
+        """
+        :param budget_bytes: memory budget, defaults to memory_fraction of the available memory
+        :param memory_fraction: share of the available memory used when budget_bytes is not given
+        :param workers: dask worker threads, defaults to the number of cores the budget can feed
+        :param spill_directory: local directory for the shuffle and spill files of a run
+        """
+        self.budget_bytes = budget_bytes or int(pipeline_metrics.available_memory() * memory_fraction)
+        max_workers = max(1, self.budget_bytes // (MIN_PARTITION_BYTES * PARTITION_HEADROOM * 2))
+        self.workers = min(workers or os.cpu_count(), max_workers)
+        self.spill_directory = Path(spill_directory)
+
+    def partition_bytes(self, extension: str = None) -> int:
+        """
+        on disk size of an input block whose parsed partition fits the budget share of one worker
+        """
+        worker_bytes = self.budget_bytes // (self.workers * PARTITION_HEADROOM)
+        partition_bytes = worker_bytes // MEMORY_EXPANSION.get(extension, max(MEMORY_EXPANSION.values()))
+        return int(min(max(partition_bytes, MIN_PARTITION_BYTES), MAX_PARTITION_BYTES))
+
+    def read_options(self, file_path: Path = None) -> dict:
+        """
+        keyword arguments of the read function sizing the partitions of a dataset
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension in ('.csv', '.parquet'):
+            return {'blocksize': self.partition_bytes(extension)}
+        return {}
+
+    def estimated_bytes(self, file_path: Path = None) -> int:
+        """
+        estimated in memory size of a dataset once parsed
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        return data_io.dataset_size(file_path) * MEMORY_EXPANSION.get(extension, max(MEMORY_EXPANSION.values()))
+
+    def fits(self, estimated_bytes: int = None) -> bool:
+        return estimated_bytes is not None and estimated_bytes <= self.budget_bytes
+
+    @contextlib.contextmanager
+    def run(self):
+        """
+        Apply the dask settings of the budget for the duration of a run and remove its shuffle and spill files after
+        """
+        self.spill_directory.mkdir(parents=True, exist_ok=True)
+        try:
+            with dask.config.set({'num_workers': self.workers, 'dataframe.shuffle.method': 'disk',
+                                  'temporary-directory': str(self.spill_directory)}):
+                yield self
+        finally:
+            self.clear_spill()
+
+    def persist(self, data: dd = None, estimated_bytes: int = None, name: str = None) -> dd:
+        """
+        Keep data for reuse, in memory when its estimated size fits the budget and otherwise spilled as parquet to
+        the spill directory, read back one partition per spilled file
+        :param estimated_bytes: estimated in memory size of data, unknown sizes are spilled
+        :param name: name of the spilled dataset
+        :return: dask dataframe
+        """
+        if self.fits(estimated_bytes):
+            return data.persist()
+        spill_path = Path(self.spill_directory / f'{name}.parquet')
+        data_io.write_data_by_file_extension(data=data, file_path=spill_path)
+        return data_io.read_parquet_dataset(spill_path, split_row_groups=False)
+
+    def clear_spill(self):
+        """
+        remove the shuffle and spill files of the run
+        """
+        if self.spill_directory.exists():
+            shutil.rmtree(self.spill_directory)
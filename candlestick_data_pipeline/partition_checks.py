@@ -0,0 +1,103 @@
+import logging
+import threading
+import dask.dataframe as dd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+from candlestick_data_pipeline import evaluations
+from candlestick_data_pipeline import partitioning
+
+# per partition checks returning what fails in a single partition (group values, or columns for the null check), an
+# empty list when the partition passes
+PARTITION_CHECKS = {'null_data_check': evaluations.null_data_check_failed_columns,
+                    'date_continuity_check_by_group': evaluations.date_continuity_failed_groups,
+                    'date_range_check_by_group': evaluations.date_range_failed_groups}
+MAX_REPORTED_FAILURES = 10
+
+logger = logging.getLogger(__name__)
+
+
+def partition_checked_evaluations(evaluation_list: List[list] = None, data_partitioning: dict = None) -> List[int]:
+    """
+    Evaluations that can be decided partition by partition: a failure found in one partition fails the whole dataset.
+    This holds for the null check on any data, and for the group-by checks when every group lies in a single partition
+    (see partition_by_group), otherwise a group's dates may be spread over several partitions
+    :param evaluation_list: evaluation list from the pipeline config
+    :param data_partitioning: partitioning of the data, None if the data is not partitioned
+    :return: positions in the evaluation list
+    """
+    positions = []
+    for position, (evaluation_name, evaluation_arguments) in enumerate(evaluation_list):
+        if evaluation_name not in PARTITION_CHECKS:
+            continue
+        if evaluation_name in partitioning.PARTITION_AWARE_EVALUATIONS and not partitioning.covers(
+                partitioning=data_partitioning, groupby_columns=evaluation_arguments['groupby_columns']):
+            continue
+        positions.append(position)
+    return positions
+
+
+def run_partition_checks(data: dd = None, evaluation_list: List[list] = None, positions: List[int] = None,
+                         max_workers: int = None) -> Tuple[Dict[int, bool], List[dict]]:
+    """
+    Run evaluations partition by partition on a thread pool, each partition is read once for all of them and its
+    results are streamed back as it completes. Partitions not started yet are cancelled as soon as any partition
+    fails, so a bad dataset is rejected after reading a few partitions instead of the whole dataset
+    :param data: dask dataframe, not persisted so every partition is read on its own
+    :param evaluation_list: evaluation list from the pipeline config
+    :param positions: positions of the evaluations to run, see partition_checked_evaluations
+    :param max_workers: partitions checked at once, defaults to the number of cores
+    :return: ({position: result} of the evaluations decided, list of failures), when a partition failed only the
+    failing evaluations are decided
+    """
+    stop_event = threading.Event()
+
+    def check_partition(partition_index: int) -> List[dict]:
+        if stop_event.is_set():
+            return []
+        partition = data.get_partition(partition_index).compute()
+        failures = []
+        for position in positions:
+            evaluation_name, evaluation_arguments = evaluation_list[position]
+            failed = PARTITION_CHECKS[evaluation_name](data=partition, **(evaluation_arguments or {}))
+            if failed:
+                failures.append({'evaluation': evaluation_name, 'position': position, 'partition': partition_index,
+                                 'failed_count': len(failed), 'failed': failed[:MAX_REPORTED_FAILURES]})
+        return failures
+
+    failures = []
+    checked_partitions = 0
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(check_partition, partition_index) for partition_index in range(data.npartitions)]
+    try:
+        for future in as_completed(futures):
+            checked_partitions += 1
+            failures.extend(future.result())
+            if failures:
+                logger.info(f'\nPartition failed after checking {checked_partitions} of {data.npartitions} '
+                            f'partitions, cancelling the remaining partitions')
+                break
+    finally:
+        stop_event.set()
+        # partitions already being checked finish before the dataset can be moved
+        executor.shutdown(wait=True, cancel_futures=True)
+    if failures:
+        # report failures of the partitions that completed while cancelling as well
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                failures.extend(failure for failure in future.result() if failure not in failures)
+        failures.sort(key=lambda failure: (failure['position'], failure['partition']))
+        return {failure['position']: True for failure in failures}, failures
+    return {position: False for position in positions}, failures
+
+
+def format_failures(failures: List[dict] = None) -> str:
+    """
+    one line per failing evaluation and partition with the groups (or columns) that failed
+    """
+    lines = []
+    for failure in failures:
+        failed_type = 'column(s)' if failure['evaluation'] == 'null_data_check' else 'group(s)'
+        more = f' (first {len(failure["failed"])} shown)' if failure['failed_count'] > len(failure['failed']) else ''
+        lines.append(f'{failure["evaluation"]} failed in partition {failure["partition"]} for '
+                     f'{failure["failed_count"]} {failed_type}{more}: {failure["failed"]}')
+    return '\n'.join(lines)
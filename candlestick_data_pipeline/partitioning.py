@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+from typing import List
+
+PARTITIONING_FILE = '_partitioning.json'
+# transformations accepting assume_partitioned=True to run per partition instead of shuffling
+PARTITION_AWARE_TRANSFORMATIONS = ('drop_duplicate_rows', 'rolling_mean_by_date_by_group',
+                                   'rolling_sum_by_date_by_group', 'yoy_percent_change_by_group',
+                                   'windowed_metrics_by_group', 'fill_missing_dates_by_group', 'ema_by_group',
+                                   'rsi_by_group', 'atr_by_group', 'vwap_by_group', 'bollinger_bands_by_group')
+PARTITION_AWARE_EVALUATIONS = ('date_continuity_check_by_group', 'date_range_check_by_group')
+# transformations whose output keeps every group of the input in a single partition
+PARTITION_PRESERVING_TRANSFORMATIONS = ('format_date_columns', 'drop_rows_with_any_null_values',
+                                        'filter_by_date_range') + PARTITION_AWARE_TRANSFORMATIONS
+
+
+def partitioning_after(name: str = None, arguments: dict = None, partitioning: dict = None) -> dict:
+    """
+    Partitioning of the data after a transformation step
+    :param name: transformation name
+    :param arguments: transformation arguments
+    :param partitioning: partitioning of the data before the step, None if the data is not partitioned
+    :return: dictionary of the format {'groupby_columns': [...], 'date_column': ...} or None
+    """
+    if name == 'partition_by_group':
+        return {'groupby_columns': list(arguments['groupby_columns']), 'date_column': arguments['date_column']}
+    if name in PARTITION_PRESERVING_TRANSFORMATIONS:
+        return partitioning
+    return None
+
+
+def covers(partitioning: dict = None, groupby_columns: List[str] = None) -> bool:
+    """
+    check if every group of groupby_columns lies in a single partition, which holds when the data is partitioned by a
+    subset of groupby_columns
+    """
+    return partitioning is not None and groupby_columns is not None and \
+        set(partitioning['groupby_columns']) <= set(groupby_columns)
+
+
+def partitioned_arguments(name: str = None, arguments: dict = None, partitioning: dict = None,
+                          columns: List[str] = None, partition_aware_functions: tuple = None) -> dict:
+    """
+    Add assume_partitioned=True to the arguments of a transformation or evaluation when the data is already
+    partitioned on its groups so it runs per partition without a shuffle
+    :param columns: columns of the data, drop_duplicate_rows without a subset groups on all of them
+    :param partition_aware_functions: names of functions accepting assume_partitioned
+    :return: arguments
+    """
+    arguments = dict(arguments or {})
+    if name not in partition_aware_functions:
+        return arguments
+    if name == 'drop_duplicate_rows':
+        groupby_columns = arguments.get('subset') or columns
+    else:
+        groupby_columns = arguments.get('groupby_columns')
+    if covers(partitioning=partitioning, groupby_columns=groupby_columns):
+        arguments['assume_partitioned'] = True
+    return arguments
+
+
+def carries_to_storage(partitioning: dict = None, storage_format: str = None, partition_columns: List[str] = None):
+    """
+    Parquet datasets keep one file per partition (per hive directory when partitioned on columns), so the
+    partitioning survives a write unless the hive partition columns split groups across directories. Csv datasets are
+    single files and are re-split on read
+    """
+    return partitioning is not None and storage_format == 'parquet' and \
+        set(partition_columns or []) <= set(partitioning['groupby_columns'])
+
+
+def write_partitioning(dataset_path: Path = None, partitioning: dict = None, previous_write=None):
+    """
+    record the partitioning of a parquet dataset in its metadata file
+    :param previous_write: write of the dataset, makes a lazy metadata write run after the dataset write
+    """
+    with open(Path(dataset_path) / PARTITIONING_FILE, 'w') as fp:
+        json.dump(partitioning, fp, indent=4)
+
+
+def read_partitioning(dataset_path: Path = None) -> dict:
+    """
+    partitioning recorded in the metadata of a dataset, None if it was not written partitioned
+    """
+    partitioning_path = Path(dataset_path) / PARTITIONING_FILE
+    if not partitioning_path.exists():
+        return None
+    with open(partitioning_path, 'r') as fp:
+        return json.load(fp)
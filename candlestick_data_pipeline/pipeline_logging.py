@@ -1,64 +1,247 @@
+import os
 import time
+import queue
+import uuid
+import atexit
 import logging
+import logging.handlers
 import datetime
+import threading
 import contextlib
+import contextvars
 from pathlib import Path
 import traceback
-import os
 
+LOGGER_NAME = 'candlestick_data_pipeline'
+DEFAULT_MAX_BYTES = 50 * 2 ** 20
+DEFAULT_BACKUP_COUNT = 5
+# longest wait for the listener to reach the end of a run before its file is closed directly
+RUN_CLOSE_TIMEOUT = 30
+RUN_CLOSE_POLL_INTERVAL = 0.5
+FORMATTER = logging.Formatter('%(message)s')
+
+logger = logging.getLogger(LOGGER_NAME)
+# id of the run whose log file records emitted in the current thread or task belong to
+current_run_id = contextvars.ContextVar('current_run_id', default=None)
+# queue, listener and run router of this process, rebuilt after a fork since the listener thread is not inherited
+logging_state = {}
+logging_lock = threading.Lock()
+
+
+class RunContextFilter(logging.Filter):
+    """
+    tag every record with the run id of the code emitting it, runs in the emitting thread
+    """
+
+    def filter(self, record):
+        record.run_id = current_run_id.get()
+        return True
+
+
+class RunFileRouter(logging.Handler):
+    """
+    Writes every record to the log file of the run that emitted it. Runs in the listener thread so concurrent runs never
+    block on file writes and never interleave in the same file
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.run_handlers = {}
+        self.run_handlers_lock = threading.Lock()
+
+    def add_run(self, run_id: str = None, handler: logging.Handler = None):
+        with self.run_handlers_lock:
+            self.run_handlers[run_id] = handler
+
+    def close_run(self, run_id: str = None):
+        with self.run_handlers_lock:
+            handler = self.run_handlers.pop(run_id, None)
+        if handler is not None:
+            handler.close()
+
+    def emit(self, record):
+        with self.run_handlers_lock:
+            handler = self.run_handlers.get(getattr(record, 'run_id', None))
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+
+
+class RunLogListener(logging.handlers.QueueListener):
+    """
+    QueueListener that also handles run close markers. A marker is queued behind every record of its run, so once the
+    listener reaches it the run file holds the complete run and can be closed
+    """
+
+    def __init__(self, log_queue: queue.Queue = None, router: RunFileRouter = None, *handlers):
+        super().__init__(log_queue, router, *handlers, respect_handler_level=True)
+        self.router = router
 
-def setup_logging(name="logger",
+    def handle(self, record):
+        close_event = getattr(record, 'close_run_event', None)
+        if close_event is not None:
+            self.router.close_run(record.run_id)
+            close_event.set()
+            return
+        super().handle(record)
+
+    def is_running(self) -> bool:
+        """
+        check if the listener thread is still consuming the queue, it stops at exit or if it died
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        """
+        stop the listener thread, a listener already stopped is left as is
+        """
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(name=LOGGER_NAME,
                   filepath=None,
                   stream_log_level="INFO",
-                  file_log_level="INFO"):
-    logger = logging.getLogger(name)
-    logger.setLevel("INFO")
-    formatter = logging.Formatter(
-        '%(message)s'
-    )
-    ch = logging.StreamHandler()
-    ch.setLevel(getattr(logging, stream_log_level))
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
-    if filepath is not None:
-        fh = logging.FileHandler(filepath)
-        fh.setLevel(getattr(logging, file_log_level))
-        fh.setFormatter(formatter)
-        logger.addHandler(fh)
+                  file_log_level="INFO",
+                  max_bytes=DEFAULT_MAX_BYTES,
+                  backup_count=DEFAULT_BACKUP_COUNT):
+    """
+    Route the package loggers through a queue to a background listener thread that writes to the console, to an
+    optional rotating log file and to the per run files opened by run_log. Emitting a record only puts it on the queue
+    so logging never blocks on io. Safe to call repeatedly, the first call in a process configures logging
+    :param name: logger to configure
+    :param filepath: optional rotating log file receiving every record
+    :param stream_log_level: level of console output
+    :param file_log_level: level of log files
+    :param max_bytes: size at which log files rotate
+    :param backup_count: number of rotated log files kept
+    :return: logging state dictionary
+    """
+    with logging_lock:
+        if logging_state.get('pid') == os.getpid():
+            return logging_state
+        package_logger = logging.getLogger(name)
+        package_logger.setLevel("INFO")
+        package_logger.propagate = False
+        for handler in list(package_logger.handlers):
+            # handlers inherited from the parent of a forked process feed a listener that does not run here
+            package_logger.removeHandler(handler)
+        ch = logging.StreamHandler()
+        ch.setLevel(getattr(logging, stream_log_level))
+        ch.setFormatter(FORMATTER)
+        handlers = [ch]
+        if filepath is not None:
+            fh = logging.handlers.RotatingFileHandler(filepath, maxBytes=max_bytes, backupCount=backup_count)
+            fh.setLevel(getattr(logging, file_log_level))
+            fh.setFormatter(FORMATTER)
+            handlers.append(fh)
+        log_queue = queue.Queue(-1)
+        router = RunFileRouter()
+        listener = RunLogListener(log_queue, router, *handlers)
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(RunContextFilter())
+        package_logger.addHandler(queue_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        logging_state.update({'pid': os.getpid(), 'queue': log_queue, 'listener': listener, 'router': router,
+                              'file_log_level': file_log_level})
+        return logging_state
 
 
-def print_footer(function_name, status, start):
-    print("\n\n-------------------------------------------------------------------------------------------")
-    print(datetime.datetime.now())
+@contextlib.contextmanager
+def run_log(log_path: Path = None, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT):
+    """
+    Send everything logged by the current thread to log_path while inside the context, in addition to the console.
+    Each run gets its own rotating file so concurrent runs in threads or worker processes stay separated. On exit the
+    queue is drained up to the end of the run and the file is closed. When the listener has stopped, or does not reach
+    the end of the run within RUN_CLOSE_TIMEOUT seconds, the file is closed directly and records still queued for the
+    run are dropped
+    :param log_path: path of run log file, replaced if it exists
+    :param max_bytes: size at which the run log rotates
+    :param backup_count: number of rotated run log files kept
+    :return: run id
+    """
+    state = setup_logging()
+    for path in run_log_paths(log_path):
+        path.unlink()
+    handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+    handler.setLevel(getattr(logging, state['file_log_level']))
+    handler.setFormatter(FORMATTER)
+    run_id = uuid.uuid4().hex
+    state['router'].add_run(run_id=run_id, handler=handler)
+    token = current_run_id.set(run_id)
+    try:
+        yield run_id
+    finally:
+        current_run_id.reset(token)
+        close_event = threading.Event()
+        state['queue'].put_nowait(logging.makeLogRecord({'run_id': run_id, 'close_run_event': close_event}))
+        deadline = time.time() + RUN_CLOSE_TIMEOUT
+        while not close_event.wait(timeout=RUN_CLOSE_POLL_INTERVAL):
+            if not state['listener'].is_running() or time.time() > deadline:
+                state['router'].close_run(run_id)
+                break
+
+
+def run_log_paths(log_path: Path = None):
+    """
+    a run log file and its rotated backups
+    """
+    log_path = Path(log_path)
+    return sorted(path for path in log_path.parent.glob(f'{log_path.name}*')
+                  if path.name == log_path.name or path.suffix.lstrip('.').isdigit())
+
+
+def log_footer(function_name, status, start):
+    logger.info("\n\n-------------------------------------------------------------------------------------------")
+    logger.info(datetime.datetime.now())
     if not status:
-        print(f"{function_name} Completed Successfully")
+        logger.info(f"{function_name} Completed Successfully")
     else:
-        print(f"{function_name} Failed")
+        logger.info(f"{function_name} Failed")
     end = time.time()
-    print("Total Runtime: {}s".format(round(end - start, 2)))
-    print("-------------------------------------------------------------------------------------------")
+    logger.info("Total Runtime: {}s".format(round(end - start, 2)))
+    logger.info("-------------------------------------------------------------------------------------------")
+
+
+def log_header(function_name, args, kwargs):
+    logger.info("\n\n-------------------------------------------------------------------------------------------")
+    logger.info(datetime.datetime.now())
+    logger.info(f"Running function: {function_name}")
+    logger.info(f"args: {args}\nkwargs: {kwargs}")
+    logger.info("-------------------------------------------------------------------------------------------")
+
+
+def print_footer(function_name, status, start):
+    """
+    kept for callers of the former print based helper, the footer now goes through the package logger
+    """
+    log_footer(function_name, status, start)
 
 
 def print_header(function_name, args, kwargs):
-    print("\n\n-------------------------------------------------------------------------------------------")
-    print(datetime.datetime.now())
-    print(f"Running function: {function_name}")
-    print(f"args: {args}\nkwargs: {kwargs}")
-    print("-------------------------------------------------------------------------------------------")
+    """
+    kept for callers of the former print based helper, the header now goes through the package logger
+    """
+    log_header(function_name, args, kwargs)
 
 
-def log_function(log_name =None, output_log_dir=os.getcwd(), error_log_dir=os.getcwd()):
+def log_function(log_name=None, output_log_dir=os.getcwd(), error_log_dir=os.getcwd(), max_bytes=DEFAULT_MAX_BYTES,
+                 backup_count=DEFAULT_BACKUP_COUNT):
+    """
+    Decorator logging a function run live to the console and to {log_name}_OUTPUT.log in output_log_dir. If the
+    function fails the log is moved to {log_name}_ERROR.log in error_log_dir and the error is raised again
+    """
     def log_this(func):
-        stdout_log_path = Path(f"{output_log_dir}/{log_name}_OUTPUT.log")
-        stderr_log_path = Path(f"{error_log_dir}/{log_name}_ERROR.log")
+        output_log_path = Path(f"{output_log_dir}/{log_name}_OUTPUT.log")
+        error_log_path = Path(f"{error_log_dir}/{log_name}_ERROR.log")
         if not Path(output_log_dir).exists():
-            Path(output_log_dir).mkdir(parents=True)
+            Path(output_log_dir).mkdir(parents=True, exist_ok=True)
         if not Path(error_log_dir).exists():
-            Path(error_log_dir).mkdir(parents=True)
+            Path(error_log_dir).mkdir(parents=True, exist_ok=True)
         def new_function(*args, **kwargs):
-            with contextlib.redirect_stdout(open(stdout_log_path, "w")):
+            with run_log(log_path=output_log_path, max_bytes=max_bytes, backup_count=backup_count):
                 start = time.time()
-                print_header(func.__name__, args, kwargs)
+                log_header(func.__name__, args, kwargs)
                 execution_failed = False
                 try:
                     output = func(*args, **kwargs)
@@ -67,16 +250,14 @@ def log_function(log_name =None, output_log_dir=os.getcwd(), error_log_dir=os.ge
                     execution_failed = True
 
                 if execution_failed:
-                    print(f"\n\n{func.__name__} failed with the following error:\n\n{full_tb}")
-                print_footer(func.__name__, execution_failed, start)
+                    logger.error(f"\n\n{func.__name__} failed with the following error:\n\n{full_tb}")
+                log_footer(func.__name__, execution_failed, start)
 
-            f = open(stdout_log_path, "r")
-            print(f.read())
-            f.close()
             if execution_failed:
-                if stderr_log_path.exists():
-                    os.remove(stderr_log_path)
-                stdout_log_path.rename(stderr_log_path)
+                for path in run_log_paths(error_log_path):
+                    path.unlink()
+                for path in run_log_paths(output_log_path):
+                    path.rename(Path(error_log_dir) / path.name.replace(output_log_path.name, error_log_path.name))
                 raise Exception(f"{func.__name__} failed with the following error:\n\n{full_tb}")
             return output
 
@@ -86,9 +267,9 @@ def log_function(log_name =None, output_log_dir=os.getcwd(), error_log_dir=os.ge
 
 
 def divideStrByInt(input_str=None):
-    print('\nhello\n\nNew line')
-    print(input_str)
-    print('New line')
+    logger.info('\nhello\n\nNew line')
+    logger.info(input_str)
+    logger.info('New line')
     dict_test = {'s': 1}
     q = dict_test['q']
     return
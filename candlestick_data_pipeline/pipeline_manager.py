@@ -0,0 +1,986 @@
+import json
+import glob
+import contextlib
+import logging
+import dask
+from pathlib import Path
+import dask.dataframe as dd
+import pandas as pd
+from candlestick_data_pipeline import data_io
+from candlestick_data_pipeline import transformations
+from candlestick_data_pipeline import visualizations
+from candlestick_data_pipeline import evaluations
+from candlestick_data_pipeline import pipeline_logging
+from candlestick_data_pipeline import registration
+from candlestick_data_pipeline import batch_processing
+from candlestick_data_pipeline import planning
+from candlestick_data_pipeline import incremental
+from candlestick_data_pipeline import transformation_cache
+from candlestick_data_pipeline import pipeline_metrics
+from candlestick_data_pipeline import partitioning
+from candlestick_data_pipeline import query
+from candlestick_data_pipeline import manifest
+from candlestick_data_pipeline import streaming_ingest
+from candlestick_data_pipeline import memory_budget
+from candlestick_data_pipeline import chart_rendering
+from candlestick_data_pipeline import fan_out
+from candlestick_data_pipeline import dataset_statistics
+from candlestick_data_pipeline import partition_checks
+from candlestick_data_pipeline import __version__
+from dask.base import tokenize
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+class PipelineManager:
+    """
+    A class to manage a data pipeline. A data pipeline is identified by a name, version, and home directory.
+    Functionality includes:
+    - Applying data transformations (see method process_new_dataset)
+    - Running Evaluations on output dataset ( see method evaluate_staging_dataset)
+    - Logging
+    - Visualizations
+    - Data storage
+    """
+
+    def __init__(self, home_directory: Path = None, pipeline_name: str = None, pipeline_version: str = None):
+        self.home_directory = str(home_directory)
+        self.name = str(pipeline_name)
+        self.version = str(pipeline_version)
+        self.version_path = Path(f"{self.home_directory}/candlestick_data_piplines/"
+                                 f"{self.name}/version={self.version}/")
+        pipeline_logging.setup_logging()
+        self.load_config()
+        self.metrics = pipeline_metrics.MetricsRecorder()
+        # {'groupby_columns': [...], 'date_column': ...} while every group of self.data lies in a single partition
+        self.partitioning = None
+        self.memory_budget = None
+        # failing groups and partitions found by the last fail fast evaluation (see evaluate_partitions)
+        self.evaluation_failures = []
+
+    def load_config(self):
+        """
+        Load pipeline config from storage layer
+        """
+        self.config_path = Path(self.version_path / f"{self.name}_v{self.version}_config.json")
+        if self.config_path.exists():
+            with open(self.config_path, 'r') as json_file:
+                self.config = json.load(json_file)
+                self.transformation_list = self.config['transformations']
+                self.visualization_list = self.config['visualizations']
+                self.evaluation_list = self.config['evaluations']
+                self.output_schema = self.config['output_schema']
+                self.input_schema = self.config['input_schema']
+                self.storage_format = self.config.get('storage_format', 'csv')
+                self.partition_columns = self.config.get('partition_columns')
+                self.compression = self.config.get('compression')
+                self.optimize_transformations = self.config.get('optimize_transformations', False)
+                self.incremental = self.config.get('incremental', False)
+                self.transformation_cache_settings = self.config.get('transformation_cache')
+                self.input_archive = self.config.get('input_archive', 'rewrite')
+                self.read_options = self.config.get('read_options') or {}
+                self.metrics_settings = self.config.get('metrics') or {}
+                self.memory_budget_settings = self.config.get('memory_budget')
+                self.fail_fast_evaluations = self.config.get('fail_fast_evaluations', False)
+                self.date_column = self.config.get('date_column', 'date')
+                self.symbol_column = self.config.get('symbol_column', 'symbol')
+                self.group_columns = self.config.get('group_columns') or [self.symbol_column]
+                self.input_schema = data_io.compact_schema(
+                    schema=self.input_schema, downcast_floats=self.read_options.get('downcast_floats', False),
+                    string_data_type=self.read_options.get('string_data_type'), date_columns=self.date_columns())
+        else:
+            raise Exception(
+                f"Pipeline {self.name} Version {self.version} not found at the following location {self.home_directory}")
+
+    def process_new_dataset_with_logging(self, source_file_path: Path = None, load_control_key: str = None):
+        """
+        Wrapper for process_new_dataset to handle logging of transformation run
+        :param source_file_path: Path to input dataset
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :return: None
+        """
+        logger.info(f'\n\nEvaluating Staging Dataset\nload_control_key={load_control_key}')
+        log_name = f'{self.name}_v{self.version}_{load_control_key}_transformation'
+        output_log_dir = Path(self.version_path / f"logs/transformation_logs/successful_run_logs/")
+        error_log_dir = Path(self.version_path / f"logs/transformation_logs/failed_run_logs/")
+        logger.info(f'\n\nLogging to the following locations:\n{output_log_dir}\n{error_log_dir}')
+        pipeline_logging.log_function(log_name=log_name, output_log_dir=output_log_dir, error_log_dir=error_log_dir)(
+            self.process_new_dataset)(source_file_path=source_file_path, load_control_key=load_control_key)
+
+    def process_new_dataset(self, source_file_path: Path = None, load_control_key: str = None,
+                            incremental_mode: bool = None):
+        """
+        Load new input dataset, apply transformations according to pipeline config, and write data to staging
+        :param source_file_path: Path to input dataset
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param incremental_mode: only transform the new rows using window state carried over from the last promoted
+        run (see transform_data_incrementally), defaults to the incremental setting in the pipeline config
+        :return: None
+        """
+        if incremental_mode is None:
+            incremental_mode = self.incremental
+        self.memory_budget = self.get_memory_budget(run_name=f'{load_control_key}_transformation')
+        with self.run_within_memory_budget(), \
+                self.get_metrics_recorder(run_name=f'{load_control_key}_transformation') as self.metrics:
+            with self.metrics.step(stage='read', name='read_input_dataset') as step:
+                self.data = data_io.read_data_by_file_extension(
+                    source_file_path, schema=self.input_schema,
+                    project_columns=self.read_options.get('project_columns', False),
+                    required_columns=self.required_columns(), **self.memory_budget_read_options(source_file_path))
+                self.data = step.data = self.metrics.materialize(self.data)
+                self.partitioning = None
+                step.bytes_read = data_io.dataset_size(source_file_path)
+            input_data_write = self.save_input_data(load_control_key, source_file_path=source_file_path,
+                                                    compute=False)
+            if incremental_mode or self.get_transformation_cache() is not None:
+                # these modes compute intermediate results before the staging write, keep the parsed input in memory
+                # (or spilled to local disk when over the memory budget) so the source is still only read once
+                self.data = self.persist_data(name='input', source_file_path=source_file_path)
+                input_data_write = self.save_input_data(load_control_key, source_file_path=source_file_path)
+            # taken before the schema enforcement and transformations, which may modify self.data in place
+            input_row_count, input_schema_hash = self.data.shape[0], manifest.schema_hash(self.data)
+            self.enforce_input_schema()
+            input_key = None
+            if self.get_transformation_cache() is not None:
+                input_key = transformation_cache.fingerprint_input(source_file_path=source_file_path, data=self.data)
+            if incremental_mode:
+                self.transform_data_incrementally(load_control_key=load_control_key, input_key=input_key)
+            else:
+                self.transform_data(input_key=input_key)
+            self.enforce_output_schema()
+            staging_data_write = self.save_staging_data(load_control_key, compute=False)
+            with self.metrics.step(stage='write', name='write_input_and_staging_datasets', data=self.data) as step:
+                # the input copy and the staging dataset are written in one pass sharing a single parse of the source,
+                # the row counts and group dates recorded in the manifest come from the staging statistics computed in
+                # the same pass
+                _, staging_statistics, input_row_count = dask.compute(
+                    input_data_write, staging_data_write, input_row_count, optimize_graph=False)
+                byte_sizes = {dataset_type: data_io.dataset_size(
+                    self.find_dataset_path(load_control_key=load_control_key, dataset_type=dataset_type))
+                    for dataset_type in ['input', 'staging']}
+                step.bytes_written = sum(byte_sizes.values())
+            self.record_dataset(load_control_key=load_control_key, dataset_type='input',
+                                schema_hash=input_schema_hash, row_count=input_row_count,
+                                byte_size=byte_sizes['input'])
+            self.record_dataset(load_control_key=load_control_key, dataset_type='staging',
+                                schema_hash=manifest.schema_hash(self.data), row_count=staging_statistics.row_count,
+                                byte_size=byte_sizes['staging'], group_dates=self.group_dates(staging_statistics))
+
+    def evaluate_staging_dataset_with_logging(self, load_control_key: str = None):
+        """
+        Wrapper for evaluate_staging_dataset to handle logging of evaluation run
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :return: None
+        """
+        logger.info(f'\n\nEvaluating Staging Dataset\nload_control_key={load_control_key}')
+        log_name = f'{self.name}_v{self.version}_{load_control_key}_staging_evaluation'
+        output_log_dir = Path(self.version_path / f"logs/evaluation_logs/successful_run_logs/")
+        error_log_dir = Path(self.version_path / f"logs/evaluation_logs/failed_run_logs/")
+        logger.info(f'\n\nLogging to the following locations:\n{output_log_dir}\n{error_log_dir}')
+        pipeline_logging.log_function(log_name=log_name, output_log_dir=output_log_dir, error_log_dir=error_log_dir)(
+            self.evaluate_staging_dataset)(load_control_key=load_control_key)
+
+    def evaluate_staging_dataset(self, load_control_key: str = None):
+        """
+        Load staging dataset, run evaluations on dataset according to pipeline config, and promote/demote dataset based
+        on result
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :return: None
+        """
+        logger.info(f'\n\nEvaluating Staging Dataset\nload_control_key={load_control_key}')
+        self.memory_budget = self.get_memory_budget(run_name=f'{load_control_key}_staging_evaluation')
+        staging_data_path = self.find_dataset_path(load_control_key=load_control_key, dataset_type='staging')
+        with self.run_within_memory_budget(), \
+                self.get_metrics_recorder(run_name=f'{load_control_key}_staging_evaluation') as self.metrics:
+            statistics_results = self.evaluate_statistics(dataset_statistics.read_statistics(staging_data_path))
+            failed_from_statistics = self.fail_fast_evaluations and any(statistics_results.values())
+            if len(statistics_results) < len(self.evaluation_list) and not failed_from_statistics:
+                with self.metrics.step(stage='read', name='read_staging_dataset') as step:
+                    self.data = step.data = self.load_dataset_by_key(load_control_key=load_control_key,
+                                                                     dataset_type='staging')
+                    step.bytes_read = data_io.dataset_size(staging_data_path)
+                self.enforce_output_schema()
+            promote_dataset_bool, failed_evals = self.evaluate_data(source_file_path=staging_data_path,
+                                                                    statistics_results=statistics_results)
+        if promote_dataset_bool:
+            logger.info('\n\nDataset passed all evaluations!\nPromoting output file...')
+            self.promote_dataset(load_control_key=load_control_key)
+        else:
+            logger.info('\n\nDataset failed an evaluation\nDemoting output file...')
+            self.demote_dataset(load_control_key=load_control_key)
+            raise Exception(f'Dataset failed the following evaluations:\n{failed_evals}' + (
+                f'\n{partition_checks.format_failures(self.evaluation_failures)}' if self.evaluation_failures else ''))
+        return promote_dataset_bool
+
+    def process_batch(self, datasets: Dict[str, Path] = None, max_workers: int = None,
+                      executor: str = 'processes') -> Dict[str, dict]:
+        """
+        Run process_new_dataset_with_logging for many datasets in parallel. Each key is logged to its own log files and
+        a failure on one key does not stop the others
+        :param datasets: dictionary of the format {load_control_key: source_file_path}
+        :param max_workers: number of worker processes, defaults to the number of cores
+        :param executor: 'processes' for a local process pool or 'dask' for a local dask cluster
+        :return: dictionary of the format {load_control_key: run summary}
+        """
+        task_arguments = [{'home_directory': self.home_directory, 'pipeline_name': self.name,
+                           'pipeline_version': self.version, 'load_control_key': load_control_key,
+                           'source_file_path': source_file_path}
+                          for load_control_key, source_file_path in datasets.items()]
+        results = batch_processing.run_batch(task_function=batch_processing.process_key,
+                                             task_arguments=task_arguments, max_workers=max_workers,
+                                             executor=executor)
+        batch_processing.print_batch_summary(results)
+        return results
+
+    def evaluate_batch(self, load_control_keys: List[str] = None, max_workers: int = None,
+                       executor: str = 'processes') -> Dict[str, dict]:
+        """
+        Run evaluate_staging_dataset_with_logging for many staging datasets in parallel. Each key is logged to its own
+        log files and a failure on one key does not stop the others
+        :param load_control_keys: keys to evaluate, defaults to every key found in the staging directory
+        :param max_workers: number of worker processes, defaults to the number of cores
+        :param executor: 'processes' for a local process pool or 'dask' for a local dask cluster
+        :return: dictionary of the format {load_control_key: run summary}
+        """
+        if load_control_keys is None:
+            load_control_keys = self.list_staging_load_control_keys()
+        task_arguments = [{'home_directory': self.home_directory, 'pipeline_name': self.name,
+                           'pipeline_version': self.version, 'load_control_key': load_control_key}
+                          for load_control_key in load_control_keys]
+        results = batch_processing.run_batch(task_function=batch_processing.evaluate_key,
+                                             task_arguments=task_arguments, max_workers=max_workers,
+                                             executor=executor)
+        batch_processing.print_batch_summary(results)
+        return results
+
+    def process_new_dataset_fan_out(self, source_file_path: Path = None, load_control_key: str = None,
+                                    pipeline_versions: List[str] = None) -> Dict[str, int]:
+        """
+        Process a new dataset for this pipeline version and other versions of the pipeline at once, sharing the read
+        of the source and every leading transformation step the versions have in common (see fan_out.run_fan_out)
+        :param source_file_path: Path to input dataset
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param pipeline_versions: other versions of this pipeline to process the dataset for
+        :return: dictionary of the format {<name>_v<version>: staging row count}
+        """
+        pipeline_managers = [self] + [PipelineManager(self.home_directory, self.name, pipeline_version)
+                                      for pipeline_version in pipeline_versions or [] if
+                                      str(pipeline_version) != self.version]
+        return fan_out.run_fan_out(pipeline_managers=pipeline_managers, source_file_path=source_file_path,
+                                   load_control_key=load_control_key)
+
+    def ingest_stream(self, landing_directory: Path = None, source_queue=None, max_batch_bytes: int = None,
+                      max_batch_files: int = 100, max_batch_seconds: float = 60, memory_budget_bytes: int = None,
+                      max_workers: int = 1, poll_interval: float = 5, stop_event=None, max_batches: int = None,
+                      idle_timeout: float = None) -> Dict[str, dict]:
+        """
+        Continuously ingest files dropped into a landing directory (or paths put on a local queue) in micro-batches.
+        Each batch is processed, evaluated and promoted or demoted as a dataset with its own load control key, see
+        streaming_ingest.StreamingIngest. Runs until stop_event is set, max_batches batches finished or nothing
+        arrived for idle_timeout seconds, and resumes unfinished batches when restarted
+        :param landing_directory: directory watched for new files
+        :param source_queue: queue.Queue of file paths
+        :param max_batch_bytes: size at which a batch is started, defaults to a share of the memory budget
+        :param max_batch_files: number of files at which a batch is started
+        :param max_batch_seconds: seconds the oldest waiting file waits before a partial batch is started
+        :param memory_budget_bytes: estimated memory of all running batches, defaults to half of the available memory
+        :param max_workers: number of worker processes
+        :param poll_interval: seconds between polls of the landing directory
+        :param stop_event: threading.Event stopping the ingest
+        :param max_batches: stop after this many batches
+        :param idle_timeout: stop after this many seconds without new files
+        :return: dictionary of the format {load_control_key: run summary}
+        """
+        ingest = streaming_ingest.StreamingIngest(
+            pipeline_manager=self, landing_directory=landing_directory, source_queue=source_queue,
+            max_batch_bytes=max_batch_bytes, max_batch_files=max_batch_files, max_batch_seconds=max_batch_seconds,
+            memory_budget_bytes=memory_budget_bytes, max_workers=max_workers, poll_interval=poll_interval)
+        return ingest.run(stop_event=stop_event, max_batches=max_batches, idle_timeout=idle_timeout)
+
+    def promote_dataset(self, load_control_key: str = None):
+        """
+        Move staging dataset to output/production directory
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :return: None
+        """
+        staging_data_path = self.get_dataset_path(load_control_key=load_control_key, dataset_type='staging')
+        output_data_path = self.get_dataset_path(load_control_key=load_control_key, dataset_type='output')
+        logger.info(f'\nMoving Dataset to...\n{output_data_path}')
+        data_io.move_dataset(source_path=staging_data_path, destination_path=output_data_path)
+        dataset_statistics.move_statistics(source_path=staging_data_path, destination_path=output_data_path)
+        self.get_manifest().move_dataset(load_control_key=load_control_key, source_type='staging',
+                                         destination_type='output', data_path=output_data_path)
+        pending_state_path = self.get_incremental_state_path(load_control_key=load_control_key)
+        if pending_state_path.exists():
+            logger.info(f'\nPromoting incremental window state...')
+            data_io.move_dataset(source_path=pending_state_path, destination_path=self.get_incremental_state_path())
+
+    def demote_dataset(self, load_control_key: str = None):
+        """
+        Move staging dataset to failed directory
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :return: None
+        """
+        staging_data_path = self.get_dataset_path(load_control_key=load_control_key, dataset_type='staging')
+        failed_data_path = self.get_dataset_path(load_control_key=load_control_key, dataset_type='failed')
+        logger.info(f'\nMoving Dataset to...\n{failed_data_path}')
+        data_io.move_dataset(source_path=staging_data_path, destination_path=failed_data_path)
+        dataset_statistics.move_statistics(source_path=staging_data_path, destination_path=failed_data_path)
+        self.get_manifest().move_dataset(load_control_key=load_control_key, source_type='staging',
+                                         destination_type='failed', data_path=failed_data_path)
+        pending_state_path = self.get_incremental_state_path(load_control_key=load_control_key)
+        if pending_state_path.exists():
+            pending_state_path.unlink()
+
+    def evaluate_data(self, source_file_path: Path = None, statistics_results: Dict[int, bool] = None,
+                      fail_fast: bool = None):
+        """
+        Run all evaluations on the dataset specified in the pipeline config. self.data is persisted once and every
+        evaluation is built as a lazy reduction so all evaluations are computed together in a single pass. In fail fast
+        mode the evaluations that can be decided per partition are checked partition by partition first (see
+        evaluate_partitions) and the dataset fails without running the rest as soon as any evaluation fails. A passing
+        dataset is read again for the evaluations that can not be decided per partition
+        :param source_file_path: path self.data was read from, its size is checked against the memory budget
+        :param statistics_results: results of evaluations already answered from dataset statistics, by position in
+        the evaluation list (see evaluate_statistics), self.data is not read when every evaluation is answered
+        :param fail_fast: stop at the first failure, defaults to the fail_fast_evaluations setting in the pipeline
+        config
+        :return:
+        """
+        if fail_fast is None:
+            fail_fast = self.fail_fast_evaluations
+        decided_results = dict(statistics_results or {})
+        self.evaluation_failures = []
+        if fail_fast and not any(decided_results.values()):
+            decided_results.update(self.evaluate_partitions(decided_positions=list(decided_results)))
+        if fail_fast and any(decided_results.values()):
+            scanned_positions = []
+        else:
+            scanned_positions = [index for index in range(len(self.evaluation_list)) if index not in decided_results]
+        if scanned_positions:
+            with self.metrics.step(stage='read', name='persist_evaluation_data', data=self.data) as step:
+                self.data = step.data = self.persist_data(name='evaluation', source_file_path=source_file_path)
+        lazy_positions, lazy_results = [], []
+        for index in scanned_positions:
+            evaluation_name, evaluation_arguments = self.evaluation_list[index]
+            evaluation_arguments = partitioning.partitioned_arguments(
+                name=evaluation_name, arguments=evaluation_arguments, partitioning=self.partitioning,
+                columns=list(self.data.columns), partition_aware_functions=partitioning.PARTITION_AWARE_EVALUATIONS)
+            logger.info(f'\nEvaluation: {evaluation_name}\nArguments: {evaluation_arguments}')
+            lazy_function = getattr(evaluations, f'{evaluation_name}_lazy', None)
+            if lazy_function is not None:
+                lazy_positions.append(index)
+                lazy_results.append(lazy_function(data=self.data, **evaluation_arguments))
+            else:
+                # evaluations without a lazy version take the dask dataframe and compute their own result
+                evaluation_function = getattr(evaluations, evaluation_name)
+                with self.metrics.step(stage='evaluation', name=evaluation_name, arguments=evaluation_arguments,
+                                       data=self.data):
+                    decided_results[index] = evaluation_function(data=self.data, **evaluation_arguments)
+        if self.metrics.materialize_steps:
+            # time every evaluation on its own instead of sharing one pass
+            results = []
+            for index, lazy_result in zip(lazy_positions, lazy_results):
+                with self.metrics.step(stage='evaluation', name=self.evaluation_list[index][0],
+                                       arguments=self.evaluation_list[index][1], data=self.data):
+                    results.append(lazy_result.compute())
+        elif lazy_results:
+            with self.metrics.step(stage='evaluation', name='all_evaluations', data=self.data):
+                results = dask.compute(*lazy_results)
+        else:
+            results = []
+        decided_results.update(zip(lazy_positions, results))
+        promote_dataset = True
+        failed_evals = []
+        for index, evaluation in enumerate(self.evaluation_list):
+            evaluation_name = evaluation[0]
+            if index not in decided_results:
+                logger.info(f'{evaluation_name}: Cancelled, the dataset already failed')
+            elif decided_results[index]:
+                logger.info(f'{evaluation_name}: Failed')
+                promote_dataset = False
+                failed_evals.append(evaluation_name)
+            else:
+                logger.info(f'{evaluation_name}: Passed')
+        return promote_dataset, failed_evals
+
+    def evaluate_partitions(self, decided_positions: List[int] = None) -> Dict[int, bool]:
+        """
+        Check the evaluations that can be decided per partition (see partition_checks) partition by partition,
+        streaming from storage instead of persisting self.data, and cancel the partitions left as soon as one fails.
+        The failing groups (or columns) and partitions are kept in self.evaluation_failures
+        :param decided_positions: positions in the evaluation list already decided, e.g. from dataset statistics
+        :return: dictionary of the format {position in the evaluation list: result} of the evaluations decided
+        """
+        positions = [position for position in partition_checks.partition_checked_evaluations(
+            evaluation_list=self.evaluation_list, data_partitioning=self.partitioning)
+            if position not in (decided_positions or [])]
+        if not positions:
+            return {}
+        logger.info(f'\nChecking {[self.evaluation_list[position][0] for position in positions]} partition by '
+                    f'partition over {self.data.npartitions} partitions, stopping at the first failure')
+        with self.metrics.step(stage='evaluation', name='partition_checks', data=self.data):
+            results, self.evaluation_failures = partition_checks.run_partition_checks(
+                data=self.data, evaluation_list=self.evaluation_list, positions=positions,
+                max_workers=self.memory_budget.workers if self.memory_budget is not None else None)
+        if self.evaluation_failures:
+            logger.info(f'\n{partition_checks.format_failures(self.evaluation_failures)}')
+        return results
+
+    def evaluate_statistics(self, statistics: dataset_statistics.DatasetStatistics = None) -> Dict[int, bool]:
+        """
+        Answer the evaluations in the pipeline config that can be answered from the statistics of a dataset (see
+        dataset_statistics), in O(groups) without reading the data. Evaluations without a {name}_from_statistics
+        function, or whose statistics were not computed, are left to a scan of the data
+        :param statistics: statistics of the dataset, None when missing or stale
+        :return: dictionary of the format {position in the evaluation list: result}
+        """
+        statistics_results = {}
+        if statistics is None:
+            return statistics_results
+        for index, (evaluation_name, evaluation_arguments) in enumerate(self.evaluation_list):
+            statistics_function = getattr(evaluations, f'{evaluation_name}_from_statistics', None)
+            if statistics_function is None:
+                continue
+            result = statistics_function(statistics=statistics, **(evaluation_arguments or {}))
+            if result is not None:
+                logger.info(f'\nEvaluation: {evaluation_name}\nArguments: {evaluation_arguments}\n'
+                            f'Answered from dataset statistics')
+                statistics_results[index] = result
+        return statistics_results
+
+    def load_dataset_by_key(self, load_control_key: str = None, dataset_type: str = None) -> dd:
+        """
+        Load dataset in to dask dataframe. A parquet dataset written partitioned by group (see partition_by_group) is
+        read one partition per file so the partitioning recorded in its metadata still holds, and is set on
+        self.partitioning
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param dataset_type: dataset location input/staging/output/failed
+        :return:
+        """
+        data_path = self.find_dataset_path(load_control_key=load_control_key, dataset_type=dataset_type)
+        logger.info(f'\nReading Data...\n{data_path}')
+        schema = self.input_schema if dataset_type == 'input' else self.output_schema
+        self.partitioning = partitioning.read_partitioning(data_path) if data_path.suffix == '.parquet' else None
+        if self.partitioning is not None:
+            read_options = {'split_row_groups': False}
+        else:
+            read_options = self.memory_budget_read_options(data_path)
+        data = data_io.read_data_by_file_extension(data_path, schema=schema, **read_options)
+        if data_path.suffix == '.parquet':
+            # hive partition columns are read back as categoricals, restore them to plain strings
+            for column in self.partition_columns or []:
+                data[column] = data[column].astype(str)
+        return data
+
+    def find_dataset_path(self, load_control_key: str = None, dataset_type: str = None) -> Path:
+        """
+        Find the stored path of a dataset. Input datasets archived by copy keep the file extension of their source
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param dataset_type: dataset location input/staging/output/failed
+        :return: path of dataset
+        """
+        data_path = self.get_dataset_path(load_control_key=load_control_key, dataset_type=dataset_type)
+        if not data_path.exists():
+            archived_paths = glob.glob(f"{data_path.with_suffix('')}.*")
+            if archived_paths:
+                data_path = Path(archived_paths[0])
+        return data_path
+
+    def get_dataset_path(self, load_control_key: str = None, dataset_type: str = None,
+                         file_extension: str = None) -> Path:
+        """
+        Build the storage path of a dataset. Csv datasets are single files, parquet datasets are directories
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param dataset_type: dataset location input/staging/output/failed
+        :param file_extension: file extension, defaults to the storage format in the pipeline config
+        :return: path of dataset
+        """
+        return Path(self.version_path / f"datasets/{dataset_type}_datasets/"
+                                        f"{self.name}_v{self.version}_{dataset_type}_data_{load_control_key}"
+                                        f".{file_extension or self.storage_format}")
+
+    def list_staging_load_control_keys(self) -> List[str]:
+        """
+        list all load control keys found in the staging directory
+        :return:
+        """
+        return self.list_load_control_keys(dataset_type='staging')
+
+    def list_load_control_keys(self, dataset_type: str = None, date_range: List[str] = None) -> List[str]:
+        """
+        list all load control keys of a dataset type recorded in the dataset manifest
+        :param dataset_type: dataset location input/staging/output/failed
+        :param date_range: only list datasets that may hold dates in this range, either date may be None
+        :return:
+        """
+        return self.get_manifest().list_keys(dataset_type=dataset_type, date_range=date_range)
+
+    def list_load_control_keys_on_disk(self, dataset_type: str = None) -> List[str]:
+        """
+        list all load control keys found in a dataset directory
+        :param dataset_type: dataset location input/staging/output/failed
+        :return:
+        """
+        prefix = f"{self.name}_v{self.version}_{dataset_type}_data_"
+        data_paths = glob.glob(str(Path(self.version_path / f"datasets/{dataset_type}_datasets/{prefix}*")))
+        return sorted(Path(data_path).name[len(prefix):].rsplit('.', 1)[0] for data_path in data_paths)
+
+    def query(self, symbols: List[str] = None, date_range: List[str] = None, columns: List[str] = None,
+              load_control_keys: List[str] = None, dataset_type: str = 'output') -> dd:
+        """
+        Read the rows of one or many datasets matching symbols and date_range without scanning whole datasets. On
+        parquet storage the symbol and date filters and the column selection are pushed down to the reader, so hive
+        partitions (partition_columns on the symbol column) and files or row groups whose min/max statistics cannot
+        match are skipped. Datasets written partitioned by symbol (see partition_by_group) keep the statistics of each
+        file narrow. Csv datasets are scanned and filtered. The symbol and date columns are set in the pipeline config
+        with "symbol_column" and "date_column"
+        :param symbols: symbols to keep, all symbols if None
+        :param date_range: first and last date to keep, either may be None
+        :param columns: columns to return, all columns if None
+        :param load_control_keys: datasets to read, all datasets of dataset_type if None
+        :param dataset_type: dataset location input/staging/output/failed
+        :return: dask dataframe
+        """
+        if load_control_keys is None:
+            load_control_keys = self.list_load_control_keys(dataset_type=dataset_type, date_range=date_range)
+        if not load_control_keys:
+            raise Exception(f"No {dataset_type} datasets found for pipeline {self.name} version {self.version}")
+        schema = self.input_schema if dataset_type == 'input' else self.output_schema
+        filters = query.query_filters(symbols=symbols, date_range=date_range, symbol_column=self.symbol_column,
+                                      date_column=self.date_column, date_data_type=schema.get(self.date_column))
+        logger.info(f'\nQuerying {len(load_control_keys)} {dataset_type} datasets\nFilters: {filters}')
+        datasets = [query.read_dataset(data_path=self.find_dataset_path(load_control_key=load_control_key,
+                                                                        dataset_type=dataset_type),
+                                       filters=filters, columns=columns, schema=schema,
+                                       partition_columns=self.partition_columns)
+                    for load_control_key in load_control_keys]
+        return datasets[0] if len(datasets) == 1 else dd.concat(datasets)
+
+    def get_manifest(self) -> manifest.DatasetManifest:
+        """
+        Dataset manifest of this pipeline version stored at version_path/manifest.sqlite. Datasets of a pipeline
+        version created before the manifest existed are recorded from the dataset directories on first use
+        :return: DatasetManifest
+        """
+        dataset_manifest = manifest.DatasetManifest(manifest_path=Path(self.version_path / manifest.MANIFEST_FILE))
+        if not dataset_manifest.exists():
+            datasets = []
+            for dataset_type in manifest.DATASET_TYPES:
+                for load_control_key in self.list_load_control_keys_on_disk(dataset_type=dataset_type):
+                    data_path = self.find_dataset_path(load_control_key=load_control_key, dataset_type=dataset_type)
+                    datasets.append((load_control_key, dataset_type, data_path, data_io.dataset_size(data_path)))
+            dataset_manifest.backfill(datasets)
+        return dataset_manifest
+
+    def record_dataset(self, load_control_key: str = None, dataset_type: str = None, schema_hash: str = None,
+                       row_count: int = None, byte_size: int = None, group_dates: pd.DataFrame = None):
+        """
+        Record a written dataset in the dataset manifest
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param dataset_type: dataset location input/staging/output/failed
+        :param schema_hash: hash of dataset schema (see manifest.schema_hash)
+        :param row_count: rows in dataset
+        :param byte_size: size of dataset in storage
+        :param group_dates: min and max date of each group (see group_dates)
+        :return: None
+        """
+        self.get_manifest().record_dataset(
+            load_control_key=load_control_key, dataset_type=dataset_type,
+            data_path=self.find_dataset_path(load_control_key=load_control_key, dataset_type=dataset_type),
+            row_count=row_count, byte_size=byte_size, schema_hash=schema_hash, group_dates=group_dates)
+
+    def dataset_status(self, load_control_key: str = None) -> List[dict]:
+        """
+        Manifest records of a key, one per dataset type it is stored under, with the min and max date of each group
+        of the dataset
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :return: list of dataset records
+        """
+        dataset_manifest = self.get_manifest()
+        records = dataset_manifest.status(load_control_key=load_control_key)
+        group_dates = dataset_manifest.group_dates(load_control_key=load_control_key)
+        for record in records:
+            if record['dataset_type'] != 'input':
+                record['group_dates'] = group_dates
+        return records
+
+    def save_input_data(self, load_control_key: str, source_file_path: Path = None, compute: bool = True):
+        """
+        Save self.data to input data directory. With "input_archive": "copy" in the pipeline config the raw bytes of
+        the source are copied instead of re-serializing the parsed data
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param source_file_path: Path to input dataset, required to archive by copy
+        :param compute: write now, or return the lazy write so it can be computed together with other work
+        :return: None or lazy write
+        """
+        if self.input_archive == 'copy' and source_file_path is not None:
+            input_data_path = self.get_dataset_path(load_control_key=load_control_key, dataset_type='input',
+                                                    file_extension=Path(source_file_path).suffix.lstrip('.'))
+            input_data_write = dask.delayed(data_io.copy_dataset)(source_path=source_file_path,
+                                                                  destination_path=input_data_path)
+            return input_data_write.compute() if compute else input_data_write
+        input_data_path = self.get_dataset_path(load_control_key=load_control_key, dataset_type='input')
+        return self.write_dataset(data_path=input_data_path, compute=compute)
+
+    def transform_data(self, transformation_steps: List[list] = None, input_key: str = None):
+        """
+        Run all transformations on the dataset specified in the pipeline config. Transformations found in
+        transformations.py. When the transformation cache is enabled in the pipeline config each step output is stored
+        in the cache and a rerun resumes from the longest cached prefix of steps
+        :param transformation_steps: steps to run instead of the configured transformations
+        :param input_key: hash identifying the input dataset in the transformation cache, defaults to the dask token
+        of self.data
+        :return:
+        """
+        # group-by steps run per partition without a shuffle while the data is partitioned by a subset of their groups
+        if transformation_steps is None:
+            transformation_steps = self.get_transformation_steps()
+        cache = self.get_transformation_cache()
+        cached_steps = 0
+        if cache is not None:
+            step_keys = cache.step_keys(input_key=input_key or tokenize(self.data),
+                                        transformation_steps=transformation_steps, package_version=__version__)
+            cached_steps = cache.longest_cached_prefix(step_keys)
+            if cached_steps:
+                logger.info(f'\nResuming from cached output of step {cached_steps} of {len(transformation_steps)}')
+                self.data = cache.read(step_keys[cached_steps - 1])
+                for name, arguments in transformation_steps[:cached_steps]:
+                    self.partitioning = partitioning.partitioning_after(name=name, arguments=arguments,
+                                                                        partitioning=self.partitioning)
+        for index, transformation in enumerate(transformation_steps[cached_steps:], start=cached_steps):
+            self.apply_transformation(transformation=transformation, cache=cache,
+                                      cache_key=step_keys[index] if cache is not None else None)
+        if cache is not None:
+            cache.evict(keep_keys=step_keys)
+
+    def apply_transformation(self, transformation: list = None, cache: transformation_cache.TransformationCache = None,
+                             cache_key: str = None):
+        """
+        Apply a single transformation step to self.data and update self.partitioning
+        :param transformation: [transformation name, arguments]
+        :param cache: transformation cache the step output is stored in, if any
+        :param cache_key: key of the step output in the transformation cache
+        :return:
+        """
+        transformation_name = transformation[0]
+        transformation_arguments = transformation[1]
+        if transformation_arguments is not None:
+            transformation_arguments = partitioning.partitioned_arguments(
+                name=transformation_name, arguments=transformation_arguments, partitioning=self.partitioning,
+                columns=list(self.data.columns), partition_aware_functions=partitioning.PARTITION_AWARE_TRANSFORMATIONS)
+        logger.info(f'\nTransformation: {transformation_name}')
+        logger.info(f'Arguments: {transformation_arguments}')
+        transformation_function = getattr(transformations, transformation_name)
+        with self.metrics.step(stage='transformation', name=transformation_name,
+                               arguments=transformation_arguments, data=self.data) as step:
+            if transformation_arguments is not None:
+                self.data = transformation_function(data=self.data, **transformation_arguments)
+            else:
+                self.data = transformation_function(data=self.data)
+            if cache is not None:
+                self.data = cache.write(data=self.data, key=cache_key, transformation=transformation)
+            self.data = step.data = self.metrics.materialize(self.data)
+        self.partitioning = partitioning.partitioning_after(name=transformation_name,
+                                                            arguments=transformation_arguments,
+                                                            partitioning=self.partitioning)
+        logger.info('COMPLETE')
+
+    def transform_data_incrementally(self, load_control_key: str = None, input_key: str = None):
+        """
+        Transform only the new rows in self.data. Row level steps run on the new rows alone. Before the window steps
+        (rolling/yoy) the tail of each group carried over from the last promoted run is prepended so every window sees
+        the same history as a full recompute, then those carried over rows are dropped again. The tail of each group
+        after this run is saved as pending state and becomes the current state when the dataset is promoted, so
+        incremental datasets must be promoted or demoted in load order. Assumes new rows are later than earlier rows
+        of the same group
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param input_key: hash identifying the input dataset in the transformation cache
+        :return:
+        """
+        row_steps, window_steps = incremental.split_incremental_steps(self.get_transformation_steps())
+        self.transform_data(transformation_steps=row_steps, input_key=input_key)
+        groupby_columns, date_column = incremental.window_keys(window_steps)
+        if groupby_columns is None:
+            return
+        pending_state_path = self.get_incremental_state_path(load_control_key=load_control_key)
+        unresolved_state_paths = [path for path in pending_state_path.parent.glob(
+            f"{self.name}_v{self.version}_pending_state_*.parquet") if path != pending_state_path]
+        if unresolved_state_paths:
+            raise Exception(f"Promote or demote earlier incremental datasets first, pending state found at "
+                            f"{unresolved_state_paths}")
+        self.data = self.persist_data(name='incremental_rows')
+        lookback = incremental.lookback_rows(window_steps)
+        state = incremental.load_state(self.get_incremental_state_path())
+        new_tail = self.data.map_partitions(incremental.tail_by_group, groupby_columns=groupby_columns,
+                                            date_column=date_column, rows=lookback).compute()
+        history_tail = new_tail if state is None else pd.concat([state, new_tail])
+        incremental.save_state(state=incremental.tail_by_group(data=history_tail, groupby_columns=groupby_columns,
+                                                               date_column=date_column, rows=lookback),
+                               state_path=pending_state_path)
+        logger.info(f'\nIncremental state: {0 if state is None else len(state)} carried over rows, lookback {lookback}')
+        if state is not None:
+            state = state.astype(dict(self.data.dtypes))
+            state[incremental.INCREMENTAL_STATE_COLUMN] = True
+            self.data = self.data.assign(**{incremental.INCREMENTAL_STATE_COLUMN: False})
+            self.data = dd.concat([dd.from_pandas(state, npartitions=1), self.data])
+            self.partitioning = None
+        self.transform_data(transformation_steps=window_steps)
+        if state is not None:
+            self.data = self.data.loc[~self.data[incremental.INCREMENTAL_STATE_COLUMN]]
+            self.data = self.data.drop(columns=[incremental.INCREMENTAL_STATE_COLUMN])
+
+    def get_incremental_state_path(self, load_control_key: str = None) -> Path:
+        """
+        Path of the incremental window state. With a load_control_key this is the pending state written by that run,
+        without one it is the current state of the last promoted run
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :return: path of state file
+        """
+        if load_control_key is None:
+            return Path(self.version_path / f"incremental_state/{self.name}_v{self.version}_current_state.parquet")
+        return Path(self.version_path / f"incremental_state/"
+                                        f"{self.name}_v{self.version}_pending_state_{load_control_key}.parquet")
+
+    def get_metrics_recorder(self, run_name: str = None) -> pipeline_metrics.MetricsRecorder:
+        """
+        Metrics recorder of a run writing to version_path/logs/metrics. Recording is off unless enabled in the pipeline
+        config with "metrics": {"enabled": true, "materialize_steps": <time every step on its own>,
+        "profile": <dump dask task and resource profile>}
+        :param run_name: name of the run, used in the metrics file name
+        :return: MetricsRecorder
+        """
+        return pipeline_metrics.MetricsRecorder(
+            run_name=f'{self.name}_v{self.version}_{run_name}', metrics_dir=Path(self.version_path / 'logs/metrics'),
+            enabled=self.metrics_settings.get('enabled', False),
+            materialize_steps=self.metrics_settings.get('materialize_steps', False),
+            profile=self.metrics_settings.get('profile', False))
+
+    def get_memory_budget(self, run_name: str = None) -> memory_budget.MemoryBudget:
+        """
+        Memory budget of a run, None unless set in the pipeline config with "memory_budget": {"budget_bytes": <bytes>,
+        "memory_fraction": <share of available memory used without budget_bytes>, "workers": <dask threads>}
+        :param run_name: name of the run, used in the name of its spill directory under version_path/spill
+        :return: MemoryBudget or None
+        """
+        if self.memory_budget_settings is None:
+            return None
+        return memory_budget.MemoryBudget(
+            budget_bytes=self.memory_budget_settings.get('budget_bytes'),
+            memory_fraction=self.memory_budget_settings.get('memory_fraction', memory_budget.DEFAULT_MEMORY_FRACTION),
+            workers=self.memory_budget_settings.get('workers'),
+            spill_directory=Path(self.version_path / f'spill/{self.name}_v{self.version}_{run_name}'))
+
+    def run_within_memory_budget(self):
+        """
+        context manager applying the memory budget of the current run, if any
+        """
+        if self.memory_budget is None:
+            return contextlib.nullcontext()
+        return self.memory_budget.run()
+
+    def date_columns(self) -> List[str]:
+        """
+        date column of the pipeline and the date columns of every transformation and evaluation
+        """
+        columns = [self.date_column]
+        for name, arguments in self.transformation_list + self.evaluation_list:
+            arguments = arguments or {}
+            columns += list(arguments.get('date_columns') or []) + [arguments.get('date_column')]
+        return [column for column in dict.fromkeys(columns) if column is not None]
+
+    def required_columns(self) -> List[str]:
+        """
+        columns read along with the input schema when projecting columns: the date and group columns of the pipeline
+        and the date and group by columns of every transformation and evaluation, which may be left out of the input
+        schema to keep their data types as read
+        """
+        columns = self.date_columns() + list(self.group_columns)
+        for name, arguments in self.transformation_list + self.evaluation_list:
+            columns += list((arguments or {}).get('groupby_columns') or [])
+        return list(dict.fromkeys(columns))
+
+    def memory_budget_read_options(self, file_path: Path = None) -> dict:
+        """
+        read function arguments sizing the partitions of a dataset to the memory budget of the current run
+        """
+        if self.memory_budget is None:
+            return {}
+        return self.memory_budget.read_options(file_path)
+
+    def persist_data(self, name: str = None, source_file_path: Path = None) -> dd:
+        """
+        Persist self.data for reuse. Within a memory budget self.data is spilled to local disk instead when its
+        estimated size does not fit
+        :param name: name of the spilled dataset
+        :param source_file_path: path self.data was read from, its size is used to estimate the size of self.data
+        :return: dask dataframe
+        """
+        if self.memory_budget is None:
+            return self.data.persist()
+        estimated_bytes = self.memory_budget.estimated_bytes(source_file_path) if source_file_path else None
+        return self.memory_budget.persist(data=self.data, estimated_bytes=estimated_bytes, name=name)
+
+    def get_transformation_cache(self) -> transformation_cache.TransformationCache:
+        """
+        Transformation cache stored under version_path, None unless enabled in the pipeline config with
+        "transformation_cache": {"enabled": true, "max_bytes": <size cap>}
+        :return: TransformationCache or None
+        """
+        if not (self.transformation_cache_settings or {}).get('enabled'):
+            return None
+        return transformation_cache.TransformationCache(cache_path=Path(self.version_path / 'transformation_cache'),
+                                                        max_bytes=self.transformation_cache_settings.get('max_bytes'))
+
+    def list_transformation_cache(self) -> List[dict]:
+        """
+        Print and return the entries of the transformation cache, most recently used first
+        :return: list of cache entries
+        """
+        entries = transformation_cache.TransformationCache(
+            cache_path=Path(self.version_path / 'transformation_cache')).entries()
+        transformation_cache.print_entries(entries)
+        return entries
+
+    def clear_transformation_cache(self):
+        """
+        Remove every entry of the transformation cache
+        :return: None
+        """
+        logger.info(f'\nClearing transformation cache...')
+        transformation_cache.TransformationCache(cache_path=Path(self.version_path / 'transformation_cache')).clear()
+
+    def get_transformation_steps(self) -> List[list]:
+        """
+        Transformation steps to run. When optimize_transformations is set in the pipeline config the
+        transformation_list is compiled into an optimized plan first (see planning.py)
+        :return: list of [transformation name, arguments]
+        """
+        if self.optimize_transformations:
+            return planning.compile_transformation_plan(self.transformation_list).steps
+        return self.transformation_list
+
+    def explain(self) -> str:
+        """
+        Print the optimized transformation plan compiled from the pipeline config and the rewrites it applied
+        :return: explanation text
+        """
+        return planning.compile_transformation_plan(self.transformation_list).explain()
+
+    def save_staging_data(self, load_control_key: str, compute: bool = True):
+        """
+        Save self.data to staging data directory. The statistics evaluations and the manifest are answered from
+        (see dataset_statistics) are computed in the same pass as the write and stored in a sidecar of the dataset
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :param compute: write now, or return the lazy write so it can be computed together with other work
+        :return: DatasetStatistics or lazy write returning them
+        """
+        staging_data_path = self.get_dataset_path(load_control_key=load_control_key, dataset_type='staging')
+        data_write = self.write_dataset(data_path=staging_data_path, compute=False)
+        statistics_write = dask.delayed(dataset_statistics.write_statistics)(
+            data_path=staging_data_path, previous_write=data_write,
+            statistics=dataset_statistics.lazy_statistics(
+                data=self.data, groupings=dataset_statistics.statistics_groupings(self)))
+        return statistics_write.compute(optimize_graph=False) if compute else statistics_write
+
+    def group_dates(self, statistics: dataset_statistics.DatasetStatistics = None) -> pd.DataFrame:
+        """
+        min and max date of each group of the group columns in the pipeline config, None when the dataset lacks them
+        """
+        grouping = statistics.get_grouping(groupby_columns=self.group_columns, date_column=self.date_column)
+        return None if grouping is None else grouping['groups'][['min', 'max']]
+
+    def write_dataset(self, data_path: Path = None, compute: bool = True):
+        """
+        Write self.data to storage using the storage format, partition columns and compression in the pipeline config.
+        When self.data is partitioned by group and the parquet layout keeps it, the partitioning is recorded in the
+        dataset metadata so readers can skip the shuffle
+        :param data_path: path of dataset
+        :param compute: write now, or return the lazy write so it can be computed together with other work
+        :return: None or lazy write
+        """
+        partition_on = self.partition_columns if self.storage_format == 'parquet' else None
+        data_write = data_io.write_data_by_file_extension(data=self.data, file_path=data_path,
+                                                          partition_on=partition_on, compression=self.compression,
+                                                          compute=compute)
+        if not partitioning.carries_to_storage(partitioning=self.partitioning, storage_format=self.storage_format,
+                                               partition_columns=self.partition_columns):
+            return data_write
+        if compute:
+            return partitioning.write_partitioning(dataset_path=data_path, partitioning=self.partitioning)
+        return dask.delayed(partitioning.write_partitioning)(dataset_path=data_path, partitioning=self.partitioning,
+                                                             previous_write=data_write)
+
+    def visualize_staging_dataset(self, load_control_key: str, dataset_type: str):
+        """
+        Load dataset, run all visualizations on dataset according to pipeline config
+        :param load_control_key: Key to be used to identify dataset through ETL process
+        :return: None
+        """
+        logger.info(f'\n\nCreating Visualizations for {dataset_type} dataset....\nload_control_key={load_control_key}')
+        vis_data = self.load_dataset_by_key(load_control_key=load_control_key, dataset_type=dataset_type).compute()
+        for visualization in self.visualization_list:
+            visualization_name = visualization[0]
+            visualization_arguments = visualization[1]
+            logger.info(f'\nVisualization: {visualization_name}')
+            logger.info(f'Arguments: {visualization_arguments}')
+            visualization_function = getattr(visualizations, visualization_name)
+            if visualization_arguments is not None:
+                self.data = visualization_function(data=vis_data, **visualization_arguments)
+            else:
+                self.data = visualization_function(data=vis_data)
+            logger.info('COMPLETE')
+
+    def render_visualizations(self, metric_columns: List[str] = None, symbols: List[str] = None,
+                              date_range: List[str] = None, series_column: str = None,
+                              load_control_keys: List[str] = None, dataset_type: str = 'output',
+                              image_format: str = 'png', downsample_method: str = 'lttb',
+                              max_points: int = chart_rendering.DEFAULT_MAX_POINTS,
+                              max_workers: int = None) -> List[Path]:
+        """
+        Render a chart per symbol to image files under version_path/visualizations/<dataset_type> without a display.
+        Only the requested symbols, dates and columns are read (see query) and partitioned by symbol, partitions are
+        computed one at a time while their symbols are rendered in parallel across worker processes, and long series
+        are downsampled before they are plotted
+        :param metric_columns: columns plotted, one panel each
+        :param symbols: symbols to render, all symbols if None
+        :param date_range: first and last date to plot, either may be None
+        :param series_column: column splitting each panel into one line per value, e.g. cardtype
+        :param load_control_keys: datasets to read, all datasets of dataset_type if None
+        :param dataset_type: dataset location input/staging/output/failed
+        :param image_format: png or svg
+        :param downsample_method: lttb, ohlc or None to plot every row
+        :param max_points: points kept per line when downsampling
+        :param max_workers: number of worker processes, defaults to the number of cores
+        :return: paths of images
+        """
+        columns = [self.symbol_column, self.date_column] + ([series_column] if series_column else []) + metric_columns
+        data = self.query(symbols=symbols, date_range=date_range, columns=columns,
+                          load_control_keys=load_control_keys, dataset_type=dataset_type)
+        data = transformations.partition_by_group(data=data, groupby_columns=[self.symbol_column],
+                                                  date_column=self.date_column)
+        output_directory = Path(self.version_path / f'visualizations/{dataset_type}')
+        logger.info(f'\n\nRendering symbols to {output_directory}')
+        return chart_rendering.render_chart_pack(
+            data=data, output_directory=output_directory, symbol_column=self.symbol_column,
+            date_column=self.date_column, metric_columns=metric_columns, series_column=series_column,
+            image_format=image_format, downsample_method=downsample_method, max_points=max_points,
+            max_workers=max_workers)
+
+    def enforce_output_schema(self):
+        """
+        set the data types of all columns in self.data according to output schema specified in pipeling config
+        :return:
+        """
+        for column, data_type in self.output_schema.items():
+            if self.data[column].dtype != data_type:
+                self.data[column] = self.data[column].astype(data_type)
+
+    def enforce_input_schema(self):
+        """
+        set the data types of all columns in self.data according to input schema specified in pipeling config
+        :return:
+        """
+        for column, data_type in self.input_schema.items():
+            if self.data[column].dtype != data_type:
+                self.data[column] = self.data[column].astype(data_type)
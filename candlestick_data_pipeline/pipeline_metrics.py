@@ -0,0 +1,234 @@
+import os
+import json
+import logging
+import time
+import datetime
+import threading
+import contextlib
+import dask.dataframe as dd
+from dask.diagnostics import Profiler, ResourceProfiler
+from pathlib import Path
+from typing import List
+
+STAGES = ('read', 'transformation', 'evaluation', 'write')
+
+logger = logging.getLogger(__name__)
+
+
+class PeakMemorySampler:
+    """
+    Samples the resident set size of this process on a background thread. RSS is used instead of tracemalloc because
+    most of the memory of a run is allocated by numpy and pyarrow outside of the python allocator
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    def sample(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, current_rss())
+            self.stop_event.wait(self.interval)
+
+
+def current_rss() -> int:
+    """
+    resident set size of this process in bytes
+    """
+    with open('/proc/self/statm', 'r') as fp:
+        return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def available_memory() -> int:
+    """
+    memory in bytes available to new allocations without swapping, MemAvailable of /proc/meminfo
+    """
+    with open('/proc/meminfo', 'r') as fp:
+        for line in fp:
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1]) * 1024
+    return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+
+class StepMetrics:
+    """
+    Metrics of one read, transformation, evaluation or write step. Set data to the step output inside the step so the
+    recorder can count its partitions and rows, and bytes_read/bytes_written for steps touching storage
+    """
+
+    def __init__(self, stage: str = None, name: str = None, arguments: dict = None):
+        self.stage = stage
+        self.name = name
+        self.arguments = arguments
+        self.status = 'running'
+        self.data = None
+        self.rows_in = None
+        self.rows_out = None
+        self.partitions_in = None
+        self.partitions_out = None
+        self.bytes_read = None
+        self.bytes_written = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_bytes = None
+        self.peak_rss_increase_bytes = None
+
+    def as_dict(self) -> dict:
+        return {key: value for key, value in vars(self).items() if key != 'data'}
+
+
+class MetricsRecorder:
+    """
+    Records per step runtime metrics of a pipeline run and writes them as a JSON file. Dask builds transformations
+    lazily, so by default a transformation step only measures building its graph and the work is measured by the write
+    or evaluation step that computes it. With materialize_steps every step output is persisted and counted so each
+    step is timed on its own, at the cost of keeping every intermediate result in memory. With profile the dask task
+    timings and resource usage of the run are dumped next to the metrics file
+    """
+
+    def __init__(self, run_name: str = None, metrics_dir: Path = None, enabled: bool = False,
+                 materialize_steps: bool = False, profile: bool = False):
+        self.run_name = run_name
+        self.metrics_dir = metrics_dir
+        self.enabled = enabled
+        self.materialize_steps = enabled and materialize_steps
+        self.profile = enabled and profile
+        self.steps = []
+        self.profilers = []
+        self.started = None
+        self.status = None
+
+    def __enter__(self):
+        if self.enabled:
+            self.started = time.time()
+            self.start_profilers()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if self.enabled:
+            self.status = 'failed' if exc_type is not None else 'succeeded'
+            self.save()
+
+    @contextlib.contextmanager
+    def step(self, stage: str = None, name: str = None, arguments: dict = None, data: dd = None):
+        """
+        measure wall time, cpu time and peak memory of the code run inside the step
+        :param stage: one of STAGES
+        :param name: name of the step, e.g. the transformation name
+        :param arguments: step arguments
+        :param data: input dataframe of the step
+        """
+        step = StepMetrics(stage=stage, name=name, arguments=arguments)
+        if not self.enabled:
+            yield step
+            return
+        if data is not None:
+            step.partitions_in = data.npartitions
+            step.rows_in = self.count_rows(data)
+        self.steps.append(step)
+        with PeakMemorySampler() as sampler:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            try:
+                yield step
+                step.status = 'succeeded'
+            except Exception:
+                step.status = 'failed'
+                raise
+            finally:
+                step.wall_seconds = time.perf_counter() - wall_start
+                step.cpu_seconds = time.process_time() - cpu_start
+        step.peak_rss_bytes = sampler.peak
+        step.peak_rss_increase_bytes = sampler.peak - sampler.baseline
+        if step.data is not None:
+            step.partitions_out = step.data.npartitions
+            step.rows_out = self.count_rows(step.data)
+            step.data = None
+
+    def materialize(self, data: dd = None) -> dd:
+        """
+        persist data when materialize_steps is set so the current step pays for its own work
+        """
+        return data.persist() if self.materialize_steps else data
+
+    def count_rows(self, data: dd = None) -> int:
+        """
+        rows in data, only counted for materialized steps where counting does not recompute the data
+        """
+        return len(data) if self.materialize_steps else None
+
+    def start_profilers(self):
+        if not self.profile:
+            return
+        self.profilers = [Profiler()]
+        try:
+            self.profilers.append(ResourceProfiler(dt=0.05))
+        except ImportError:
+            # ResourceProfiler needs psutil
+            pass
+        for profiler in self.profilers:
+            profiler.register()
+
+    def stop_profilers(self) -> dict:
+        """
+        unregister the dask profilers and return their results
+        """
+        profile = {'tasks': [], 'resources': []}
+        for profiler in self.profilers:
+            profiler.unregister()
+            if isinstance(profiler, Profiler):
+                profile['tasks'] = [{'key': str(task.key), 'start': task.start_time, 'end': task.end_time,
+                                     'worker': task.worker_id} for task in profiler.results]
+            else:
+                profile['resources'] = [{'time': sample.time, 'memory_mb': sample.mem, 'cpu_percent': sample.cpu}
+                                        for sample in profiler.results]
+        return profile
+
+    def save(self) -> Path:
+        """
+        write the metrics of the run, and the dask profile if enabled, to metrics_dir
+        :return: path of metrics file
+        """
+        Path(self.metrics_dir).mkdir(parents=True, exist_ok=True)
+        metrics_path = Path(self.metrics_dir / f'{self.run_name}_metrics.json')
+        steps = [step.as_dict() for step in self.steps]
+        metrics = {'run': self.run_name, 'status': self.status,
+                   'started': datetime.datetime.fromtimestamp(self.started).isoformat(),
+                   'wall_seconds': time.time() - self.started, 'materialize_steps': self.materialize_steps,
+                   'peak_rss_bytes': max([step['peak_rss_bytes'] or 0 for step in steps], default=None),
+                   'steps': steps}
+        with open(metrics_path, 'w') as fp:
+            json.dump(metrics, fp, indent=4, default=str)
+        logger.info(f'\nRun metrics written to {metrics_path}')
+        if self.profile:
+            profile_path = Path(self.metrics_dir / f'{self.run_name}_profile.json')
+            with open(profile_path, 'w') as fp:
+                json.dump(self.stop_profilers(), fp, default=str)
+            logger.info(f'Dask profile written to {profile_path}')
+        return metrics_path
+
+
+def print_step_summary(metrics_path: Path = None) -> List[dict]:
+    """
+    print the steps of a metrics file, slowest first
+    :return: list of steps
+    """
+    with open(metrics_path, 'r') as fp:
+        steps = json.load(fp)['steps']
+    for step in sorted(steps, key=lambda step: step['wall_seconds'] or 0, reverse=True):
+        print(f"{step['stage']:<16} {step['name']:<32} {step['wall_seconds'] or 0:>9.3f}s  "
+              f"rows {step['rows_in']} -> {step['rows_out']}  "
+              f"partitions {step['partitions_in']} -> {step['partitions_out']}")
+    return steps
@@ -0,0 +1,224 @@
+import copy
+from typing import List
+
+ROW_FILTER_TRANSFORMATIONS = ('filter_by_date_range', 'drop_rows_with_any_null_values')
+IDEMPOTENT_TRANSFORMATIONS = ('format_date_columns', 'drop_rows_with_any_null_values', 'drop_duplicate_rows',
+                              'filter_by_date_range', 'partition_by_group')
+WINDOWED_TRANSFORMATIONS = ('rolling_sum_by_date_by_group', 'rolling_mean_by_date_by_group',
+                            'yoy_percent_change_by_group', 'windowed_metrics_by_group')
+INDICATOR_TRANSFORMATIONS = ('ema_by_group', 'rsi_by_group', 'atr_by_group', 'vwap_by_group',
+                             'bollinger_bands_by_group')
+# transformations that never turn an already formatted date column back into strings
+DATE_PRESERVING_TRANSFORMATIONS = ('drop_rows_with_any_null_values', 'drop_duplicate_rows', 'agg_insert_by_group',
+                                   'agg_insert_grouping_sets', 'fill_missing_dates_by_group',
+                                   'partition_by_group') + WINDOWED_TRANSFORMATIONS + INDICATOR_TRANSFORMATIONS
+
+
+class TransformationPlan:
+    """
+    An optimized list of transformation steps compiled from a pipeline's transformation_list. Steps use the same
+    [transformation name, arguments] format as the pipeline config so they can be run by PipelineManager.transform_data
+    """
+
+    def __init__(self, transformation_list: List[list] = None, steps: List[list] = None, notes: List[str] = None):
+        self.transformation_list = transformation_list
+        self.steps = steps
+        self.notes = notes
+
+    def explain(self) -> str:
+        """
+        print the configured steps, the optimized plan and every rewrite applied by the compiler
+        :return: explanation text
+        """
+        lines = ['Configured transformations:']
+        lines += [f'  {index}. {name} {arguments}' for index, (name, arguments) in
+                  enumerate(self.transformation_list, start=1)]
+        lines += ['', 'Optimized plan:']
+        lines += [f'  {index}. {name} {arguments}' for index, (name, arguments) in enumerate(self.steps, start=1)]
+        lines += ['', 'Rewrites:']
+        lines += [f'  - {note}' for note in self.notes] or ['  none']
+        explanation = '\n'.join(lines)
+        print(explanation)
+        return explanation
+
+
+def compile_transformation_plan(transformation_list: List[list] = None) -> TransformationPlan:
+    """
+    Compile a transformation_list into an optimized plan before anything runs. The compiler
+    - removes consecutive duplicates of idempotent steps
+    - pushes row filters ahead of the steps they commute with, splitting the upper bound of a date filter ahead of
+      trailing window group-bys (rows after the upper bound never fall inside an earlier row's trailing window)
+    - removes date parsing of columns that are already formatted
+    - fuses adjacent rolling/yoy group-bys on the same groupby_columns into one windowed_metrics_by_group stage
+    :param transformation_list: transformation list from the pipeline config
+    :return: TransformationPlan
+    """
+    steps = [[name, copy.deepcopy(arguments)] for name, arguments in transformation_list]
+    notes = []
+    steps = remove_duplicate_steps(steps=steps, notes=notes)
+    steps = push_down_row_filters(steps=steps, notes=notes)
+    steps = remove_redundant_date_formatting(steps=steps, notes=notes)
+    steps = fuse_windowed_transformations(steps=steps, notes=notes)
+    return TransformationPlan(transformation_list=transformation_list, steps=steps, notes=notes)
+
+
+def remove_duplicate_steps(steps: List[list] = None, notes: List[str] = None) -> List[list]:
+    """
+    drop a step if it is idempotent and identical to the step before it
+    """
+    output = []
+    for step in steps:
+        if output and step[0] in IDEMPOTENT_TRANSFORMATIONS and output[-1] == step:
+            notes.append(f'removed duplicate {step[0]} {step[1]}')
+            continue
+        output.append(step)
+    return output
+
+
+def push_down_row_filters(steps: List[list] = None, notes: List[str] = None) -> List[list]:
+    """
+    move filter_by_date_range and drop_rows_with_any_null_values as early as they can go without changing the output
+    """
+    output = []
+    for step in steps:
+        if step[0] in ROW_FILTER_TRANSFORMATIONS:
+            insert_row_filter(output=output, step=step, notes=notes)
+        else:
+            output.append(step)
+    return output
+
+
+def insert_row_filter(output: List[list] = None, step: list = None, notes: List[str] = None):
+    """
+    insert a row filter into output as early as possible
+    """
+    position = len(output)
+    passed_steps = []
+    while position > 0:
+        previous_step = output[position - 1]
+        if row_filter_commutes(step=step, previous_step=previous_step):
+            passed_steps.append(previous_step[0])
+            position -= 1
+        elif step[0] == 'filter_by_date_range' and is_trailing_window_on(step=previous_step,
+                                                                         date_column=step[1]['date_column']):
+            # keep the full filter after the window, only the upper bound can run ahead of it
+            output.insert(position, step)
+            notes.append(f'split the upper bound of filter_by_date_range on {step[1]["date_column"]} ahead of '
+                         f'{previous_step[0]}, the lower bound stays after it')
+            step = [step[0], dict(step[1], date_range=[None, step[1]['date_range'][1]])]
+            passed_steps = [previous_step[0]]
+            position -= 1
+        else:
+            break
+    if passed_steps:
+        notes.append(f'pushed {step[0]} {step[1]} ahead of {", ".join(passed_steps)}')
+    output.insert(position, step)
+
+
+def row_filter_commutes(step: list = None, previous_step: list = None) -> bool:
+    """
+    check if running a row filter before previous_step gives the same result as running it after
+    """
+    name, arguments = step
+    previous_name, previous_arguments = previous_step[0], previous_step[1] or {}
+    if previous_name in ROW_FILTER_TRANSFORMATIONS or previous_name in ('format_date_columns', 'partition_by_group'):
+        return True
+    if previous_name == 'drop_duplicate_rows':
+        subset = previous_arguments.get('subset')
+        return subset is None or (name == 'filter_by_date_range' and arguments['date_column'] in subset)
+    if name == 'filter_by_date_range':
+        date_column = arguments['date_column']
+        if previous_name == 'agg_insert_by_group':
+            return date_column in previous_arguments['groupby_columns']
+        if previous_name == 'agg_insert_grouping_sets':
+            return all(date_column in grouping_set for grouping_set in previous_arguments['grouping_sets'])
+        if arguments['date_range'][0] is None:
+            return is_trailing_window_on(step=previous_step, date_column=date_column)
+    return False
+
+
+def is_trailing_window_on(step: list = None, date_column: str = None) -> bool:
+    """
+    check if step computes trailing window metrics or indicators ordered by date_column
+    """
+    return step[0] in WINDOWED_TRANSFORMATIONS + INDICATOR_TRANSFORMATIONS and step[1]['date_column'] == date_column
+
+
+def remove_redundant_date_formatting(steps: List[list] = None, notes: List[str] = None) -> List[list]:
+    """
+    skip parsing of date columns that an earlier step already formatted
+    """
+    formatted_columns = set()
+    output = []
+    for name, arguments in steps:
+        if name == 'format_date_columns':
+            remaining_columns = [column for column in arguments['date_columns'] if column not in formatted_columns]
+            if not remaining_columns:
+                notes.append(f'removed format_date_columns {arguments["date_columns"]}, already formatted')
+                continue
+            if len(remaining_columns) < len(arguments['date_columns']):
+                notes.append(f'format_date_columns only formats {remaining_columns}, others already formatted')
+                arguments = dict(arguments, date_columns=remaining_columns)
+            formatted_columns.update(remaining_columns)
+        elif name == 'filter_by_date_range':
+            if arguments['date_column'] in formatted_columns and arguments.get('format_dates', True):
+                notes.append(f'filter_by_date_range skips formatting {arguments["date_column"]}, already formatted')
+                arguments = dict(arguments, format_dates=False)
+            formatted_columns.add(arguments['date_column'])
+        elif name not in DATE_PRESERVING_TRANSFORMATIONS:
+            formatted_columns = set()
+        output.append([name, arguments])
+    return output
+
+
+def fuse_windowed_transformations(steps: List[list] = None, notes: List[str] = None) -> List[list]:
+    """
+    replace runs of adjacent rolling/yoy group-bys on the same groupby_columns and date_column with a single
+    windowed_metrics_by_group step so the data is shuffled and sorted once for the whole run. The rolling/yoy
+    transformations move the date column first, the fused step does the same so the output columns keep their order
+    """
+    output = []
+    fused_names = []
+    for name, arguments in steps:
+        if name not in WINDOWED_TRANSFORMATIONS:
+            output.append([name, arguments])
+            fused_names.append(None)
+            continue
+        metrics = windowed_metrics_for_step(name=name, arguments=arguments)
+        previous_step = output[-1] if output else None
+        if fused_names and fused_names[-1] is not None and \
+                previous_step[1]['groupby_columns'] == arguments['groupby_columns'] and \
+                previous_step[1]['date_column'] == arguments['date_column']:
+            previous_step[1]['metrics'] += metrics
+            previous_step[1]['date_first'] = previous_step[1]['date_first'] or moves_date_first(name, arguments)
+            fused_names[-1].append(name)
+        else:
+            output.append(['windowed_metrics_by_group', {'groupby_columns': arguments['groupby_columns'],
+                                                         'date_column': arguments['date_column'],
+                                                         'metrics': metrics,
+                                                         'date_first': moves_date_first(name, arguments)}])
+            fused_names.append([name])
+    for step, names in zip(output, fused_names):
+        if names is not None and names != ['windowed_metrics_by_group']:
+            notes.append(f'fused {", ".join(names)} on {step[1]["groupby_columns"]} into one '
+                         f'windowed_metrics_by_group stage ({len(names)} shuffle(s) and sort(s) become 1)')
+    return output
+
+
+def moves_date_first(name: str = None, arguments: dict = None) -> bool:
+    """
+    check if a rolling/yoy step outputs the date column first
+    """
+    return name != 'windowed_metrics_by_group' or bool(arguments.get('date_first', False))
+
+
+def windowed_metrics_for_step(name: str = None, arguments: dict = None) -> List[dict]:
+    """
+    translate a rolling/yoy transformation into windowed_metrics_by_group metric definitions
+    """
+    if name == 'windowed_metrics_by_group':
+        return copy.deepcopy(arguments['metrics'])
+    if name == 'yoy_percent_change_by_group':
+        return [{'operation': 'yoy_pct_change', 'metric_columns': arguments['metric_columns']}]
+    operation = {'rolling_sum_by_date_by_group': 'rolling_sum', 'rolling_mean_by_date_by_group': 'rolling_mean'}[name]
+    return [{'operation': operation, 'metric_columns': arguments['metric_columns'], 'window': arguments['window']}]
@@ -0,0 +1,73 @@
+import pandas as pd
+import dask.dataframe as dd
+from pathlib import Path
+from typing import List, Tuple
+from candlestick_data_pipeline import data_io
+
+
+def query_filters(symbols: List[str] = None, date_range: Tuple[str] = None, symbol_column: str = None,
+                  date_column: str = None, date_data_type: str = None) -> List[tuple]:
+    """
+    Translate a symbol and date range query into parquet filters in disjunctive normal form, a single conjunction
+    :param symbols: symbols to keep, all symbols if None
+    :param date_range: first and last date to keep, either may be None
+    :param symbol_column: name of symbol column
+    :param date_column: name of date column
+    :param date_data_type: stored data type of date column, dates are compared as strings unless it is a date type
+    :return: list of (column, operator, value)
+    """
+    filters = []
+    if symbols is not None:
+        filters.append((symbol_column, 'in', [str(symbol) for symbol in symbols]))
+    for operator, date in zip(('>=', '<='), date_range or (None, None)):
+        if date is not None:
+            date = pd.Timestamp(date) if date_data_type in data_io.DATE_DATA_TYPES else str(date)
+            filters.append((date_column, operator, date))
+    return filters
+
+
+def filter_rows(data: dd = None, filters: List[tuple] = None) -> dd:
+    """
+    keep the rows of data matching every filter, for readers that cannot apply filters while reading
+    """
+    for column, operator, value in filters:
+        if operator == 'in':
+            data = data.loc[data[column].astype(str).isin(value)]
+        elif operator == '>=':
+            data = data.loc[data[column] >= value]
+        elif operator == '<=':
+            data = data.loc[data[column] <= value]
+        else:
+            raise Exception(f"Filter operator {operator} not recognized")
+    return data
+
+
+def read_dataset(data_path: Path = None, filters: List[tuple] = None, columns: List[str] = None,
+                 schema: dict = None, partition_columns: List[str] = None) -> dd:
+    """
+    Read the rows of a dataset matching filters. Parquet datasets push the filters and column selection down to
+    pyarrow, so hive directories and files or row groups whose min/max statistics rule out every filter are never
+    read and the remaining rows are filtered while decoding. Csv datasets only read the needed columns and are
+    filtered after parsing
+    :param data_path: path of dataset
+    :param filters: list of (column, operator, value)
+    :param columns: columns to return, all columns if None
+    :param schema: dictionary of the format {column name: data type}
+    :param partition_columns: hive partition columns of parquet datasets
+    :return: dask dataframe
+    """
+    if Path(data_path).suffix == '.parquet':
+        data = data_io.read_parquet_dataset(data_path, filters=filters or None, columns=columns)
+        # hive partition columns are read back as categoricals, restore them to plain strings
+        for column in partition_columns or []:
+            if column in data.columns:
+                data[column] = data[column].astype(str)
+        return data
+    read_options = {}
+    if columns is not None:
+        read_columns = list(dict.fromkeys(list(columns) + [column for column, _, _ in filters]))
+        schema = {column: data_type for column, data_type in (schema or {}).items() if column in read_columns}
+        read_options['usecols'] = read_columns
+    data = filter_rows(data=data_io.read_data_by_file_extension(data_path, schema=schema, **read_options),
+                       filters=filters)
+    return data[list(columns)] if columns is not None else data
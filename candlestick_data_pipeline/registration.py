@@ -2,6 +2,9 @@ from pathlib import Path
 import shutil
 import json
 
+STORAGE_FORMATS = ('csv', 'parquet')
+INPUT_ARCHIVE_MODES = ('rewrite', 'copy')
+
 
 def register_pipeline(registration_dict=None, overwrite=False):
     clean_registration_dict(registration_dict)
@@ -13,6 +16,27 @@ def register_pipeline(registration_dict=None, overwrite=False):
 def clean_registration_dict(registration_dict):
     registration_dict['version'] = str(registration_dict['version'])
     registration_dict['home_directory'] = str(registration_dict['home_directory'])
+    registration_dict.setdefault('storage_format', 'csv')
+    registration_dict.setdefault('partition_columns', None)
+    registration_dict.setdefault('compression', 'snappy')
+    registration_dict.setdefault('optimize_transformations', False)
+    registration_dict.setdefault('incremental', False)
+    registration_dict.setdefault('transformation_cache', None)
+    registration_dict.setdefault('input_archive', 'rewrite')
+    registration_dict.setdefault('metrics', None)
+    registration_dict.setdefault('date_column', 'date')
+    registration_dict.setdefault('symbol_column', 'symbol')
+    registration_dict.setdefault('group_columns', None)
+    registration_dict.setdefault('memory_budget', None)
+    registration_dict.setdefault('fail_fast_evaluations', False)
+    registration_dict.setdefault('read_options', {'project_columns': False, 'downcast_floats': False,
+                                                  'string_data_type': None})
+    if registration_dict['storage_format'] not in STORAGE_FORMATS:
+        raise Exception(
+            f"Storage format {registration_dict['storage_format']} not recognized. Use one of {STORAGE_FORMATS}")
+    if registration_dict['input_archive'] not in INPUT_ARCHIVE_MODES:
+        raise Exception(
+            f"Input archive mode {registration_dict['input_archive']} not recognized. Use one of {INPUT_ARCHIVE_MODES}")
     return registration_dict
 
 def delete_pipeline(registration_dict):
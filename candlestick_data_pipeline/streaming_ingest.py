@@ -0,0 +1,370 @@
+import time
+import queue
+import shutil
+import logging
+import argparse
+import datetime
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, List
+from candlestick_data_pipeline import batch_processing
+from candlestick_data_pipeline import manifest
+from candlestick_data_pipeline import pipeline_metrics
+from candlestick_data_pipeline import memory_budget
+
+LEDGER_FILE = 'ledger.sqlite'
+SOURCE_EXTENSIONS = ('.csv', '.parquet')
+BATCH_STATES = ('claimed', 'running', 'committed', 'failed')
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    load_control_key TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    byte_size INTEGER NOT NULL,
+    file_count INTEGER NOT NULL,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS batches_by_state ON batches (state);
+CREATE TABLE IF NOT EXISTS batch_files (
+    file_name TEXT NOT NULL,
+    byte_size INTEGER NOT NULL,
+    modified_ns INTEGER NOT NULL,
+    source_path TEXT NOT NULL,
+    load_control_key TEXT NOT NULL,
+    PRIMARY KEY (file_name, byte_size, modified_ns)
+);
+CREATE INDEX IF NOT EXISTS batch_files_by_key ON batch_files (load_control_key);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class IngestLedger:
+    """
+    SQLite ledger of the micro-batches of a streaming ingest. A batch and the files it claims are recorded in one
+    transaction before any file is moved, and its state only moves forward (claimed -> running -> committed or
+    failed), so after a restart every file belongs to exactly one batch and a committed batch is never ingested again
+    """
+
+    def __init__(self, ledger_path: Path = None):
+        self.ledger_path = Path(ledger_path)
+
+    def transaction(self, write: bool = False):
+        return manifest.sqlite_transaction(database_path=self.ledger_path, schema=LEDGER_SCHEMA, write=write)
+
+    def claim_batch(self, load_control_key: str = None, extension: str = None, files: List[dict] = None) -> bool:
+        """
+        record a new batch of files, files already claimed by another batch are left out
+        :param files: list of {'path': ..., 'size': ..., 'modified_ns': ...}
+        :return: True if the batch claimed at least one file
+        """
+        now = manifest.timestamp()
+        with self.transaction(write=True) as connection:
+            claimed = []
+            for file in files:
+                inserted = connection.execute('INSERT OR IGNORE INTO batch_files VALUES (?, ?, ?, ?, ?)',
+                                              (Path(file['path']).name, file['size'], file['modified_ns'],
+                                               str(file['path']), load_control_key)).rowcount
+                if inserted:
+                    claimed.append(file)
+            if not claimed:
+                return False
+            connection.execute('INSERT INTO batches VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                               (load_control_key, 'claimed', extension, sum(file['size'] for file in claimed),
+                                len(claimed), None, now, now))
+        return True
+
+    def set_state(self, load_control_key: str = None, state: str = None, error: str = None):
+        with self.transaction(write=True) as connection:
+            connection.execute('UPDATE batches SET state = ?, error = ?, updated_at = ? WHERE load_control_key = ?',
+                               (state, error, manifest.timestamp(), load_control_key))
+
+    def batches(self, states: List[str] = None) -> List[dict]:
+        """
+        batches in any of states, oldest first
+        """
+        states = list(states or BATCH_STATES)
+        with self.transaction() as connection:
+            rows = connection.execute(f"SELECT * FROM batches WHERE state IN ({', '.join('?' * len(states))}) "
+                                      f"ORDER BY created_at, load_control_key", states).fetchall()
+        return [dict(row) for row in rows]
+
+    def batch(self, load_control_key: str = None) -> dict:
+        with self.transaction() as connection:
+            row = connection.execute('SELECT * FROM batches WHERE load_control_key = ?',
+                                     (load_control_key,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def batch_files(self, load_control_key: str = None) -> List[dict]:
+        with self.transaction() as connection:
+            rows = connection.execute('SELECT * FROM batch_files WHERE load_control_key = ? ORDER BY file_name',
+                                      (load_control_key,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def is_claimed(self, file: dict = None) -> bool:
+        with self.transaction() as connection:
+            return connection.execute('SELECT 1 FROM batch_files WHERE file_name = ? AND byte_size = ? AND '
+                                      'modified_ns = ?', (Path(file['path']).name, file['size'],
+                                                          file['modified_ns'])).fetchone() is not None
+
+
+class StreamingIngest:
+    """
+    Long running ingest of a pipeline version. Files dropped into a landing directory (or paths put on a local queue)
+    are grouped into micro-batches by size, file count and waiting time. Each batch is moved into its own batch
+    directory, processed, evaluated and promoted to output with a single rename, in a pool of worker processes.
+    Batches only start while their estimated memory fits in the memory budget next to the batches already running,
+    otherwise files wait in the landing directory (or on the queue, which should be bounded), which gives back-pressure
+    to upstream. Batch membership and state are kept in a ledger so a restarted ingest resumes unfinished batches and
+    never commits a load_control_key twice
+
+    A landing file is only picked up once its size and modification time are unchanged between two polls. Hidden
+    files, files starting with an underscore and files without a csv or parquet extension are ignored, so upstream can
+    write to a temporary name and rename when complete. Incremental pipelines run one batch at a time since their
+    datasets must be promoted in load order
+    """
+
+    def __init__(self, pipeline_manager=None, landing_directory: Path = None, source_queue: queue.Queue = None,
+                 max_batch_bytes: int = None, max_batch_files: int = 100, max_batch_seconds: float = 60,
+                 memory_budget_bytes: int = None, max_workers: int = 1, poll_interval: float = 5):
+        """
+        :param pipeline_manager: PipelineManager of the pipeline version to ingest into
+        :param landing_directory: directory watched for new files
+        :param source_queue: queue of file paths, a local stand-in for a message queue. Paths on the queue are not
+        durable until they are claimed by a batch
+        :param max_batch_bytes: a batch is started once its files reach this size, defaults to the memory budget
+        divided by the number of workers and the memory expansion of the file format
+        :param max_batch_files: a batch is started once it holds this many files
+        :param max_batch_seconds: a batch is started once its oldest file waited this long
+        :param memory_budget_bytes: estimated memory all running batches may use, defaults to half of the available
+        memory
+        :param max_workers: number of worker processes running batches
+        :param poll_interval: seconds between polls of the landing directory
+        """
+        self.pipeline_manager = pipeline_manager
+        self.landing_directory = Path(landing_directory) if landing_directory is not None else None
+        self.source_queue = source_queue
+        self.memory_budget_bytes = memory_budget_bytes or int(
+            pipeline_metrics.available_memory() * memory_budget.DEFAULT_MEMORY_FRACTION)
+        self.max_workers = 1 if pipeline_manager.incremental else max_workers
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_files = max_batch_files
+        self.max_batch_seconds = max_batch_seconds
+        self.poll_interval = poll_interval
+        self.streaming_path = Path(pipeline_manager.version_path / 'streaming')
+        self.ledger = IngestLedger(ledger_path=Path(self.streaming_path / LEDGER_FILE))
+        # landing files seen in the last poll, {path: file}, and files ready to be batched in arrival order
+        self.seen_files = {}
+        self.waiting_files = []
+        self.running = {}
+
+    def run(self, stop_event: threading.Event = None, max_batches: int = None, idle_timeout: float = None) \
+            -> Dict[str, dict]:
+        """
+        Ingest until stop_event is set, max_batches batches finished or no file arrived for idle_timeout seconds.
+        Running batches are always finished before returning, waiting files stay in the landing directory
+        :return: dictionary of the format {load_control_key: run summary}
+        """
+        stop_event = stop_event or threading.Event()
+        results = {}
+        last_activity = time.time()
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch in self.recover():
+                self.start_batch(pool=pool, batch=batch)
+            while not stop_event.is_set() and (max_batches is None or len(results) + len(self.running) < max_batches):
+                if self.collect_files():
+                    last_activity = time.time()
+                batch = self.next_batch()
+                if batch is not None:
+                    self.start_batch(pool=pool, batch=batch)
+                    last_activity = time.time()
+                    continue
+                results.update(self.finish_batches(timeout=self.poll_interval))
+                if self.running or self.waiting_files:
+                    last_activity = time.time()
+                elif idle_timeout is not None and time.time() - last_activity > idle_timeout:
+                    break
+            while self.running:
+                results.update(self.finish_batches(timeout=None))
+        return results
+
+    def recover(self) -> List[dict]:
+        """
+        Settle the batches left unfinished by an earlier run. A batch whose dataset already reached output or failed
+        was committed or demoted before the restart and is only recorded, every other batch is started again
+        :return: batches to start again
+        """
+        batches = []
+        for batch in self.ledger.batches(states=['claimed', 'running']):
+            load_control_key = batch['load_control_key']
+            for dataset_type, state in (('output', 'committed'), ('failed', 'failed')):
+                if self.pipeline_manager.find_dataset_path(load_control_key=load_control_key,
+                                                           dataset_type=dataset_type).exists():
+                    logger.info(f'\nBatch {load_control_key} was {state} before restart')
+                    self.ledger.set_state(load_control_key=load_control_key, state=state)
+                    break
+            else:
+                logger.info(f'\nResuming batch {load_control_key}')
+                batches.append(batch)
+        return batches
+
+    def collect_files(self) -> bool:
+        """
+        move complete landing files and queued paths to the waiting files
+        :return: True if a file was added
+        """
+        arrived = []
+        if self.landing_directory is not None:
+            polled = {}
+            for path in sorted(self.landing_directory.iterdir()):
+                if not is_source_file(path):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    logger.info(f'\nSkipping {path}, removed from the landing directory before it was read')
+                    continue
+                polled[path] = {'path': path, 'size': stat.st_size, 'modified_ns': stat.st_mtime_ns,
+                                'arrived': time.time()}
+            waiting_paths = {file['path'] for file in self.waiting_files}
+            for path, file in polled.items():
+                previous = self.seen_files.get(path)
+                if path not in waiting_paths and previous is not None and \
+                        (previous['size'], previous['modified_ns']) == (file['size'], file['modified_ns']):
+                    arrived.append(dict(file, arrived=previous['arrived']))
+            self.seen_files = polled
+        while self.source_queue is not None:
+            try:
+                path = Path(self.source_queue.get_nowait())
+            except queue.Empty:
+                break
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                logger.info(f'\nSkipping queued path {path}, it does not exist')
+                continue
+            arrived.append({'path': path, 'size': stat.st_size, 'modified_ns': stat.st_mtime_ns,
+                            'arrived': time.time()})
+        arrived = [file for file in arrived if not self.ledger.is_claimed(file)]
+        self.waiting_files.extend(arrived)
+        return bool(arrived)
+
+    def next_batch(self) -> dict:
+        """
+        Claim the next batch of waiting files of one file format once it is full or its oldest file waited
+        max_batch_seconds, and it fits in the memory budget
+        :return: batch or None
+        """
+        if not self.waiting_files or len(self.running) >= self.max_workers:
+            return None
+        extension = self.waiting_files[0]['path'].suffix.lower()
+        max_batch_bytes = self.max_batch_bytes or self.memory_budget_bytes // (
+            self.max_workers * memory_budget.MEMORY_EXPANSION[extension])
+        files = []
+        for file in self.waiting_files:
+            if file['path'].suffix.lower() != extension:
+                continue
+            if files and (len(files) >= self.max_batch_files or
+                          sum(batch_file['size'] for batch_file in files) + file['size'] > max_batch_bytes):
+                break
+            files.append(file)
+        batch_bytes = sum(file['size'] for file in files)
+        full = len(files) >= self.max_batch_files or batch_bytes >= max_batch_bytes or \
+            len(files) < sum(1 for file in self.waiting_files if file['path'].suffix.lower() == extension)
+        if not full and time.time() - files[0]['arrived'] < self.max_batch_seconds:
+            return None
+        running_memory = sum(batch['memory_bytes'] for batch in self.running.values())
+        memory_bytes = batch_bytes * memory_budget.MEMORY_EXPANSION[extension]
+        if self.running and running_memory + memory_bytes > self.memory_budget_bytes:
+            return None
+        load_control_key = f"batch_{datetime.datetime.now().strftime('%Y%m%dT%H%M%S%f')}"
+        claimed_files = {file['path'] for file in files}
+        self.waiting_files = [file for file in self.waiting_files if file['path'] not in claimed_files]
+        if not self.ledger.claim_batch(load_control_key=load_control_key, extension=extension, files=files):
+            return None
+        batch = self.ledger.batch(load_control_key=load_control_key)
+        logger.info(f"\nClaimed batch {load_control_key}: {batch['file_count']} files, {batch['byte_size']} bytes")
+        return batch
+
+    def batch_path(self, batch: dict = None) -> Path:
+        """
+        directory holding the files of a batch, read as a single dataset
+        """
+        return Path(self.streaming_path / f"batches/{batch['load_control_key']}{batch['extension']}")
+
+    def move_batch_files(self, batch: dict = None) -> Path:
+        """
+        move the files of a batch from the landing directory into its batch directory, files moved before a restart
+        are skipped
+        :return: batch directory
+        """
+        batch_path = self.batch_path(batch)
+        batch_path.mkdir(parents=True, exist_ok=True)
+        for file in self.ledger.batch_files(load_control_key=batch['load_control_key']):
+            destination_path = Path(batch_path / file['file_name'])
+            if not destination_path.exists():
+                shutil.move(file['source_path'], destination_path)
+        return batch_path
+
+    def start_batch(self, pool: ProcessPoolExecutor = None, batch: dict = None):
+        batch_path = self.move_batch_files(batch)
+        load_control_key = batch['load_control_key']
+        self.ledger.set_state(load_control_key=load_control_key, state='running')
+        future = pool.submit(batch_processing.ingest_key, home_directory=self.pipeline_manager.home_directory,
+                             pipeline_name=self.pipeline_manager.name,
+                             pipeline_version=self.pipeline_manager.version, load_control_key=load_control_key,
+                             source_file_path=batch_path)
+        memory_bytes = batch['byte_size'] * memory_budget.MEMORY_EXPANSION[batch['extension']]
+        self.running[future] = {'load_control_key': load_control_key, 'memory_bytes': memory_bytes}
+
+    def finish_batches(self, timeout: float = None) -> Dict[str, dict]:
+        """
+        wait up to timeout seconds for running batches and record the outcome of the finished ones
+        :return: dictionary of the format {load_control_key: run summary}
+        """
+        if not self.running:
+            if timeout:
+                time.sleep(timeout)
+            return {}
+        done, _ = wait(list(self.running), timeout=timeout, return_when=FIRST_COMPLETED)
+        results = {}
+        for future in done:
+            load_control_key = self.running.pop(future)['load_control_key']
+            summary = future.result()
+            state = 'committed' if summary['status'] == 'success' else 'failed'
+            self.ledger.set_state(load_control_key=load_control_key, state=state, error=summary['error'])
+            logger.info(f"\nBatch {load_control_key} {state} ({summary['runtime']}s)")
+            results[load_control_key] = summary
+        return results
+
+
+def is_source_file(path: Path = None) -> bool:
+    """
+    check if a landing directory entry is a complete data file
+    """
+    return path.is_file() and not path.name.startswith(('.', '_')) and path.suffix.lower() in SOURCE_EXTENSIONS
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Continuously ingest files dropped into a landing directory')
+    parser.add_argument('--home-directory', required=True)
+    parser.add_argument('--pipeline-name', required=True)
+    parser.add_argument('--pipeline-version', required=True)
+    parser.add_argument('--landing-directory', required=True)
+    parser.add_argument('--max-batch-bytes', type=int, default=None)
+    parser.add_argument('--max-batch-files', type=int, default=100)
+    parser.add_argument('--max-batch-seconds', type=float, default=60)
+    parser.add_argument('--memory-budget-bytes', type=int, default=None)
+    parser.add_argument('--max-workers', type=int, default=1)
+    parser.add_argument('--poll-interval', type=float, default=5)
+    arguments = parser.parse_args()
+    from candlestick_data_pipeline import PipelineManager
+    pipeline_manager = PipelineManager(arguments.home_directory, arguments.pipeline_name, arguments.pipeline_version)
+    batch_processing.print_batch_summary(pipeline_manager.ingest_stream(
+        landing_directory=arguments.landing_directory, max_batch_bytes=arguments.max_batch_bytes,
+        max_batch_files=arguments.max_batch_files, max_batch_seconds=arguments.max_batch_seconds,
+        memory_budget_bytes=arguments.memory_budget_bytes, max_workers=arguments.max_workers,
+        poll_interval=arguments.poll_interval))
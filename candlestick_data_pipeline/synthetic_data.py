@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+CARDTYPES = ['VISA', 'MASTERCARD', 'AMEX', 'DISCOVER', 'DEBIT', 'PREPAID', 'CORPORATE', 'OTHER']
+
+
+def generate_candlestick_data(n_symbols: int = 100, n_cardtypes: int = 3, n_days: int = 365,
+                              start_date: str = '2020-01-01', gap_fraction: float = 0.0, null_fraction: float = 0.0,
+                              duplicate_fraction: float = 0.0, shuffle_rows: bool = False,
+                              seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a deterministic synthetic candlestick dataset with one row per symbol, cardtype and day. Each row has the
+    card spend metric of the symbol and cardtype plus the daily open/high/low/close/volume candle of the symbol
+    :param n_symbols: number of symbols
+    :param n_cardtypes: number of cardtypes per symbol
+    :param n_days: number of consecutive days
+    :param start_date: first date
+    :param gap_fraction: fraction of rows removed to create missing dates
+    :param null_fraction: fraction of metric and close values set to null
+    :param duplicate_fraction: fraction of rows duplicated
+    :param shuffle_rows: shuffle the row order instead of sorting by date
+    :param seed: random seed, the same arguments always produce the same data
+    :return: pandas dataframe with columns symbol, cardtype, date, metric, open, high, low, close, volume
+    """
+    rng = np.random.default_rng(seed)
+    cardtypes = (CARDTYPES * (n_cardtypes // len(CARDTYPES) + 1))[:n_cardtypes]
+    cardtypes = [cardtype if index < len(CARDTYPES) else f'{cardtype}{index}' for index, cardtype in
+                 enumerate(cardtypes)]
+    symbols = [f'S{index:05d}' for index in range(n_symbols)]
+    dates = pd.date_range(start_date, periods=n_days).strftime('%Y-%m-%d')
+
+    # daily candles per symbol from a geometric random walk
+    log_returns = rng.normal(0, 0.02, size=(n_symbols, n_days))
+    close = 100 * np.exp(np.cumsum(log_returns, axis=1)) * rng.uniform(0.2, 5, size=(n_symbols, 1))
+    open_ = np.concatenate([close[:, :1], close[:, :-1]], axis=1) * np.exp(rng.normal(0, 0.005, (n_symbols, n_days)))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, (n_symbols, n_days))))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, (n_symbols, n_days))))
+    volume = rng.lognormal(12, 1, size=(n_symbols, n_days)).round()
+
+    # card spend metric per symbol and cardtype with weekly seasonality
+    seasonality = 1 + 0.2 * np.sin(2 * np.pi * np.arange(n_days) / 7)
+    metric = rng.lognormal(8, 1, size=(n_symbols, n_cardtypes, 1)) * seasonality * \
+        np.exp(np.cumsum(rng.normal(0, 0.01, size=(n_symbols, n_cardtypes, n_days)), axis=2))
+
+    n_rows = n_symbols * n_cardtypes * n_days
+    data = pd.DataFrame({
+        'symbol': np.repeat(symbols, n_cardtypes * n_days),
+        'cardtype': np.tile(np.repeat(cardtypes, n_days), n_symbols),
+        'date': np.tile(dates, n_symbols * n_cardtypes),
+        'metric': metric.reshape(n_rows),
+        'open': np.repeat(open_, n_cardtypes, axis=0).reshape(n_rows),
+        'high': np.repeat(high, n_cardtypes, axis=0).reshape(n_rows),
+        'low': np.repeat(low, n_cardtypes, axis=0).reshape(n_rows),
+        'close': np.repeat(close, n_cardtypes, axis=0).reshape(n_rows),
+        'volume': np.repeat(volume, n_cardtypes, axis=0).reshape(n_rows),
+    })
+    if gap_fraction:
+        data = data.loc[rng.random(len(data)) >= gap_fraction]
+    if null_fraction:
+        for column in ['metric', 'close']:
+            data.loc[rng.random(len(data)) < null_fraction, column] = np.nan
+    if duplicate_fraction:
+        data = pd.concat([data, data.sample(frac=duplicate_fraction, random_state=seed)])
+    if shuffle_rows:
+        data = data.sample(frac=1, random_state=seed)
+    else:
+        data = data.sort_values(['date', 'symbol', 'cardtype'], kind='mergesort')
+    return data.reset_index(drop=True)
+
+
+def write_candlestick_data(file_path: Path = None, **kwargs) -> Path:
+    """
+    generate a synthetic candlestick dataset and write it to a csv or parquet file
+    :param file_path: path of output file
+    :param kwargs: arguments of generate_candlestick_data
+    :return: file path
+    """
+    data = generate_candlestick_data(**kwargs)
+    name, extension = os.path.splitext(file_path)
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    if extension.lower() == '.parquet':
+        data.to_parquet(file_path, index=False)
+    elif extension.lower() == '.csv':
+        data.to_csv(file_path, index=False)
+    else:
+        raise Exception(f"File extention {extension} not recognized")
+    return Path(file_path)
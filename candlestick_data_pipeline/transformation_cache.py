@@ -0,0 +1,164 @@
+import os
+import json
+import logging
+import time
+import shutil
+import hashlib
+import argparse
+import dask.dataframe as dd
+from dask.base import tokenize
+from pathlib import Path
+from typing import List
+from candlestick_data_pipeline import data_io
+
+logger = logging.getLogger(__name__)
+
+
+class TransformationCache:
+    """
+    Content addressed on disk cache of transformation step outputs. The output of step i is stored as parquet under a
+    key hashing the input dataset, the names and arguments of steps 0..i and the package version, so a rerun can resume
+    from the longest cached prefix of its steps. Entries are evicted least recently used first once the cache grows
+    past max_bytes
+    """
+
+    def __init__(self, cache_path: Path = None, max_bytes: int = None):
+        self.cache_path = Path(cache_path)
+        self.max_bytes = max_bytes
+
+    def step_keys(self, input_key: str = None, transformation_steps: List[list] = None,
+                  package_version: str = None) -> List[str]:
+        """
+        build the cache key of every step, each key chains the key of the step before it
+        :param input_key: hash identifying the input dataset
+        :param transformation_steps: list of [transformation name, arguments]
+        :param package_version: candlestick_data_pipeline version
+        :return: list of keys, one per step
+        """
+        keys = []
+        previous_key = input_key
+        for name, arguments in transformation_steps:
+            step_description = json.dumps([previous_key, name, arguments, package_version], sort_keys=True,
+                                          default=str)
+            previous_key = hashlib.sha256(step_description.encode()).hexdigest()
+            keys.append(previous_key)
+        return keys
+
+    def entry_path(self, key: str = None) -> Path:
+        return Path(self.cache_path / key)
+
+    def longest_cached_prefix(self, keys: List[str] = None) -> int:
+        """
+        :return: number of leading steps whose output is cached
+        """
+        for index in range(len(keys), 0, -1):
+            if self.entry_path(keys[index - 1]).exists():
+                return index
+        return 0
+
+    def read(self, key: str = None) -> dd:
+        """
+        read a cached step output and mark the entry as recently used, one partition per cached file so the partitions
+        of the step output are restored as they were written
+        """
+        entry_path = self.entry_path(key)
+        os.utime(entry_path)
+        return data_io.read_parquet_dataset(entry_path / 'data.parquet', split_row_groups=False)
+
+    def write(self, data: dd = None, key: str = None, transformation: list = None) -> dd:
+        """
+        write a step output to the cache and return it read back from the cache so later steps start from the
+        materialized data instead of recomputing the step
+        """
+        entry_path = self.entry_path(key)
+        staging_path = Path(self.cache_path / f'.{key}.tmp')
+        if staging_path.exists():
+            shutil.rmtree(staging_path)
+        data.to_parquet(staging_path / 'data.parquet', write_index=False)
+        entry = {'key': key, 'transformation': transformation[0], 'arguments': transformation[1],
+                 'created': time.time(), 'bytes': directory_size(staging_path)}
+        with open(staging_path / 'entry.json', 'w') as fp:
+            json.dump(entry, fp, indent=4, default=str)
+        if entry_path.exists():
+            shutil.rmtree(entry_path)
+        staging_path.rename(entry_path)
+        return self.read(key)
+
+    def entries(self) -> List[dict]:
+        """
+        list cache entries, most recently used first
+        """
+        entries = []
+        if not self.cache_path.exists():
+            return entries
+        for entry_path in self.cache_path.iterdir():
+            if entry_path.name.startswith('.') or not (entry_path / 'entry.json').exists():
+                continue
+            with open(entry_path / 'entry.json', 'r') as fp:
+                entry = json.load(fp)
+            entry['last_used'] = entry_path.stat().st_mtime
+            entries.append(entry)
+        return sorted(entries, key=lambda entry: entry['last_used'], reverse=True)
+
+    def evict(self, keep_keys: List[str] = None):
+        """
+        remove least recently used entries until the cache fits in max_bytes
+        :param keep_keys: keys that are still being read and must not be evicted
+        """
+        if self.max_bytes is None:
+            return
+        entries = [entry for entry in self.entries() if entry['key'] not in (keep_keys or [])]
+        total_bytes = sum(entry['bytes'] for entry in self.entries())
+        while entries and total_bytes > self.max_bytes:
+            entry = entries.pop()
+            logger.info(f"\nEvicting cached output of {entry['transformation']} ({entry['key']})")
+            shutil.rmtree(self.entry_path(entry['key']))
+            total_bytes -= entry['bytes']
+
+    def clear(self):
+        """
+        remove every cache entry
+        """
+        if self.cache_path.exists():
+            shutil.rmtree(self.cache_path)
+
+
+def directory_size(path: Path = None) -> int:
+    """
+    total size in bytes of all files under path
+    """
+    return sum(file_path.stat().st_size for file_path in Path(path).rglob('*') if file_path.is_file())
+
+
+def fingerprint_input(source_file_path: Path = None, data: dd = None) -> str:
+    """
+    Hash identifying an input dataset by the path, size and modification time of its files together with the dask
+    graph token of the data (which covers the read options and schema enforcement applied to it)
+    """
+    source_file_path = Path(source_file_path)
+    file_paths = sorted(source_file_path.rglob('*')) if source_file_path.is_dir() else [source_file_path]
+    file_stats = [(str(file_path), file_path.stat().st_size, file_path.stat().st_mtime_ns)
+                  for file_path in file_paths if file_path.is_file()]
+    return hashlib.sha256(json.dumps([file_stats, tokenize(data)]).encode()).hexdigest()
+
+
+def print_entries(entries: List[dict] = None):
+    print(f'{len(entries)} cached step outputs, {sum(entry["bytes"] for entry in entries)} bytes')
+    for entry in entries:
+        print(f"{entry['key'][:12]}  {entry['bytes']:>12}  "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['last_used']))}  {entry['transformation']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or clear the transformation cache of a pipeline version')
+    parser.add_argument('command', choices=['list', 'clear'])
+    parser.add_argument('--home-directory', required=True)
+    parser.add_argument('--pipeline-name', required=True)
+    parser.add_argument('--pipeline-version', required=True)
+    arguments = parser.parse_args()
+    from candlestick_data_pipeline import PipelineManager
+    pipeline_manager = PipelineManager(arguments.home_directory, arguments.pipeline_name, arguments.pipeline_version)
+    if arguments.command == 'list':
+        pipeline_manager.list_transformation_cache()
+    else:
+        pipeline_manager.clear_transformation_cache()
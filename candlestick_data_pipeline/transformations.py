@@ -1,6 +1,15 @@
+import numpy as np
 import dask.dataframe as dd
 import pandas as pd
 from typing import List, Tuple
+from candlestick_data_pipeline import kernels
+
+WINDOWED_METRIC_KERNELS = {'rolling_sum': kernels.rolling_sum, 'rolling_mean': kernels.rolling_mean,
+                           'rolling_min': kernels.rolling_min, 'rolling_max': kernels.rolling_max,
+                           'rolling_std': kernels.rolling_std, 'pct_change': kernels.pct_change,
+                           'yoy_pct_change': kernels.pct_change}
+GROUPING_SETS_AGGREGATIONS = ('sum', 'count', 'min', 'max', 'mean')
+FILL_METHODS = (None, 'ffill', 'pad', 'bfill', 'backfill', 'nearest')
 
 
 def format_date_columns(data: dd = None, date_columns: List[str] = None) -> dd:
@@ -24,27 +33,60 @@ def drop_rows_with_any_null_values(data: dd = None) -> dd:
     return data.dropna()
 
 
-def drop_duplicate_rows(data: dd = None, subset: List[str] = None, keep: str = None) -> dd:
+def drop_duplicate_rows(data: dd = None, subset: List[str] = None, keep: str = None,
+                        assume_partitioned: bool = False) -> dd:
     """
     Drop rows containing duplicate data for the specified subset of columns
     :param data: dask dataframe
     :param subset: list of column names
     :param keep: which duplicate to keep
+    :param assume_partitioned: duplicates are in the same partition (see partition_by_group), drop them per partition
     :return: modified dask dataframe
     """
+    if assume_partitioned:
+        return data.map_partitions(pd.DataFrame.drop_duplicates, subset=subset, keep=keep)
     return data.drop_duplicates(subset=subset, keep=keep)
 
 
-def filter_by_date_range(data: dd = None, date_range: Tuple[str] = None, date_column: str = None) -> dd:
+def partition_by_group(data: dd = None, groupby_columns: List[str] = None, date_column: str = None,
+                       npartitions: int = None) -> dd:
+    """
+    Hash partition the data by the groupby columns so every group lies in a single partition, and sort each partition
+    by group and date. Later group-by transformations and evaluations on the same groups (or groups containing them)
+    run per partition without a shuffle
+    :param data: dask dataframe
+    :param groupby_columns: list of columns to partition by
+    :param date_column: name of date column
+    :param npartitions: number of output partitions, defaults to the number of input partitions
+    :return: modified dask dataframe
+    """
+    data = data.shuffle(on=groupby_columns, npartitions=npartitions)
+    return data.map_partitions(sort_partition, sort_columns=groupby_columns + [date_column])
+
+
+def sort_partition(data: pd.DataFrame = None, sort_columns: List[str] = None) -> pd.DataFrame:
+    """
+    stable sort of a single partition
+    """
+    return data.sort_values(sort_columns, kind='mergesort').reset_index(drop=True)
+
+
+def filter_by_date_range(data: dd = None, date_range: Tuple[str] = None, date_column: str = None,
+                         format_dates: bool = True) -> dd:
     """
     filter out rows of dataframe containing dates outside of specified date range
     :param data: dask dataframe
-    :param date_range: tuple of min and max date
+    :param date_range: tuple of min and max date, either bound may be None to leave that side open
     :param date_column: name of date column
+    :param format_dates: format the date column before filtering, set to False if it is already formatted
     :return: modified dask dataframe
     """
-    data = format_date_columns(data=data, date_columns=[date_column])
-    data = data.loc[(data[date_column] >= date_range[0]) & (data[date_column] <= date_range[1])]
+    if format_dates:
+        data = format_date_columns(data=data, date_columns=[date_column])
+    if date_range[0] is not None:
+        data = data.loc[data[date_column] >= date_range[0]]
+    if date_range[1] is not None:
+        data = data.loc[data[date_column] <= date_range[1]]
     return data
 
 
@@ -67,8 +109,123 @@ def agg_insert_by_group(data: dd = None, groupby_columns: List[str] = None, agg_
     return data
 
 
+def agg_insert_grouping_sets(data: dd = None, grouping_sets: List[List[str]] = None, agg_dict: dict = None,
+                             insert_dict: dict = None, include_input_rows: bool = False,
+                             split_every: int = None) -> dd:
+    """
+    Aggregate the data at several grouping levels in one pass, e.g. a rollup with grouping_sets
+    [['symbol', 'cardtype', 'date'], ['symbol', 'date'], ['date']] gives per symbol and cardtype rows, per symbol rows
+    and a total per date. Every partition is reduced to partial aggregates at the finest level, partials are combined
+    with a tree reduction across partitions and each grouping set is derived from the combined partials. Columns left
+    out of a grouping set are filled with their value in insert_dict
+    :param data: input dask dataframe
+    :param grouping_sets: list of lists of column names to group by, [] aggregates all rows
+    :param agg_dict: dictionary of the format {column name: aggregation or list of aggregations}, aggregations are
+    sum, count, min, max and mean. A column with a single aggregation keeps its name, otherwise outputs are named
+    {column name}_{aggregation}
+    :param insert_dict: dictionary of the format {column name: value of column in rows of grouping sets without it}
+    :param include_input_rows: append the aggregated rows to the input rows like agg_insert_by_group
+    :param split_every: number of partials combined at each level of the reduction tree
+    :return: modified dask dataframe
+    """
+    aggregations = grouping_sets_aggregations(agg_dict=agg_dict)
+    group_columns = list(dict.fromkeys(column for grouping_set in grouping_sets for column in grouping_set))
+    for grouping_set in grouping_sets:
+        for column in group_columns:
+            if column not in grouping_set and column not in (insert_dict or {}):
+                raise Exception(f"Column {column} is not in grouping set {grouping_set}, add its value to insert_dict")
+    reduction_arguments = {'group_columns': group_columns, 'aggregations': aggregations}
+    aggregate_arguments = dict(reduction_arguments, grouping_sets=grouping_sets, insert_dict=insert_dict or {})
+    meta = grouping_sets_aggregate(grouping_sets_chunk(data._meta, **reduction_arguments), **aggregate_arguments)
+    aggregated = data.reduction(grouping_sets_chunk, aggregate=grouping_sets_aggregate,
+                                combine=grouping_sets_combine, chunk_kwargs=reduction_arguments,
+                                combine_kwargs=reduction_arguments, aggregate_kwargs=aggregate_arguments,
+                                split_every=split_every, meta=meta, token='agg-insert-grouping-sets')
+    if include_input_rows:
+        return dd.concat([data, aggregated])
+    return aggregated
+
+
+def grouping_sets_aggregations(agg_dict: dict = None) -> List[Tuple[str, str, str]]:
+    """
+    list every requested aggregation as (column, aggregation, output column name)
+    """
+    aggregations = []
+    for column, column_aggregations in agg_dict.items():
+        if isinstance(column_aggregations, str):
+            column_aggregations = [column_aggregations]
+        for aggregation in column_aggregations:
+            if aggregation not in GROUPING_SETS_AGGREGATIONS:
+                raise Exception(f"Aggregation {aggregation} not recognized. Use one of {GROUPING_SETS_AGGREGATIONS}")
+            output_column = column if len(column_aggregations) == 1 else f'{column}_{aggregation}'
+            aggregations.append((column, aggregation, output_column))
+    return aggregations
+
+
+def grouping_sets_partials(aggregations: List[Tuple[str, str, str]] = None) -> dict:
+    """
+    decompose aggregations into partial aggregates that can be combined across partitions, of the format
+    {partial column name: (column, partial aggregation)}. Means are carried as a sum and a count
+    """
+    partials = {}
+    for column, aggregation, output_column in aggregations:
+        for partial in {'mean': ['sum', 'count']}.get(aggregation, [aggregation]):
+            partials[f'{column}__{partial}'] = (column, partial)
+    return partials
+
+
+def grouping_sets_chunk(data: pd.DataFrame = None, group_columns: List[str] = None,
+                        aggregations: List[Tuple[str, str, str]] = None) -> pd.DataFrame:
+    """
+    reduce one partition to partial aggregates at the finest grouping level
+    """
+    return data.groupby(group_columns, dropna=False, sort=False).agg(
+        **grouping_sets_partials(aggregations=aggregations)).reset_index()
+
+
+def grouping_sets_combine(data: pd.DataFrame = None, group_columns: List[str] = None,
+                          aggregations: List[Tuple[str, str, str]] = None) -> pd.DataFrame:
+    """
+    merge partial aggregates of several partitions, counts are combined by summing
+    """
+    return data.groupby(group_columns, dropna=False, sort=False).agg(
+        **grouping_sets_partial_combiners(aggregations=aggregations)).reset_index()
+
+
+def grouping_sets_partial_combiners(aggregations: List[Tuple[str, str, str]] = None) -> dict:
+    return {partial_column: (partial_column, 'sum' if partial == 'count' else partial)
+            for partial_column, (column, partial) in grouping_sets_partials(aggregations=aggregations).items()}
+
+
+def grouping_sets_aggregate(data: pd.DataFrame = None, group_columns: List[str] = None,
+                            aggregations: List[Tuple[str, str, str]] = None, grouping_sets: List[List[str]] = None,
+                            insert_dict: dict = None) -> pd.DataFrame:
+    """
+    derive every grouping set from the combined partial aggregates and stack them
+    """
+    data = grouping_sets_combine(data=data, group_columns=group_columns, aggregations=aggregations)
+    combiners = grouping_sets_partial_combiners(aggregations=aggregations)
+    outputs = []
+    for grouping_set in grouping_sets:
+        # the empty grouping set groups every row under a constant key
+        grouping_keys = grouping_set or np.zeros(len(data), dtype=np.int8)
+        partials = data.groupby(grouping_keys).agg(**combiners)
+        partials = partials.reset_index() if grouping_set else partials.reset_index(drop=True)
+        output = partials[grouping_set].copy()
+        for column in group_columns:
+            if column not in grouping_set:
+                output[column] = insert_dict[column]
+        for column, aggregation, output_column in aggregations:
+            if aggregation == 'mean':
+                output[output_column] = partials[f'{column}__sum'] / partials[f'{column}__count']
+            else:
+                output[output_column] = partials[f'{column}__{aggregation}']
+        outputs.append(output[group_columns + [output_column for _, _, output_column in aggregations]])
+    return pd.concat(outputs, ignore_index=True)
+
+
 def rolling_mean_by_date_by_group(data: dd = None, groupby_columns: List[str] = None, metric_columns: List[str] = None,
-                                  date_column: str = None, window: int = None) -> dd:
+                                  date_column: str = None, window: int = None, assume_partitioned: bool = False) -> dd:
     """
     Split input dateframe into groups and preform a rolling average on the metric columns for each group
     :param data: input dataframe
@@ -76,8 +233,13 @@ def rolling_mean_by_date_by_group(data: dd = None, groupby_columns: List[str] =
     :param metric_columns: columns to calculate rolling average on
     :param date_column: name of date column
     :param window: window size to be used on rolling average
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
     :return: modified dask dataframe
     """
+    if assume_partitioned:
+        metrics = [{'operation': 'rolling_mean', 'metric_columns': metric_columns, 'window': window}]
+        return windowed_metrics_by_group_date_first(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                                                    metrics=metrics)
     data = data.set_index(date_column, sorted=True)
     output_schema = dict(data.dtypes)
     for metric_column in metric_columns:
@@ -103,7 +265,7 @@ def rolling_mean_by_date(data: dd = None, metric_columns: List[str] = None, wind
     return data
 
 def rolling_sum_by_date_by_group(data: dd = None, groupby_columns: List[str] = None, metric_columns: List[str] = None,
-                                  date_column: str = None, window: int = None) -> dd:
+                                  date_column: str = None, window: int = None, assume_partitioned: bool = False) -> dd:
     """
     Split input dateframe into groups and preform a rolling average on the metric columns for each group
     :param data: input dataframe
@@ -111,8 +273,13 @@ def rolling_sum_by_date_by_group(data: dd = None, groupby_columns: List[str] = N
     :param metric_columns: columns to calculate rolling average on
     :param date_column: name of date column
     :param window: window size to be used on rolling average
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
     :return: modified dask dataframe
     """
+    if assume_partitioned:
+        metrics = [{'operation': 'rolling_sum', 'metric_columns': metric_columns, 'window': window}]
+        return windowed_metrics_by_group_date_first(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                                                    metrics=metrics)
     data = data.set_index(date_column, sorted=True)
     output_schema = dict(data.dtypes)
     for metric_column in metric_columns:
@@ -138,15 +305,20 @@ def rolling_sum_by_date(data: dd = None, metric_columns: List[str] = None, windo
 
 
 def yoy_percent_change_by_group(data: dd = None, groupby_columns: List[str] = None, metric_columns: List[str] = None,
-                                date_column: str = None) -> dd:
+                                date_column: str = None, assume_partitioned: bool = False) -> dd:
     """
     Split dataframe into groups and calculate year over year percent change for the etric columns in each group
     :param data: input dataframe
     :param groupby_columns: list of columns to group by
     :param metric_columns: columns to calculate rolling average on
     :param date_column: name of date column
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
     :return: modified dataframe
     """
+    if assume_partitioned:
+        metrics = [{'operation': 'yoy_pct_change', 'metric_columns': metric_columns}]
+        return windowed_metrics_by_group_date_first(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                                                    metrics=metrics)
     data = data.set_index(date_column, sorted=True)
     output_schema = dict(data.dtypes)
     for metric_column in metric_columns:
@@ -168,38 +340,318 @@ def yoy_percent_change(data: dd = None, metric_columns: List[str] = None) -> dd:
     return data
 
 
+def windowed_metrics_by_group(data: dd = None, groupby_columns: List[str] = None, date_column: str = None,
+                              metrics: List[dict] = None, assume_partitioned: bool = False,
+                              date_first: bool = False) -> dd:
+    """
+    Compute any mix of rolling and lagged percent change metrics for each group in a single shuffle. Each entry of
+    metrics is a dictionary of the format
+    {'operation': rolling_sum/rolling_mean/rolling_min/rolling_max/rolling_std/pct_change/yoy_pct_change,
+     'metric_columns': [...], 'window': rolling window size, 'periods': pct_change lag, 'output_suffix': optional}
+    Output columns are named {metric_column}_{output_suffix} where output_suffix defaults to the operation name, so
+    rolling_sum and yoy_pct_change produce the same columns as rolling_sum_by_date_by_group and
+    yoy_percent_change_by_group. Metrics are computed in order so later entries can use earlier output columns
+    :param data: input dataframe
+    :param groupby_columns: list of columns to group by
+    :param date_column: name of date column
+    :param metrics: list of metric definitions
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
+    :param date_first: move the date column first, the column order of the rolling/yoy transformations (set by the
+    transformation plan compiler when it fuses them)
+    :return: modified dask dataframe
+    """
+    for metric in metrics:
+        if metric['operation'] not in WINDOWED_METRIC_KERNELS:
+            raise Exception(f"Windowed metric operation {metric['operation']} not recognized. "
+                            f"Use one of {list(WINDOWED_METRIC_KERNELS.keys())}")
+    output_schema = dict(data.dtypes)
+    for metric in metrics:
+        for metric_column in metric['metric_columns']:
+            output_schema[windowed_metric_column_name(metric_column=metric_column, metric=metric)] = 'float32'
+    output_schema = list(output_schema.items())
+    if not assume_partitioned:
+        data = data.shuffle(on=groupby_columns)
+    data = data.map_partitions(windowed_metrics, groupby_columns=groupby_columns, date_column=date_column,
+                               metrics=metrics, meta=output_schema)
+    if date_first:
+        data = data[[date_column] + [column for column in data.columns if column != date_column]]
+    return data
+
+
+def windowed_metrics_by_group_date_first(data: dd = None, groupby_columns: List[str] = None, date_column: str = None,
+                                        metrics: List[dict] = None) -> dd:
+    """
+    windowed_metrics_by_group on partitioned data with the date column moved first, the column order of the
+    rolling/yoy transformations
+    """
+    return windowed_metrics_by_group(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                                     metrics=metrics, assume_partitioned=True, date_first=True)
+
+
+def windowed_metrics(data: pd.DataFrame = None, groupby_columns: List[str] = None, date_column: str = None,
+                     metrics: List[dict] = None) -> pd.DataFrame:
+    """
+    compute windowed metrics for every group in a single partition. Rows are sorted by group and date once and each
+    metric is computed with vectorized kernels over the contiguous group arrays
+    """
+    data = data.sort_values(groupby_columns + [date_column], kind='mergesort').reset_index(drop=True)
+    starts = kernels.group_starts(kernels.group_offsets(data=data, groupby_columns=groupby_columns))
+    for metric in metrics:
+        kernel = WINDOWED_METRIC_KERNELS[metric['operation']]
+        if metric['operation'] == 'yoy_pct_change':
+            kernel_arguments = {'periods': 365}
+        elif metric['operation'] == 'pct_change':
+            kernel_arguments = {'periods': metric['periods']}
+        else:
+            kernel_arguments = {'window': metric['window']}
+        for metric_column in metric['metric_columns']:
+            output_column_name = windowed_metric_column_name(metric_column=metric_column, metric=metric)
+            data[output_column_name] = kernel(values=data[metric_column].to_numpy(dtype='float64'), starts=starts,
+                                              **kernel_arguments).astype('float32')
+    return data
+
+
+def windowed_metric_column_name(metric_column: str = None, metric: dict = None) -> str:
+    """
+    name of the output column of a windowed metric
+    """
+    return f"{metric_column}_{metric.get('output_suffix', metric['operation'])}"
+
+
 def fill_missing_dates_by_group(data: dd = None, groupby_columns: List[str] = None, fill_method: str = None,
-                                date_range: Tuple[str] = None, date_column: str = None, fill_value=None) -> dd:
+                                date_range: Tuple[str] = None, date_column: str = None, fill_value=None,
+                                assume_partitioned: bool = False) -> dd:
     """
     split input dataframe into groups according to groupby columns and reindex with continuous dates with specified 
-    date range. Fill missing values according to fill method
+    date range. Fill missing values according to fill method. The data is shuffled once so every group sits in a single
+    partition and each partition is filled with one vectorized lookup
     :param data: dataframe
     :param groupby_columns: list of columns to groupby 
-    :param fill_method: method used to fill missing data
+    :param fill_method: method used to fill missing data, None (fill_value only), ffill/pad, bfill/backfill or nearest
     :param date_range: date range to reidex to
     :param date_column: name of date column
+    :param fill_value: value of cells with no row to fill from
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
     :return: modified dataframe
     """
+    if fill_method not in FILL_METHODS:
+        raise Exception(f"Fill method {fill_method} not recognized. Use one of {FILL_METHODS}")
     output_schema = dict(data.dtypes)
     output_schema = list(output_schema.items())
-    columns = data.columns
-    data = data.set_index(date_column, sorted=True)
-    data = data.groupby(by=groupby_columns).apply(
-        lambda df_g: fill_missing_dates(data=df_g, date_column=date_column, fill_method=fill_method, columns=columns,
-                                        date_range=date_range, fill_value=fill_value, groupby_columns=groupby_columns),
-        meta=output_schema).reset_index(drop=True)
+    if not assume_partitioned:
+        data = data.shuffle(on=groupby_columns)
+    data = data.map_partitions(fill_missing_dates, groupby_columns=groupby_columns, date_column=date_column,
+                               fill_method=fill_method, date_range=date_range, fill_value=fill_value,
+                               meta=output_schema)
     return data
 
 
-def fill_missing_dates(data: dd = None, date_column: str = None, fill_method: str = None, columns = None,
-                       date_range: Tuple[str] = None, fill_value=None, groupby_columns=None) -> dd:
+def fill_missing_dates(data: pd.DataFrame = None, groupby_columns: List[str] = None, date_column: str = None,
+                       fill_method: str = None, date_range: Tuple[str] = None, fill_value=None) -> pd.DataFrame:
     """
-    Preform date fill on single group
+    Preform date fill on every group in a single partition. The grid of every group and date in date_range is built
+    at once and each column is gathered from the matched rows with a single take
     """
+    columns = list(data.columns)
+    data = data.dropna(subset=groupby_columns)
+    data = data.sort_values(groupby_columns + [date_column], kind='mergesort').reset_index(drop=True)
+    offsets = kernels.group_offsets(data=data, groupby_columns=groupby_columns)
     all_dates = pd.date_range(date_range[0], date_range[1])
-    metric_data = data[[col for col in data.columns if col not in groupby_columns]]
-    data = data[groupby_columns].reindex(all_dates, method='nearest')
-    metric_data = metric_data.reindex(all_dates, method=fill_method, fill_value=fill_value)
-    data = dd.merge(data, metric_data, left_index=True, right_index=True)
-    data = data.reset_index().rename(columns={'index': date_column})[columns]
+    n_groups = len(offsets) - 1
+    positions = kernels.fill_indexer(
+        group_codes=np.repeat(np.arange(n_groups), np.diff(offsets)),
+        dates=data[date_column].to_numpy(dtype='datetime64[ns]').view('int64'),
+        grid_dates=all_dates.to_numpy(dtype='datetime64[ns]').view('int64'), fill_method=fill_method)
+    output = data[groupby_columns].take(np.repeat(offsets[:-1], len(all_dates))).reset_index(drop=True)
+    output[date_column] = np.tile(all_dates.to_numpy(), n_groups)
+    for column in columns:
+        if column not in groupby_columns and column != date_column:
+            output[column] = pd.api.extensions.take(data[column].array, positions, allow_fill=True,
+                                                    fill_value=fill_value)
+    return output[columns]
+
+
+def ema_by_group(data: dd = None, groupby_columns: List[str] = None, metric_columns: List[str] = None,
+                 date_column: str = None, span: int = None, assume_partitioned: bool = False) -> dd:
+    """
+    Exponential moving average of the metric columns for each group in date order, equivalent to
+    ewm(span=span, adjust=False, ignore_na=True).mean(). Adds the columns {metric_column}_ema
+    :param data: input dataframe
+    :param groupby_columns: list of columns to group by
+    :param metric_columns: columns to average
+    :param date_column: name of date column
+    :param span: span of the average, alpha = 2 / (span + 1)
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
+    :return: modified dask dataframe
+    """
+    return indicators_by_group(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                               indicator_function=ema_columns, output_columns=[
+                                   f'{metric_column}_ema' for metric_column in metric_columns],
+                               indicator_arguments={'metric_columns': metric_columns, 'span': span},
+                               assume_partitioned=assume_partitioned)
+
+
+def ema_columns(data: pd.DataFrame = None, starts: np.ndarray = None, metric_columns: List[str] = None,
+                span: int = None) -> dict:
+    return {f'{metric_column}_ema': kernels.ewm_mean(values=data[metric_column].to_numpy(dtype='float64'),
+                                                     starts=starts, alpha=2 / (span + 1))
+            for metric_column in metric_columns}
+
+
+def rsi_by_group(data: dd = None, groupby_columns: List[str] = None, metric_columns: List[str] = None,
+                 date_column: str = None, window: int = 14, assume_partitioned: bool = False) -> dd:
+    """
+    Relative strength index of the metric columns for each group in date order, with gains and losses averaged by
+    Wilder smoothing (ewm with alpha = 1 / window). Adds the columns {metric_column}_rsi
+    :param data: input dataframe
+    :param groupby_columns: list of columns to group by
+    :param metric_columns: columns to calculate the rsi of, e.g. close
+    :param date_column: name of date column
+    :param window: smoothing window
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
+    :return: modified dask dataframe
+    """
+    return indicators_by_group(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                               indicator_function=rsi_columns, output_columns=[
+                                   f'{metric_column}_rsi' for metric_column in metric_columns],
+                               indicator_arguments={'metric_columns': metric_columns, 'window': window},
+                               assume_partitioned=assume_partitioned)
+
+
+def rsi_columns(data: pd.DataFrame = None, starts: np.ndarray = None, metric_columns: List[str] = None,
+                window: int = None) -> dict:
+    return {f'{metric_column}_rsi': kernels.rsi(values=data[metric_column].to_numpy(dtype='float64'), starts=starts,
+                                                window=window)
+            for metric_column in metric_columns}
+
+
+def atr_by_group(data: dd = None, groupby_columns: List[str] = None, date_column: str = None, window: int = 14,
+                 high_column: str = 'high', low_column: str = 'low', close_column: str = 'close',
+                 assume_partitioned: bool = False) -> dd:
+    """
+    Average true range for each group in date order, the true range averaged by Wilder smoothing (ewm with
+    alpha = 1 / window). Adds the column atr
+    :param data: input dataframe
+    :param groupby_columns: list of columns to group by
+    :param date_column: name of date column
+    :param window: smoothing window
+    :param high_column: name of high price column
+    :param low_column: name of low price column
+    :param close_column: name of close price column
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
+    :return: modified dask dataframe
+    """
+    return indicators_by_group(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                               indicator_function=atr_columns, output_columns=['atr'],
+                               indicator_arguments={'window': window, 'high_column': high_column,
+                                                    'low_column': low_column, 'close_column': close_column},
+                               assume_partitioned=assume_partitioned)
+
+
+def atr_columns(data: pd.DataFrame = None, starts: np.ndarray = None, window: int = None, high_column: str = None,
+                low_column: str = None, close_column: str = None) -> dict:
+    true_range = kernels.true_range(high=data[high_column].to_numpy(dtype='float64'),
+                                    low=data[low_column].to_numpy(dtype='float64'),
+                                    close=data[close_column].to_numpy(dtype='float64'), starts=starts)
+    return {'atr': kernels.ewm_mean(values=true_range, starts=starts, alpha=1 / window)}
+
+
+def vwap_by_group(data: dd = None, groupby_columns: List[str] = None, date_column: str = None, window: int = None,
+                  price_column: str = 'close', volume_column: str = 'volume', assume_partitioned: bool = False) -> dd:
+    """
+    Volume weighted average price for each group in date order over a trailing window of rows, or over every earlier
+    row of the group when window is None. Adds the column vwap
+    :param data: input dataframe
+    :param groupby_columns: list of columns to group by
+    :param date_column: name of date column
+    :param window: number of rows in the window, None for a cumulative vwap
+    :param price_column: name of price column
+    :param volume_column: name of volume column
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
+    :return: modified dask dataframe
+    """
+    return indicators_by_group(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                               indicator_function=vwap_columns, output_columns=['vwap'],
+                               indicator_arguments={'window': window, 'price_column': price_column,
+                                                    'volume_column': volume_column},
+                               assume_partitioned=assume_partitioned)
+
+
+def vwap_columns(data: pd.DataFrame = None, starts: np.ndarray = None, window: int = None, price_column: str = None,
+                 volume_column: str = None) -> dict:
+    return {'vwap': kernels.weighted_rolling_mean(values=data[price_column].to_numpy(dtype='float64'),
+                                                  weights=data[volume_column].to_numpy(dtype='float64'),
+                                                  starts=starts, window=window)}
+
+
+def bollinger_bands_by_group(data: dd = None, groupby_columns: List[str] = None, metric_columns: List[str] = None,
+                             date_column: str = None, window: int = 20, num_std: float = 2,
+                             assume_partitioned: bool = False) -> dd:
+    """
+    Bollinger bands of the metric columns for each group in date order, the rolling mean and the rolling mean plus
+    and minus num_std rolling standard deviations, with the same min_periods=0 windows as rolling_mean_by_date_by_group.
+    Adds the columns {metric_column}_bollinger_middle, {metric_column}_bollinger_upper and
+    {metric_column}_bollinger_lower
+    :param data: input dataframe
+    :param groupby_columns: list of columns to group by
+    :param metric_columns: columns to calculate bands for
+    :param date_column: name of date column
+    :param window: number of rows in the window
+    :param num_std: width of the bands in standard deviations
+    :param assume_partitioned: every group lies in a single partition (see partition_by_group), skip the shuffle
+    :return: modified dask dataframe
+    """
+    output_columns = [f'{metric_column}_bollinger_{band}' for metric_column in metric_columns
+                      for band in ('middle', 'upper', 'lower')]
+    return indicators_by_group(data=data, groupby_columns=groupby_columns, date_column=date_column,
+                               indicator_function=bollinger_band_columns, output_columns=output_columns,
+                               indicator_arguments={'metric_columns': metric_columns, 'window': window,
+                                                    'num_std': num_std},
+                               assume_partitioned=assume_partitioned)
+
+
+def bollinger_band_columns(data: pd.DataFrame = None, starts: np.ndarray = None, metric_columns: List[str] = None,
+                           window: int = None, num_std: float = None) -> dict:
+    columns = {}
+    for metric_column in metric_columns:
+        values = data[metric_column].to_numpy(dtype='float64')
+        middle = kernels.rolling_mean(values=values, starts=starts, window=window)
+        deviation = num_std * kernels.rolling_std(values=values, starts=starts, window=window)
+        columns[f'{metric_column}_bollinger_middle'] = middle
+        columns[f'{metric_column}_bollinger_upper'] = middle + deviation
+        columns[f'{metric_column}_bollinger_lower'] = middle - deviation
+    return columns
+
+
+def indicators_by_group(data: dd = None, groupby_columns: List[str] = None, date_column: str = None,
+                        indicator_function=None, output_columns: List[str] = None, indicator_arguments: dict = None,
+                        assume_partitioned: bool = False) -> dd:
+    """
+    Shuffle so every group lies in a single partition, unless it already does, and add the output columns of an
+    indicator computed per partition (see indicators)
+    :param indicator_function: function of (data, starts, **indicator_arguments) returning {output column: array}
+    :param output_columns: columns added by indicator_function, stored as float32
+    :return: modified dask dataframe
+    """
+    output_schema = dict(data.dtypes)
+    for output_column in output_columns:
+        output_schema[output_column] = 'float32'
+    output_schema = list(output_schema.items())
+    if not assume_partitioned:
+        data = data.shuffle(on=groupby_columns)
+    return data.map_partitions(indicators, groupby_columns=groupby_columns, date_column=date_column,
+                               indicator_function=indicator_function, indicator_arguments=indicator_arguments,
+                               meta=output_schema)
+
+
+def indicators(data: pd.DataFrame = None, groupby_columns: List[str] = None, date_column: str = None,
+               indicator_function=None, indicator_arguments: dict = None) -> pd.DataFrame:
+    """
+    compute an indicator for every group in a single partition. Rows are sorted by group and date once and the
+    indicator runs over the contiguous group arrays
+    """
+    data = data.sort_values(groupby_columns + [date_column], kind='mergesort').reset_index(drop=True)
+    starts = kernels.group_starts(kernels.group_offsets(data=data, groupby_columns=groupby_columns))
+    for output_column, values in indicator_function(data=data, starts=starts, **indicator_arguments).items():
+        data[output_column] = values.astype('float32')
     return data
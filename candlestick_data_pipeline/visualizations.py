@@ -1,7 +1,6 @@
-import matplotlib.pyplot as plt
-
 # OUTPUT_DATA_PATH = f'{os.getcwd()}/output.csv'
 def example_visualization(data=None):
+    import matplotlib.pyplot as plt
 
     SYMBOLS = ['FIVE','CMG','BURL']
     for symbol in SYMBOLS:
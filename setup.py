@@ -7,5 +7,6 @@ setup(name='candlestick_data_pipeline',
       description='This package has shared components.',
       author='Dan Silva',
       author_email='dan.silva.1194@gmail.com',
-      packages=find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests"])
+      packages=find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests"]),
+      entry_points={'console_scripts': ['candlestick-pipeline=candlestick_data_pipeline.cli:main']}
     )
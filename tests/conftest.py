@@ -0,0 +1,48 @@
+import copy
+import pytest
+from candlestick_data_pipeline import registration, synthetic_data
+from candlestick_data_pipeline.pipeline_manager import PipelineManager
+
+GROUPBY_COLUMNS = ['symbol', 'cardtype']
+
+PIPELINE_CONFIG = {
+    'name': 'test_pipeline', 'version': 1,
+    'input_schema': {'symbol': 'str', 'cardtype': 'str', 'date': 'str', 'metric': 'float64'},
+    'output_schema': {'date': 'datetime64[ns]', 'metric': 'float64', 'metric_rolling_sum': 'float64'},
+    'transformations': [
+        ['format_date_columns', {'date_columns': ['date']}],
+        ['drop_rows_with_any_null_values', None],
+        ['drop_duplicate_rows', {'subset': ['symbol', 'cardtype', 'date'], 'keep': 'first'}],
+        ['rolling_sum_by_date_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'metric_columns': ['metric'],
+                                          'date_column': 'date', 'window': 7}],
+    ],
+    'evaluations': [
+        ['null_data_check', None],
+        ['date_continuity_check_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'date_column': 'date'}],
+    ],
+    'visualizations': [],
+}
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    """
+    shuffled synthetic candlestick csv of 5 symbols, 2 cardtypes and 60 days
+    """
+    data = synthetic_data.generate_candlestick_data(n_symbols=5, n_cardtypes=2, n_days=60, shuffle_rows=True)
+    file_path = tmp_path / 'source.csv'
+    data[['symbol', 'cardtype', 'date', 'metric']].to_csv(file_path, index=False)
+    return file_path
+
+
+@pytest.fixture
+def register_pipeline(tmp_path):
+    """
+    register a test pipeline under tmp_path with overrides of PIPELINE_CONFIG and return its PipelineManager
+    """
+    def register(**overrides) -> PipelineManager:
+        config = copy.deepcopy(PIPELINE_CONFIG)
+        config.update(home_directory=str(tmp_path / 'home'), **overrides)
+        registration.register_pipeline(config, overwrite=True)
+        return PipelineManager(config['home_directory'], config['name'], config['version'])
+    return register
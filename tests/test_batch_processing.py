@@ -0,0 +1,12 @@
+def test_batch_processes_every_key_despite_a_failure(register_pipeline, source_file, tmp_path):
+    pipeline_manager = register_pipeline()
+    datasets = {'first': source_file, 'missing': tmp_path / 'missing.csv', 'second': source_file}
+    results = pipeline_manager.process_batch(datasets=datasets, max_workers=2)
+    assert {key: summary['status'] for key, summary in results.items()} == {
+        'first': 'success', 'missing': 'failed', 'second': 'success'}
+    assert 'missing.csv' in results['missing']['error']
+    assert pipeline_manager.list_load_control_keys(dataset_type='staging') == ['first', 'second']
+
+    results = pipeline_manager.evaluate_batch(max_workers=2)
+    assert {key: summary['status'] for key, summary in results.items()} == {'first': 'success', 'second': 'success'}
+    assert pipeline_manager.list_load_control_keys(dataset_type='output') == ['first', 'second']
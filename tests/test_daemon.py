@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+import pytest
+from candlestick_data_pipeline import cli, daemon
+
+
+def pipeline_arguments(pipeline_manager=None, mode: str = None) -> list:
+    return ['--home-directory', str(pipeline_manager.home_directory), '--pipeline-name', pipeline_manager.name,
+            '--pipeline-version', str(pipeline_manager.version), '--daemon', mode]
+
+
+def test_cli_runs_jobs_without_a_daemon(register_pipeline, source_file, monkeypatch, capsys):
+    pipeline_manager = register_pipeline()
+    monkeypatch.chdir(source_file.parent)
+    assert cli.main(['run', 'key', source_file.name, '--evaluate'] + pipeline_arguments(pipeline_manager, 'auto')) == 0
+    assert json.loads(capsys.readouterr().out) == {'load_control_key': 'key', 'dataset_type': 'output'}
+    with pytest.raises(Exception, match='No daemon is serving'):
+        cli.main(['run', 'key', source_file.name] + pipeline_arguments(pipeline_manager, 'always'))
+    assert pipeline_manager.list_load_control_keys(dataset_type='output') == ['key']
+
+
+def test_cli_sends_jobs_to_the_daemon(register_pipeline, source_file, monkeypatch, capsys):
+    pipeline_manager = register_pipeline()
+    home_directory = str(pipeline_manager.home_directory)
+    server = threading.Thread(target=daemon.PipelineDaemon(home_directory=home_directory).serve, daemon=True)
+    server.start()
+    for _ in range(100):
+        if daemon.is_running(home_directory):
+            break
+        time.sleep(0.05)
+    monkeypatch.chdir(source_file.parent)
+    # relative source paths are resolved by the client, the daemon has its own working directory
+    request = cli.job_request(cli.build_parser().parse_args(
+        ['run', 'key', source_file.name] + pipeline_arguments(pipeline_manager, 'always')))
+    assert request['arguments']['source_file_path'] == str(source_file.resolve())
+    assert cli.main(['run', 'key', source_file.name] + pipeline_arguments(pipeline_manager, 'always')) == 0
+    assert cli.main(['evaluate', 'key'] + pipeline_arguments(pipeline_manager, 'always')) == 0
+    capsys.readouterr()
+    assert cli.main(['status'] + pipeline_arguments(pipeline_manager, 'always')) == 0
+    status = json.loads(capsys.readouterr().out)
+    assert status['output'] == ['key'] and status['staging'] == []
+    assert cli.main(['stop', '--home-directory', home_directory]) == 0
+    server.join(timeout=10)
+    assert not server.is_alive()
+    assert not daemon.socket_path(home_directory).exists() and not daemon.authkey_path(home_directory).exists()
+    assert cli.main(['stop', '--home-directory', home_directory]) == 1
+
+
+def test_waiting_exclusive_holder_is_served_before_new_shared_holders():
+    lock = daemon.SharedLock()
+    order = []
+
+    def hold(mode: str = None, name: str = None):
+        with getattr(lock, mode)():
+            order.append(name)
+    with lock.shared():
+        exclusive = threading.Thread(target=hold, args=('exclusive', 'exclusive'))
+        exclusive.start()
+        while not lock.exclusive_waiting:
+            time.sleep(0.01)
+        shared = threading.Thread(target=hold, args=('shared', 'shared'))
+        shared.start()
+        time.sleep(0.1)
+        assert order == []
+    exclusive.join(timeout=5)
+    shared.join(timeout=5)
+    assert order == ['exclusive', 'shared']
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+from candlestick_data_pipeline import data_io
+
+STORAGE_OPTIONS = {
+    'csv': {'storage_format': 'csv'},
+    'parquet': {'storage_format': 'parquet'},
+    'hive_partitioned_parquet': {'storage_format': 'parquet', 'partition_columns': ['symbol']},
+}
+
+
+@pytest.mark.parametrize('storage', list(STORAGE_OPTIONS))
+def test_datasets_load_in_written_column_order(register_pipeline, source_file, storage):
+    pipeline_manager = register_pipeline(**STORAGE_OPTIONS[storage])
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+    input_data = pipeline_manager.load_dataset_by_key(load_control_key='key', dataset_type='input')
+    staging_data = pipeline_manager.load_dataset_by_key(load_control_key='key', dataset_type='staging')
+    assert list(input_data.columns) == ['symbol', 'cardtype', 'date', 'metric']
+    assert list(staging_data.columns) == ['date', 'symbol', 'cardtype', 'metric', 'metric_rolling_sum']
+    queried_data = pipeline_manager.query(symbols=['S00001'], dataset_type='staging')
+    assert list(queried_data.columns) == list(staging_data.columns)
+    assert list(queried_data.compute().columns) == list(staging_data.columns)
+
+
+def test_promoting_a_key_again_replaces_its_output_dataset(register_pipeline, source_file, tmp_path):
+    pipeline_manager = register_pipeline(storage_format='parquet', partition_columns=['symbol'])
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+    pipeline_manager.evaluate_staging_dataset(load_control_key='key')
+    source_data = pd.read_csv(source_file)
+    reloaded_file = tmp_path / 'reloaded.csv'
+    source_data[source_data['symbol'].isin(['S00000', 'S00001'])].to_csv(reloaded_file, index=False)
+    pipeline_manager.process_new_dataset(source_file_path=reloaded_file, load_control_key='key')
+    pipeline_manager.evaluate_staging_dataset(load_control_key='key')
+    output_path = pipeline_manager.find_dataset_path(load_control_key='key', dataset_type='output')
+    output_data = pipeline_manager.load_dataset_by_key(load_control_key='key', dataset_type='output').compute()
+    assert len(output_data) == 240 and set(output_data['symbol']) == {'S00000', 'S00001'}
+    assert sorted(path.name for path in output_path.iterdir() if path.name.startswith('symbol=')) == [
+        'symbol=S00000', 'symbol=S00001']
+    assert [path.name for path in output_path.parent.iterdir() if path.name.endswith('.replaced')] == []
+
+
+def test_move_dataset_clears_a_directory_left_aside_by_an_interrupted_move(tmp_path):
+    source_path, destination_path = tmp_path / 'source', tmp_path / 'destination'
+    for path, content in [(source_path, 'new'), (destination_path, 'old'), (tmp_path / '.destination.replaced', '')]:
+        path.mkdir()
+        (path / 'part.0.parquet').write_text(content)
+    data_io.move_dataset(source_path=source_path, destination_path=destination_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['destination']
+    assert (destination_path / 'part.0.parquet').read_text() == 'new'
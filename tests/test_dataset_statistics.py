@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+from candlestick_data_pipeline import dataset_statistics
+from conftest import GROUPBY_COLUMNS
+
+
+def test_statistics_sidecar_is_written_with_pyarrow_strings(register_pipeline, source_file):
+    pipeline_manager = register_pipeline(read_options={'project_columns': False, 'downcast_floats': False,
+                                                       'string_data_type': 'string[pyarrow]'})
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+    staging_path = pipeline_manager.find_dataset_path(load_control_key='key', dataset_type='staging')
+    statistics = dataset_statistics.read_statistics(staging_path)
+    assert statistics is not None
+    assert statistics.row_count == 600
+    groups = statistics.get_grouping(groupby_columns=GROUPBY_COLUMNS, date_column='date')['groups']
+    assert len(groups) == 10
+    assert (groups['distinct_dates'] == 60).all() and (groups['row_count'] == 60).all()
+
+
+def test_evaluations_are_answered_from_statistics_without_reading_the_data(register_pipeline, source_file,
+                                                                           monkeypatch):
+    pipeline_manager = register_pipeline()
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+
+    def load_dataset_by_key(*args, **kwargs):
+        raise AssertionError('the staging dataset was read')
+    monkeypatch.setattr(pipeline_manager, 'load_dataset_by_key', load_dataset_by_key)
+    assert pipeline_manager.evaluate_staging_dataset(load_control_key='key')
+    output_path = pipeline_manager.find_dataset_path(load_control_key='key', dataset_type='output')
+    assert dataset_statistics.read_statistics(output_path).row_count == 600
+
+
+def test_statistics_of_a_changed_dataset_are_stale(register_pipeline, source_file):
+    pipeline_manager = register_pipeline()
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+    staging_path = pipeline_manager.find_dataset_path(load_control_key='key', dataset_type='staging')
+    assert dataset_statistics.read_statistics(staging_path) is not None
+    # drop a day in the middle of every group, the statistics still describe continuous dates
+    staging_data = pd.read_csv(staging_path)
+    staging_data[staging_data['date'] != '2020-01-15'].to_csv(staging_path, index=False)
+    assert dataset_statistics.read_statistics(staging_path) is None
+    with pytest.raises(Exception, match='date_continuity_check_by_group'):
+        pipeline_manager.evaluate_staging_dataset(load_control_key='key')
@@ -0,0 +1,74 @@
+import dask
+import pytest
+from dask.callbacks import Callback
+from candlestick_data_pipeline import evaluations, dataset_statistics, synthetic_data, transformations
+from conftest import GROUPBY_COLUMNS
+
+DATE_RANGES = {'covered': ['2020-01-01', '2020-02-29'], 'not_covered': ['2019-12-31', '2020-02-29']}
+
+
+@pytest.fixture(params=[0.0, 0.02], ids=['continuous', 'gappy'])
+def staged(request, register_pipeline, tmp_path):
+    """
+    pipeline manager with a processed staging dataset of 60 days, with or without missing dates, its data and whether
+    dates are missing
+    """
+    data = synthetic_data.generate_candlestick_data(n_symbols=5, n_cardtypes=2, n_days=60, shuffle_rows=True,
+                                                    gap_fraction=request.param)
+    source_file = tmp_path / 'source.csv'
+    data[['symbol', 'cardtype', 'date', 'metric']].to_csv(source_file, index=False)
+    pipeline_manager = register_pipeline()
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+    return (pipeline_manager, pipeline_manager.load_dataset_by_key(load_control_key='key', dataset_type='staging'),
+            request.param > 0)
+
+
+def check_variants(data=None, statistics=None, name=None, **arguments) -> dict:
+    partitioned_data = transformations.partition_by_group(data=data, groupby_columns=GROUPBY_COLUMNS,
+                                                          date_column='date')
+    failed_groups = getattr(evaluations, name.replace('_check_by_group', '_failed_groups'))
+    return {
+        'eager': getattr(evaluations, name)(data=data, **arguments),
+        'lazy': bool(getattr(evaluations, f'{name}_lazy')(data=data, **arguments).compute()),
+        'partitioned': getattr(evaluations, name)(data=partitioned_data, assume_partitioned=True, **arguments),
+        'statistics': getattr(evaluations, f'{name}_from_statistics')(statistics=statistics, **arguments),
+        'failed_groups': bool(failed_groups(data=data.compute(), **arguments)),
+    }
+
+
+def test_date_continuity_variants_agree(staged):
+    pipeline_manager, data, gappy = staged
+    statistics = dataset_statistics.read_statistics(
+        pipeline_manager.find_dataset_path(load_control_key='key', dataset_type='staging'))
+    results = check_variants(data=data, statistics=statistics, name='date_continuity_check_by_group',
+                             groupby_columns=GROUPBY_COLUMNS, date_column='date')
+    assert set(results.values()) == {gappy}, results
+
+
+@pytest.mark.parametrize('date_range', list(DATE_RANGES))
+def test_date_range_variants_agree(staged, date_range):
+    pipeline_manager, data, _ = staged
+    statistics = dataset_statistics.read_statistics(
+        pipeline_manager.find_dataset_path(load_control_key='key', dataset_type='staging'))
+    results = check_variants(data=data, statistics=statistics, name='date_range_check_by_group',
+                             groupby_columns=GROUPBY_COLUMNS, date_range=DATE_RANGES[date_range], date_column='date')
+    assert len(set(results.values())) == 1, results
+    if date_range == 'not_covered':
+        assert results['eager']
+
+
+def test_lazy_evaluations_share_a_single_compute(register_pipeline, source_file):
+    pipeline_manager = register_pipeline(evaluations=[
+        ['null_data_check', None],
+        ['date_continuity_check_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'date_column': 'date'}],
+        ['date_range_check_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'date_column': 'date',
+                                       'date_range': DATE_RANGES['covered']}],
+    ])
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+    pipeline_manager.data = pipeline_manager.load_dataset_by_key(load_control_key='key', dataset_type='staging')
+    computes = []
+    with Callback(start=lambda dsk: computes.append(len(dsk))), dask.config.set(scheduler='sync'):
+        promote_dataset, failed_evaluations = pipeline_manager.evaluate_data()
+    assert promote_dataset and failed_evaluations == []
+    # the persist of the evaluation data and one pass for all three evaluations
+    assert len(computes) == 2
@@ -0,0 +1,44 @@
+import copy
+import pytest
+from candlestick_data_pipeline import dataset_statistics, synthetic_data
+from conftest import GROUPBY_COLUMNS, PIPELINE_CONFIG
+
+
+@pytest.fixture
+def gappy_source_file(tmp_path):
+    data = synthetic_data.generate_candlestick_data(n_symbols=5, n_cardtypes=2, n_days=60, shuffle_rows=True,
+                                                    gap_fraction=0.05)
+    source_file = tmp_path / 'gappy.csv'
+    data[['symbol', 'cardtype', 'date', 'metric']].to_csv(source_file, index=False)
+    return source_file
+
+
+def test_fail_fast_stops_at_the_first_failed_partition(register_pipeline, gappy_source_file):
+    transformations = copy.deepcopy(PIPELINE_CONFIG['transformations'])
+    transformations.insert(3, ['partition_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'date_column': 'date',
+                                                      'npartitions': 4}])
+    pipeline_manager = register_pipeline(storage_format='parquet', transformations=transformations,
+                                         fail_fast_evaluations=True)
+    pipeline_manager.process_new_dataset(source_file_path=gappy_source_file, load_control_key='key')
+    # without statistics the continuity check is decided partition by partition
+    staging_path = pipeline_manager.find_dataset_path(load_control_key='key', dataset_type='staging')
+    dataset_statistics.statistics_path(staging_path).unlink()
+    with pytest.raises(Exception, match='date_continuity_check_by_group failed in partition'):
+        pipeline_manager.evaluate_staging_dataset(load_control_key='key')
+    failures = pipeline_manager.evaluation_failures
+    assert failures and {failure['evaluation'] for failure in failures} == {'date_continuity_check_by_group'}
+    assert all(failure['failed'] for failure in failures)
+    assert pipeline_manager.list_load_control_keys(dataset_type='failed') == ['key']
+
+
+def test_fail_fast_decides_from_statistics_without_reading_the_data(register_pipeline, gappy_source_file,
+                                                                    monkeypatch):
+    pipeline_manager = register_pipeline(fail_fast_evaluations=True)
+    pipeline_manager.process_new_dataset(source_file_path=gappy_source_file, load_control_key='key')
+
+    def load_dataset_by_key(*args, **kwargs):
+        raise AssertionError('the staging dataset was read')
+    monkeypatch.setattr(pipeline_manager, 'load_dataset_by_key', load_dataset_by_key)
+    with pytest.raises(Exception, match='date_continuity_check_by_group'):
+        pipeline_manager.evaluate_staging_dataset(load_control_key='key')
+    assert pipeline_manager.list_load_control_keys(dataset_type='failed') == ['key']
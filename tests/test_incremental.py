@@ -0,0 +1,37 @@
+import copy
+import pandas as pd
+from candlestick_data_pipeline import synthetic_data
+from conftest import GROUPBY_COLUMNS, PIPELINE_CONFIG
+
+TRANSFORMATIONS = copy.deepcopy(PIPELINE_CONFIG['transformations']) + [
+    ['rolling_mean_by_date_by_group', {'groupby_columns': GROUPBY_COLUMNS, 'metric_columns': ['metric'],
+                                       'date_column': 'date', 'window': 28}],
+]
+OUTPUT_SCHEMA = dict(PIPELINE_CONFIG['output_schema'], metric_rolling_mean='float64')
+
+
+def test_incremental_loads_match_a_full_recompute(register_pipeline, tmp_path):
+    data = synthetic_data.generate_candlestick_data(n_symbols=5, n_cardtypes=2, n_days=120)
+    # rows stay in date order within each group, the full rolling steps rely on it
+    data = data[['symbol', 'cardtype', 'date', 'metric']]
+    full_file = tmp_path / 'full.csv'
+    data.to_csv(full_file, index=False)
+    full_pipeline = register_pipeline(version=1, transformations=TRANSFORMATIONS, output_schema=OUTPUT_SCHEMA)
+    full_pipeline.process_new_dataset(source_file_path=full_file, load_control_key='full')
+    expected = full_pipeline.load_dataset_by_key(load_control_key='full', dataset_type='staging').compute()
+
+    incremental_pipeline = register_pipeline(version=2, transformations=TRANSFORMATIONS, output_schema=OUTPUT_SCHEMA,
+                                             incremental=True)
+    loads = []
+    for index, (first_date, last_date) in enumerate([('2020-01-01', '2020-02-09'), ('2020-02-10', '2020-03-20'),
+                                                     ('2020-03-21', '2020-04-29')]):
+        load_file = tmp_path / f'load_{index}.csv'
+        data[(data['date'] >= first_date) & (data['date'] <= last_date)].to_csv(load_file, index=False)
+        incremental_pipeline.process_new_dataset(source_file_path=load_file, load_control_key=f'load_{index}')
+        loads.append(incremental_pipeline.load_dataset_by_key(load_control_key=f'load_{index}',
+                                                              dataset_type='staging').compute())
+        incremental_pipeline.evaluate_staging_dataset(load_control_key=f'load_{index}')
+    result = pd.concat(loads)
+    sort_columns = GROUPBY_COLUMNS + ['date']
+    pd.testing.assert_frame_equal(result.sort_values(sort_columns).reset_index(drop=True),
+                                  expected.sort_values(sort_columns).reset_index(drop=True))
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import dask.dataframe as dd
+import pytest
+from candlestick_data_pipeline import transformations
+
+GROUPBY_COLUMNS = ['symbol', 'cardtype']
+WINDOW = 14
+
+
+def candlesticks(n_symbols: int = 40, n_days: int = 400, seed: int = 0) -> pd.DataFrame:
+    """
+    random walk candlesticks for two card types per symbol with a wide spread of price levels between groups and a
+    few missing close prices
+    """
+    rng = np.random.default_rng(seed)
+    groups = pd.MultiIndex.from_product([[f'S{i}' for i in range(n_symbols)], ['normal', 'foil']],
+                                        names=GROUPBY_COLUMNS).to_frame(index=False)
+    data = groups.loc[groups.index.repeat(n_days)].reset_index(drop=True)
+    data['date'] = np.tile(pd.date_range('2020-01-01', periods=n_days), len(groups))
+    levels = np.repeat(rng.lognormal(2, 2, len(groups)), n_days)
+    close = levels * np.exp(np.cumsum(rng.normal(0, 0.02, len(data))))
+    spread = close * rng.uniform(0, 0.03, (2, len(data)))
+    data['open'] = close * np.exp(rng.normal(0, 0.01, len(data)))
+    data['high'] = np.maximum(data['open'], close) + spread[0]
+    data['low'] = np.minimum(data['open'], close) - spread[1]
+    data['close'] = np.where(rng.random(len(data)) < 0.01, np.nan, close)
+    data['volume'] = rng.integers(1, 1000, len(data)).astype('float64')
+    return data
+
+
+def shuffled(data: pd.DataFrame = None) -> dd.DataFrame:
+    return dd.from_pandas(data.sample(frac=1, random_state=1), npartitions=5)
+
+
+def by_group(values: pd.Series = None, reference: pd.DataFrame = None, function=None) -> pd.Series:
+    return values.groupby([reference[column] for column in GROUPBY_COLUMNS], sort=False).transform(function)
+
+
+def wilder(values: pd.Series = None) -> pd.Series:
+    return values.ewm(alpha=1 / WINDOW, adjust=False, ignore_na=True).mean()
+
+
+def pandas_rsi(close: pd.Series = None) -> pd.Series:
+    change = close.diff()
+    return 100 - 100 / (1 + wilder(change.clip(lower=0)) / wilder(-change.clip(upper=0)))
+
+
+def pandas_indicators(data: pd.DataFrame = None) -> pd.DataFrame:
+    reference = data.copy()
+    close = reference['close']
+    reference['close_ema'] = by_group(close, reference, lambda s: s.ewm(span=20, adjust=False, ignore_na=True).mean())
+    reference['close_rsi'] = by_group(close, reference, pandas_rsi)
+    previous_close = by_group(close, reference, lambda s: s.shift(1))
+    true_range = pd.concat([reference['high'] - reference['low'], (reference['high'] - previous_close).abs(),
+                            (reference['low'] - previous_close).abs()], axis=1).max(axis=1)
+    reference['atr'] = by_group(true_range, reference, wilder)
+    price_volume = close * reference['volume']
+    volume = reference['volume'].where(price_volume.notna())
+    reference['vwap'] = (by_group(price_volume, reference, lambda s: s.rolling(10, min_periods=1).sum()) /
+                         by_group(volume, reference, lambda s: s.rolling(10, min_periods=1).sum()))
+    middle = by_group(close, reference, lambda s: s.rolling(20, min_periods=0).mean())
+    deviation = by_group(close, reference, lambda s: s.rolling(20, min_periods=0).std())
+    reference['close_bollinger_middle'] = middle
+    reference['close_bollinger_upper'] = middle + 2 * deviation
+    reference['close_bollinger_lower'] = middle - 2 * deviation
+    return reference
+
+
+@pytest.fixture(scope='module')
+def indicators():
+    data = candlesticks()
+    result = transformations.ema_by_group(shuffled(data), GROUPBY_COLUMNS, ['close'], 'date', span=20)
+    result = transformations.rsi_by_group(result, GROUPBY_COLUMNS, ['close'], 'date', window=WINDOW)
+    result = transformations.atr_by_group(result, GROUPBY_COLUMNS, 'date', window=WINDOW)
+    result = transformations.vwap_by_group(result, GROUPBY_COLUMNS, 'date', window=10)
+    result = transformations.bollinger_bands_by_group(result, GROUPBY_COLUMNS, ['close'], 'date', window=20)
+    result = result.compute().sort_values(GROUPBY_COLUMNS + ['date']).reset_index(drop=True)
+    reference = pandas_indicators(data).sort_values(GROUPBY_COLUMNS + ['date']).reset_index(drop=True)
+    return result, reference
+
+
+@pytest.mark.parametrize('column', ['close_ema', 'close_rsi', 'atr', 'vwap', 'close_bollinger_middle',
+                                    'close_bollinger_upper', 'close_bollinger_lower'])
+def test_indicators_match_pandas_across_groups(indicators, column):
+    result, reference = indicators
+    assert result[column].dtype == np.float32
+    actual, expected = result[column].astype('float64').to_numpy(), reference[column].to_numpy()
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    known = ~np.isnan(expected)
+    # outputs are stored as float32, so they match up to float32 rounding
+    np.testing.assert_allclose(actual[known], expected[known], rtol=1e-7)
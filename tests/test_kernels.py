@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+from candlestick_data_pipeline import kernels
+
+ROLLING_KERNELS = {'sum': kernels.rolling_sum, 'mean': kernels.rolling_mean, 'std': kernels.rolling_std}
+
+
+def group_starts(keys: np.ndarray = None) -> np.ndarray:
+    return kernels.group_starts(kernels.group_offsets(data=pd.DataFrame({'key': keys}), groupby_columns=['key']))
+
+
+def pandas_rolling(values: np.ndarray = None, keys: np.ndarray = None, window: int = None,
+                   operation: str = None) -> np.ndarray:
+    rolling = pd.DataFrame({'key': keys, 'value': values}).groupby('key', sort=False)['value'].rolling(
+        window, min_periods=0)
+    return getattr(rolling, operation)().to_numpy()
+
+
+def realistic_prices(n_groups: int = 2000, n_days: int = 500, seed: int = 0):
+    """
+    random walk prices with a wide spread of price levels between groups and a few missing values
+    """
+    rng = np.random.default_rng(seed)
+    keys = np.repeat(np.arange(n_groups), n_days)
+    levels = np.repeat(rng.lognormal(3, 2, n_groups), n_days)
+    prices = levels * np.exp(np.cumsum(rng.normal(0, 0.02, n_groups * n_days)))
+    prices[rng.random(len(prices)) < 0.01] = np.nan
+    return prices, keys
+
+
+@pytest.mark.parametrize('operation', list(ROLLING_KERNELS))
+@pytest.mark.parametrize('window', [1, 7, 20])
+def test_rolling_kernels_match_pandas_across_groups(operation, window):
+    prices, keys = realistic_prices()
+    expected = pandas_rolling(values=prices, keys=keys, window=window, operation=operation)
+    result = ROLLING_KERNELS[operation](values=prices, starts=group_starts(keys), window=window)
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
+    known = ~np.isnan(expected)
+    np.testing.assert_allclose(result[known], expected[known], rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('operation', list(ROLLING_KERNELS))
+def test_small_group_after_large_group_keeps_precision(operation):
+    rng = np.random.default_rng(1)
+    large = 1e8 + rng.normal(0, 1, 200000)
+    small = 1 + rng.normal(0, 1e-3, 1000)
+    values = np.concatenate([large, small])
+    keys = np.repeat([0, 1], [len(large), len(small)])
+    result = ROLLING_KERNELS[operation](values=values, starts=group_starts(keys), window=20)[len(large):]
+    windows = sliding_window_view(small, 20)
+    expected = {'sum': windows.sum(axis=1), 'mean': windows.mean(axis=1),
+                'std': windows.std(axis=1, ddof=1)}[operation]
+    np.testing.assert_allclose(result[19:], expected, rtol=1e-9)
+
+
+def test_rolling_std_is_exact_for_large_values_with_small_spread():
+    values = 1e8 + np.random.default_rng(2).normal(0, 1, 20000)
+    result = kernels.rolling_std(values=values, starts=np.zeros(len(values), dtype=np.int64), window=20)
+    np.testing.assert_allclose(result[19:], sliding_window_view(values, 20).std(axis=1, ddof=1), rtol=1e-12)
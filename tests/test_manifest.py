@@ -0,0 +1,56 @@
+import pytest
+from candlestick_data_pipeline import query, synthetic_data
+
+
+@pytest.fixture
+def promoted(register_pipeline, tmp_path):
+    """
+    parquet pipeline with two promoted datasets, january-february and march-april 2020
+    """
+    pipeline_manager = register_pipeline(storage_format='parquet', partition_columns=['symbol'])
+    for load_control_key, start_date in [('early', '2020-01-01'), ('late', '2020-03-01')]:
+        data = synthetic_data.generate_candlestick_data(n_symbols=5, n_cardtypes=2, n_days=60, start_date=start_date,
+                                                        shuffle_rows=True)
+        source_file = tmp_path / f'{load_control_key}.csv'
+        data[['symbol', 'cardtype', 'date', 'metric']].to_csv(source_file, index=False)
+        pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key=load_control_key)
+        pipeline_manager.evaluate_staging_dataset(load_control_key=load_control_key)
+    return pipeline_manager
+
+
+def test_manifest_records_datasets_as_they_move(promoted):
+    assert promoted.list_load_control_keys(dataset_type='output') == ['early', 'late']
+    assert promoted.list_load_control_keys(dataset_type='staging') == []
+    records = {record['dataset_type']: record for record in promoted.get_manifest().status(load_control_key='late')}
+    assert set(records) == {'input', 'output'}
+    assert records['output']['row_count'] == 600
+    assert records['output']['min_date'] == '2020-03-01T00:00:00'
+    assert records['output']['max_date'] == '2020-04-29T00:00:00'
+    assert records['output']['data_path'] == str(promoted.find_dataset_path(load_control_key='late',
+                                                                            dataset_type='output'))
+
+
+@pytest.mark.parametrize('date_range, expected_keys', [
+    (['2020-03-15', None], ['late']),
+    ([None, '2020-01-31'], ['early']),
+    (['2020-02-15', '2020-03-15'], ['early', 'late']),
+    (['2021-01-01', None], []),
+])
+def test_date_range_prunes_datasets(promoted, date_range, expected_keys):
+    assert promoted.list_load_control_keys(dataset_type='output', date_range=date_range) == expected_keys
+
+
+def test_query_reads_only_matching_datasets_and_rows(promoted, monkeypatch):
+    read_paths = []
+    read_dataset = query.read_dataset
+
+    def spy_read_dataset(data_path=None, **kwargs):
+        read_paths.append(data_path)
+        return read_dataset(data_path=data_path, **kwargs)
+    monkeypatch.setattr(query, 'read_dataset', spy_read_dataset)
+    result = promoted.query(symbols=['S00001'], date_range=['2020-04-01', None], columns=['symbol', 'date', 'metric'])
+    result = result.compute()
+    assert read_paths == [promoted.find_dataset_path(load_control_key='late', dataset_type='output')]
+    assert list(result.columns) == ['symbol', 'date', 'metric']
+    assert set(result['symbol']) == {'S00001'}
+    assert len(result) == 2 * 29 and str(result['date'].min().date()) == '2020-04-01'
@@ -0,0 +1,28 @@
+import pandas as pd
+from candlestick_data_pipeline import memory_budget
+from conftest import GROUPBY_COLUMNS
+
+
+def test_budgeted_run_matches_an_unbudgeted_run_and_clears_its_spill(register_pipeline, source_file, monkeypatch):
+    spilled = []
+    clear_spill = memory_budget.MemoryBudget.clear_spill
+
+    def spy_clear_spill(self):
+        spilled.extend(path.name for path in self.spill_directory.glob('*.parquet'))
+        clear_spill(self)
+    monkeypatch.setattr(memory_budget.MemoryBudget, 'clear_spill', spy_clear_spill)
+
+    results = {}
+    for version, budget in [(1, None), (2, {'budget_bytes': 10_000, 'workers': 1})]:
+        # incremental runs keep the parsed input for reuse, persisted or spilled
+        pipeline_manager = register_pipeline(version=version, memory_budget=budget, incremental=True)
+        pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+        assert pipeline_manager.evaluate_staging_dataset(load_control_key='key')
+        results[version] = pipeline_manager.load_dataset_by_key(load_control_key='key', dataset_type='output').compute()
+        assert not (pipeline_manager.version_path / 'spill').exists() or \
+            not any((pipeline_manager.version_path / 'spill').iterdir())
+    # the input does not fit a budget of 10KB and is spilled to disk instead of persisted
+    assert 'input.parquet' in spilled
+    sort_columns = GROUPBY_COLUMNS + ['date']
+    pd.testing.assert_frame_equal(results[2].sort_values(sort_columns).reset_index(drop=True),
+                                  results[1].sort_values(sort_columns).reset_index(drop=True))
@@ -0,0 +1,33 @@
+import pytest
+from candlestick_data_pipeline import data_io
+
+
+def test_compact_schema_leaves_date_columns_as_strings():
+    schema = {'symbol': 'str', 'date': 'str', 'metric': 'float64'}
+    compacted = data_io.compact_schema(schema=schema, downcast_floats=True, string_data_type='category',
+                                       date_columns=['date'])
+    assert compacted == {'symbol': 'category', 'date': 'str', 'metric': 'float32'}
+
+
+@pytest.mark.parametrize('read_options', [
+    {'project_columns': True, 'downcast_floats': False, 'string_data_type': None},
+    {'project_columns': True, 'downcast_floats': True, 'string_data_type': 'category'},
+    {'project_columns': False, 'downcast_floats': False, 'string_data_type': 'string[pyarrow]'},
+])
+def test_read_options_with_date_column_left_out_of_input_schema(register_pipeline, source_file, read_options):
+    pipeline_manager = register_pipeline(input_schema={'symbol': 'str', 'cardtype': 'str', 'metric': 'float64'},
+                                         read_options=read_options)
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+    staging_data = pipeline_manager.load_dataset_by_key(load_control_key='key', dataset_type='staging').compute()
+    assert len(staging_data) == 600
+    assert str(staging_data['date'].dtype) == 'datetime64[ns]'
+    assert staging_data['metric_rolling_sum'].notnull().all()
+
+
+def test_category_strings_with_date_column_in_input_schema(register_pipeline, source_file):
+    pipeline_manager = register_pipeline(read_options={'project_columns': True, 'downcast_floats': False,
+                                                       'string_data_type': 'category'})
+    pipeline_manager.process_new_dataset(source_file_path=source_file, load_control_key='key')
+    staging_data = pipeline_manager.load_dataset_by_key(load_control_key='key', dataset_type='staging').compute()
+    assert len(staging_data) == 600
+    assert staging_data['metric_rolling_sum'].notnull().all()
@@ -0,0 +1,26 @@
+import pandas as pd
+from candlestick_data_pipeline import data_io
+
+
+def test_landing_files_are_ingested_in_batches(register_pipeline, source_file, tmp_path):
+    pipeline_manager = register_pipeline()
+    landing_directory = tmp_path / 'landing'
+    landing_directory.mkdir()
+    source_data = pd.read_csv(source_file)
+    for symbol, symbol_data in source_data.groupby('symbol'):
+        symbol_data.to_csv(landing_directory / f'{symbol}.csv', index=False)
+    # files still being written upstream are ignored
+    source_data.to_csv(landing_directory / '_S00000.csv', index=False)
+    source_data.to_csv(landing_directory / '.S00000.csv', index=False)
+    results = pipeline_manager.ingest_stream(landing_directory=landing_directory, max_batch_files=2,
+                                             max_batch_seconds=0, poll_interval=0.1, idle_timeout=1)
+    assert sorted(summary['status'] for summary in results.values()) == ['success'] * 3
+    assert sorted(path.name for path in landing_directory.iterdir()) == ['.S00000.csv', '_S00000.csv']
+    assert pipeline_manager.list_load_control_keys(dataset_type='output') == sorted(results)
+    output_data = pd.concat(data_io.read_data_by_file_extension(
+        file_path=pipeline_manager.find_dataset_path(load_control_key=load_control_key, dataset_type='output')
+    ).compute() for load_control_key in results)
+    assert len(output_data) == 600 and output_data['symbol'].nunique() == 5
+
+    # a restarted ingest finds nothing left to commit
+    assert pipeline_manager.ingest_stream(landing_directory=landing_directory, poll_interval=0.1, idle_timeout=1) == {}
@@ -0,0 +1,58 @@
+import dask.dataframe as dd
+import pandas as pd
+import pytest
+from candlestick_data_pipeline import synthetic_data, transformations
+from conftest import GROUPBY_COLUMNS
+
+DATE_RANGE = ('2019-12-25', '2020-03-05')
+
+
+@pytest.fixture
+def gappy_data():
+    data = synthetic_data.generate_candlestick_data(n_symbols=5, n_cardtypes=2, n_days=60, shuffle_rows=True,
+                                                    gap_fraction=0.1)
+    data = data[['symbol', 'cardtype', 'date', 'metric']]
+    data['date'] = pd.to_datetime(data['date'])
+    return data
+
+
+def fill_missing_dates_reference(data: pd.DataFrame = None, fill_method: str = None, fill_value=None) -> pd.DataFrame:
+    all_dates = pd.date_range(*DATE_RANGE)
+    groups = []
+    for group, group_data in data.groupby(GROUPBY_COLUMNS):
+        group_data = group_data.sort_values('date').set_index('date')[['metric']]
+        group_data = group_data.reindex(all_dates, method=fill_method, fill_value=fill_value)
+        group_data = group_data.rename_axis('date').reset_index()
+        groups.append(group_data.assign(**dict(zip(GROUPBY_COLUMNS, group))))
+    return pd.concat(groups, ignore_index=True)[list(data.columns)]
+
+
+@pytest.mark.parametrize('fill_method', [None, 'ffill', 'bfill', 'nearest'])
+def test_fill_missing_dates_matches_pandas_reindex(gappy_data, fill_method):
+    result = transformations.fill_missing_dates_by_group(
+        data=dd.from_pandas(gappy_data, npartitions=3), groupby_columns=GROUPBY_COLUMNS, fill_method=fill_method,
+        date_range=DATE_RANGE, date_column='date', fill_value=0.0).compute()
+    expected = fill_missing_dates_reference(data=gappy_data, fill_method=fill_method, fill_value=0.0)
+    sort_columns = GROUPBY_COLUMNS + ['date']
+    assert len(result) == 10 * len(pd.date_range(*DATE_RANGE))
+    pd.testing.assert_frame_equal(result.sort_values(sort_columns).reset_index(drop=True),
+                                  expected.sort_values(sort_columns).reset_index(drop=True))
+
+
+def test_grouping_sets_match_pandas_groupby(gappy_data):
+    grouping_sets = [['symbol', 'cardtype', 'date'], ['symbol', 'date'], ['date'], []]
+    insert_dict = {'symbol': 'ALL', 'cardtype': 'ALL', 'date': pd.NaT}
+    agg_dict = {'metric': ['sum', 'count', 'min', 'max', 'mean']}
+    result = transformations.agg_insert_grouping_sets(
+        data=dd.from_pandas(gappy_data, npartitions=4), grouping_sets=grouping_sets, agg_dict=agg_dict,
+        insert_dict=insert_dict, split_every=2).compute()
+    expected = []
+    for grouping_set in grouping_sets:
+        aggregated = gappy_data.groupby(grouping_set or (lambda _: 0))['metric'].agg(agg_dict['metric'])
+        aggregated = aggregated.add_prefix('metric_').reset_index(drop=not grouping_set)
+        expected.append(aggregated.assign(**{column: value for column, value in insert_dict.items()
+                                             if column not in grouping_set}))
+    expected = pd.concat(expected, ignore_index=True)[list(result.columns)]
+    sort_columns = ['symbol', 'cardtype', 'date']
+    pd.testing.assert_frame_equal(result.sort_values(sort_columns).reset_index(drop=True),
+                                  expected.sort_values(sort_columns).reset_index(drop=True))